@@ -3,6 +3,7 @@ from datetime import datetime
 from components.message import message
 from nicegui import ui
 from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, Response
 import json
 import re
 from auth.middleware import get_current_user
@@ -11,6 +12,7 @@ from typing import Optional
 from auth.session_manager import session_manager, UserSession
 from auth.token_storage import token_storage, get_last_token
 from app_logging.logger import get_logger
+from services.preview_cache import preview_cache
 
 # Создаем FastAPI роутер для API endpoints
 api_router = APIRouter(prefix='/api')
@@ -148,7 +150,7 @@ def get_user_from_request(request: Request) -> Optional[UserSession]:
     
     return None
 
-def get_user_fio_for_certificate_matching(request: Request = None) -> str:
+async def get_user_fio_for_certificate_matching(request: Request = None) -> str:
     """
     Получает ФИО текущего пользователя для сравнения с сертификатами
     
@@ -207,7 +209,8 @@ def get_user_fio_for_certificate_matching(request: Request = None) -> str:
         if current_username:
             try:
                 ldap_auth = LDAPAuthenticator()
-                ldap_user = ldap_auth.get_user_by_login(current_username)
+                # Запрос к LDAP выполняется в пуле потоков, чтобы не блокировать цикл событий
+                ldap_user = await ldap_auth.pool.run(ldap_auth.get_user_by_login, current_username)
                 if ldap_user:
                     sn = getattr(ldap_user, 'sn', '').strip()
                     given_name = getattr(ldap_user, 'givenName', '').strip()
@@ -360,7 +363,7 @@ async def handle_cryptopro_event(request: Request):
                 _last_user_username = current_username
             
             # Получаем ФИО пользователя для фильтрации (передаем request)
-            user_fio = get_user_fio_for_certificate_matching(request)
+            user_fio = await get_user_fio_for_certificate_matching(request)
             logger.info(f"ФИО пользователя для фильтрации: '{user_fio}' (username: {current_username})")
             
             # Фильтруем сертификаты, если не включен режим показа всех
@@ -741,4 +744,28 @@ async def change_password(request: Request):
             "message": f"Ошибка при смене пароля: {str(e)}"
         }
 
+@api_router.get("/previews/{key}")
+async def get_preview(key: str, request: Request):
+    """Отдает превью документа из дискового кеша"""
+    if not re.fullmatch(r'[0-9a-f]{40}', key):
+        return Response(status_code=404)
+
+    if not get_user_from_request(request):
+        return Response(status_code=401)
+
+    path = preview_cache.path_for_key(key)
+    if path is None:
+        return Response(status_code=404)
+
+    # Ключ однозначно определяет файл документа, поэтому содержимое по ключу не меняется
+    etag = f'"{key}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'private, max-age=604800, immutable',
+    }
+    if request.headers.get('If-None-Match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, headers=headers)
+
 router = api_router
\ No newline at end of file
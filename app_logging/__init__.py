@@ -1,6 +1,7 @@
 # logging/__init__.py
 from .logger import get_logger, setup_logging, log_function_call
 from .handlers import DatabaseLogHandler, JSONFormatter, ContextFilter
+from .hot_path import LazyMessage, LogSummary, RateLimitFilter, lazy, log_summary, mask_secret
 from config.settings import LogLevel, LogHandler, DatabaseType
 
 __all__ = [
@@ -10,6 +11,12 @@ __all__ = [
     'DatabaseLogHandler',
     'JSONFormatter',
     'ContextFilter',
+    'LazyMessage',
+    'LogSummary',
+    'RateLimitFilter',
+    'lazy',
+    'log_summary',
+    'mask_secret',
     'LogLevel',
     'LogHandler',
     'DatabaseType'
@@ -1,15 +1,32 @@
 # logging/database/base.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple, TypeVar
 from datetime import datetime
+import threading
+import time
+
+T = TypeVar('T')
 
 
 class DatabaseAdapter(ABC):
-    """Абстрактный базовый класс для адаптеров баз данных"""
+    """
+    Абстрактный базовый класс для адаптеров баз данных
+    
+    Адаптер держит одно долгоживущее соединение вместо открытия нового на каждый
+    батч логов. Соединение проверяется после простоя и переоткрывается после разрыва.
+    """
+    
+    # Время простоя в секундах, после которого соединение проверяется перед использованием
+    HEALTH_CHECK_INTERVAL = 30.0
     
     def __init__(self, config: Dict[str, Any], table_name: str = 'application_logs'):
         self.config = config
         self.table_name = table_name
+        self._connection = None
+        self._last_used = 0.0
+        self._lock = threading.RLock()
+        self.connects = 0
         self._create_table()
     
     @abstractmethod
@@ -24,7 +41,7 @@ class DatabaseAdapter(ABC):
     
     @abstractmethod
     def get_connection(self):
-        """Получает соединение с базой данных"""
+        """Открывает новое соединение с базой данных"""
         pass
     
     @abstractmethod
@@ -32,58 +49,140 @@ class DatabaseAdapter(ABC):
         """Закрывает соединение с базой данных"""
         pass
     
+    def _is_disconnect(self, error: Exception) -> bool:
+        """Проверяет, означает ли ошибка потерю соединения"""
+        return False
+    
+    def _ping(self, connection) -> None:
+        """Проверяет, что соединение живо (выбрасывает исключение, если нет)"""
+        cur = connection.cursor()
+        try:
+            cur.execute("SELECT 1")
+            cur.fetchone()
+        finally:
+            cur.close()
+        connection.rollback()
+    
+    def _drop_connection(self) -> None:
+        connection, self._connection = self._connection, None
+        try:
+            self.close_connection(connection)
+        except Exception:
+            pass
+    
+    def _ensure_connection(self):
+        if self._connection is not None and time.monotonic() - self._last_used > self.HEALTH_CHECK_INTERVAL:
+            try:
+                self._ping(self._connection)
+            except Exception:
+                self._drop_connection()
+        
+        if self._connection is None or getattr(self._connection, 'closed', False):
+            self._connection = self.get_connection()
+            self.connects += 1
+        return self._connection
+    
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Выдает долгоживущее соединение адаптера
+        
+        Соединение используется одним потоком за раз. При ошибке незавершенная
+        транзакция откатывается, а разорванное соединение закрывается.
+        """
+        with self._lock:
+            conn = self._ensure_connection()
+            try:
+                yield conn
+            except Exception as e:
+                if self._is_disconnect(e):
+                    self._drop_connection()
+                else:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        self._drop_connection()
+                raise
+            finally:
+                self._last_used = time.monotonic()
+    
+    def _execute(self, func: Callable[[Any], T]) -> T:
+        """Вызывает func(conn) на долгоживущем соединении, повторяя один раз после разрыва соединения"""
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    return func(conn)
+            except Exception as e:
+                if attempt or not self._is_disconnect(e):
+                    raise
+    
+    def close(self) -> None:
+        """Закрывает долгоживущее соединение"""
+        with self._lock:
+            if self._connection is not None:
+                self._drop_connection()
+    
     def test_connection(self) -> bool:
         """Тестирует соединение с базой данных"""
         try:
-            conn = self.get_connection()
-            self.close_connection(conn)
+            self._execute(self._ping)
             return True
         except Exception:
             return False
     
     def get_logs(self, limit: int = 100, offset: int = 0, 
-                 level: Optional[str] = None, logger: Optional[str] = None) -> List[Dict[str, Any]]:
+                 level: Optional[str] = None, logger: Optional[str] = None,
+                 before: Optional[Tuple[datetime, int]] = None) -> List[Dict[str, Any]]:
         """
-        Получает логи из базы данных
+        Получает логи из базы данных, от новых к старым
         
         Args:
             limit: Максимальное количество записей
-            offset: Смещение для пагинации
+            offset: Смещение для пагинации (не используется вместе с before)
             level: Фильтр по уровню логирования
             logger: Фильтр по имени логгера
+            before: Курсор (timestamp, id) последней записи предыдущей страницы:
+                возвращаются записи старше него
             
         Returns:
             Список логов
         """
-        try:
-            conn = self.get_connection()
+        query = f"SELECT * FROM {self.table_name}"
+        params = []
+        conditions = []
+        
+        if level:
+            conditions.append("level = ?")
+            params.append(level)
+        
+        if logger:
+            conditions.append("logger = ?")
+            params.append(logger)
+        
+        if before:
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(before)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        params.append(limit)
+        if offset and not before:
+            query += " OFFSET ?"
+            params.append(offset)
+        
+        def select(conn) -> List[Dict[str, Any]]:
             cursor = conn.cursor()
-            
-            query = f"SELECT * FROM {self.table_name}"
-            params = []
-            conditions = []
-            
-            if level:
-                conditions.append("level = ?")
-                params.append(level)
-            
-            if logger:
-                conditions.append("logger = ?")
-                params.append(logger)
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += " ORDER BY timestamp DESC LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            columns = [description[0] for description in cursor.description]
-            logs = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            
-            self.close_connection(conn)
-            return logs
-            
+            try:
+                cursor.execute(query, params)
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        
+        try:
+            return self._execute(select)
         except Exception as e:
             print(f"Ошибка получения логов: {e}")
             return []
@@ -98,25 +197,24 @@ class DatabaseAdapter(ABC):
         Returns:
             True если очистка прошла успешно
         """
-        try:
-            conn = self.get_connection()
+        def delete(conn) -> int:
             cursor = conn.cursor()
-            
-            # SQL зависит от типа БД, переопределяется в наследниках
-            cursor.execute(f"""
-                DELETE FROM {self.table_name} 
-                WHERE timestamp < datetime('now', '-{days} days')
-            """)
-            
-            deleted_count = cursor.rowcount
-            conn.commit()
-            self.close_connection(conn)
-            
+            try:
+                # SQL зависит от типа БД, переопределяется в наследниках
+                cursor.execute(f"""
+                    DELETE FROM {self.table_name} 
+                    WHERE timestamp < datetime('now', '-{days} days')
+                """)
+                conn.commit()
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        
+        try:
+            deleted_count = self._execute(delete)
             print(f"Удалено {deleted_count} старых записей логов")
             return True
             
         except Exception as e:
             print(f"Ошибка очистки старых логов: {e}")
             return False
-
-
@@ -1,135 +1,304 @@
 # logging/database/postgresql_adapter.py
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import io
+import json
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from .base import DatabaseAdapter
+from config.settings import LogPartitionInterval
+
+# Колонки таблицы логов в порядке передачи в COPY
+LOG_COLUMNS = (
+    'timestamp', 'level', 'logger', 'module', 'function', 'line', 'message',
+    'thread_name', 'process_id', 'exception', 'extra_data'
+)
+
+# Экранирование спецсимволов текстового формата COPY
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\x00': None})
+
+
+def _copy_value(value: Any) -> str:
+    """Представляет значение в текстовом формате COPY (NULL - \\N)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return str(value).translate(_COPY_ESCAPES)
 
 
 class PostgreSQLAdapter(DatabaseAdapter):
-    """Адаптер для работы с PostgreSQL"""
+    """
+    Адаптер для работы с PostgreSQL
+    
+    Таблица логов секционирована по диапазону timestamp (по дням или неделям).
+    Секции создаются заранее, а очистка старых логов удаляет секции целиком
+    вместо DELETE по всей таблице.
+    """
+    
+    # Таблица создана как секционированная (False - для таблицы, созданной ранее без секций)
+    partitioned = False
+    # Граница, до которой секции уже созданы
+    _partitions_until: Optional[datetime] = None
+    
+    @property
+    def partition_step(self) -> timedelta:
+        """Длина периода одной секции"""
+        interval = LogPartitionInterval(self.config.get('partition_interval', LogPartitionInterval.DAY))
+        return timedelta(weeks=1) if interval == LogPartitionInterval.WEEK else timedelta(days=1)
     
     def _create_table(self) -> None:
-        """Создает таблицу для логов если она не существует"""
+        """Создает секционированную таблицу для логов если она не существует"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 with conn.cursor() as cur:
-                    cur.execute(f"""
-                        CREATE TABLE IF NOT EXISTS {self.table_name} (
-                            id SERIAL PRIMARY KEY,
-                            timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
-                            level VARCHAR(20) NOT NULL,
-                            logger VARCHAR(255) NOT NULL,
-                            module VARCHAR(255),
-                            function VARCHAR(255),
-                            line INTEGER,
-                            message TEXT NOT NULL,
-                            thread_name VARCHAR(255),
-                            process_id INTEGER,
-                            exception TEXT,
-                            extra_data JSONB
-                        );
-                        
-                        CREATE INDEX IF NOT EXISTS idx_{self.table_name}_timestamp 
-                        ON {self.table_name} (timestamp);
-                        
-                        CREATE INDEX IF NOT EXISTS idx_{self.table_name}_level 
-                        ON {self.table_name} (level);
-                        
-                        CREATE INDEX IF NOT EXISTS idx_{self.table_name}_logger 
-                        ON {self.table_name} (logger);
-                    """)
-                    conn.commit()
+                    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (self.table_name,))
+                    row = cur.fetchone()
+                    if row and row[0] != 'p':
+                        print(f"Таблица логов {self.table_name} создана без секционирования: "
+                              f"очистка выполняется через DELETE. Для секционирования переименуйте таблицу, "
+                              f"новая будет создана при запуске")
+                    else:
+                        cur.execute(f"""
+                            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                                id BIGSERIAL,
+                                timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+                                level VARCHAR(20) NOT NULL,
+                                logger VARCHAR(255) NOT NULL,
+                                module VARCHAR(255),
+                                function VARCHAR(255),
+                                line INTEGER,
+                                message TEXT NOT NULL,
+                                thread_name VARCHAR(255),
+                                process_id INTEGER,
+                                exception TEXT,
+                                extra_data JSONB,
+                                PRIMARY KEY (timestamp, id)
+                            ) PARTITION BY RANGE (timestamp);
+                            
+                            CREATE TABLE IF NOT EXISTS {self.table_name}_default
+                            PARTITION OF {self.table_name} DEFAULT;
+                            
+                            CREATE INDEX IF NOT EXISTS idx_{self.table_name}_level 
+                            ON {self.table_name} (level, timestamp);
+                            
+                            CREATE INDEX IF NOT EXISTS idx_{self.table_name}_logger 
+                            ON {self.table_name} (logger, timestamp);
+                        """)
+                        self.partitioned = True
+                conn.commit()
+            
+            if self.partitioned:
+                self.ensure_partitions()
         except Exception as e:
             print(f"Ошибка создания таблицы логов PostgreSQL: {e}")
     
+    def _period_start(self, moment: datetime) -> datetime:
+        """Начало периода секции, содержащего moment (в UTC)"""
+        moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self.partition_step == timedelta(weeks=1):
+            start -= timedelta(days=start.weekday())
+        return start
+    
+    def _partition_name(self, start: datetime) -> str:
+        return f"{self.table_name}_p{start:%Y%m%d}"
+    
+    def _partition_start(self, name: str) -> Optional[datetime]:
+        """Начало периода секции по ее имени (None для секции по умолчанию и чужих таблиц)"""
+        prefix = f"{self.table_name}_p"
+        if not name.startswith(prefix):
+            return None
+        try:
+            return datetime.strptime(name[len(prefix):], '%Y%m%d').replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+    
+    def ensure_partitions(self, now: Optional[datetime] = None) -> None:
+        """
+        Создает секции для текущего, предыдущего и partitions_ahead следующих периодов
+        
+        Записи, для которых секции нет, попадают в секцию по умолчанию.
+        """
+        step = self.partition_step
+        current = self._period_start(now or datetime.now(timezone.utc))
+        ahead = int(self.config.get('partitions_ahead', 3))
+        
+        def create(conn) -> None:
+            for i in range(-1, ahead + 1):
+                start = current + i * step
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(f"""
+                            CREATE TABLE IF NOT EXISTS {self._partition_name(start)}
+                            PARTITION OF {self.table_name}
+                            FOR VALUES FROM ('{start.isoformat()}') TO ('{(start + step).isoformat()}')
+                        """)
+                    conn.commit()
+                except psycopg2.Error as e:
+                    # Например, в секции по умолчанию уже есть записи за этот период
+                    conn.rollback()
+                    print(f"Не удалось создать секцию логов {self._partition_name(start)}: {e}")
+        
+        self._execute(create)
+        self._partitions_until = current + (ahead + 1) * step
+    
     def get_connection(self):
-        """Получает соединение с PostgreSQL"""
+        """Открывает новое соединение с PostgreSQL"""
         return psycopg2.connect(
             host=self.config['host'],
             port=self.config['port'],
             database=self.config['database'],
             user=self.config['username'],
-            password=self.config['password']
+            password=self.config['password'],
+            connect_timeout=10,
+            # TCP keepalive, чтобы разрыв простаивающего соединения обнаруживался сервером и клиентом
+            keepalives=1,
+            keepalives_idle=60,
+            keepalives_interval=10,
+            keepalives_count=3
         )
     
+    def _is_disconnect(self, error: Exception) -> bool:
+        """Ошибки psycopg2 уровня соединения (разрыв, перезапуск сервера)"""
+        return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+    
     def close_connection(self, connection) -> None:
         """Закрывает соединение с PostgreSQL"""
         if connection:
             connection.close()
     
     def insert_logs(self, logs: List[Dict[str, Any]]) -> bool:
-        """Вставляет логи в PostgreSQL"""
+        """
+        Вставляет логи в PostgreSQL одной командой COPY ... FROM STDIN
+        
+        Батч сериализуется в текстовый формат COPY целиком (extra_data - в JSON)
+        и передается серверу одним потоком данных вместо INSERT на каждую запись.
+        """
         if not logs:
             return True
-            
+        
+        if self.partitioned and (self._partitions_until is None
+                                 or datetime.now(timezone.utc) + self.partition_step >= self._partitions_until):
+            try:
+                self.ensure_partitions()
+            except Exception as e:
+                print(f"Ошибка создания секций логов PostgreSQL: {e}")
+        
+        data = ''.join(
+            '\t'.join(_copy_value(log.get(column)) for column in LOG_COLUMNS) + '\n'
+            for log in logs
+        )
+        
+        def copy(conn) -> None:
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY {self.table_name} ({', '.join(LOG_COLUMNS)}) FROM STDIN",
+                    io.StringIO(data)
+                )
+            conn.commit()
+        
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.executemany(f"""
-                        INSERT INTO {self.table_name} 
-                        (timestamp, level, logger, module, function, line, message, 
-                         thread_name, process_id, exception, extra_data)
-                        VALUES (%(timestamp)s, %(level)s, %(logger)s, %(module)s, 
-                                %(function)s, %(line)s, %(message)s, %(thread_name)s, 
-                                %(process_id)s, %(exception)s, %(extra_data)s)
-                    """, logs)
-                    conn.commit()
+            self._execute(copy)
             return True
         except Exception as e:
             print(f"Ошибка записи логов в PostgreSQL: {e}")
             return False
     
     def get_logs(self, limit: int = 100, offset: int = 0, 
-                 level: Optional[str] = None, logger: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Получает логи из PostgreSQL"""
+                 level: Optional[str] = None, logger: Optional[str] = None,
+                 before: Optional[Tuple[datetime, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Получает логи из PostgreSQL, от новых к старым
+        
+        Для постраничного просмотра передавайте before - (timestamp, id) последней
+        записи предыдущей страницы: такая выборка идет по индексу и не зависит от
+        номера страницы, в отличие от offset.
+        """
+        query = f"SELECT * FROM {self.table_name}"
+        params = []
+        conditions = []
+        
+        if level:
+            conditions.append("level = %s")
+            params.append(level)
+        
+        if logger:
+            conditions.append("logger = %s")
+            params.append(logger)
+        
+        if before:
+            conditions.append("(timestamp, id) < (%s, %s)")
+            params.extend(before)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " ORDER BY timestamp DESC, id DESC LIMIT %s"
+        params.append(limit)
+        if offset and not before:
+            query += " OFFSET %s"
+            params.append(offset)
+        
+        def select(conn) -> List[Dict[str, Any]]:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                logs = [dict(row) for row in cur.fetchall()]
+            # Завершаем транзакцию чтения, чтобы соединение не простаивало в "idle in transaction"
+            conn.commit()
+            return logs
+        
         try:
-            with self.get_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    query = f"SELECT * FROM {self.table_name}"
-                    params = []
-                    conditions = []
-                    
-                    if level:
-                        conditions.append("level = %s")
-                        params.append(level)
-                    
-                    if logger:
-                        conditions.append("logger = %s")
-                        params.append(logger)
-                    
-                    if conditions:
-                        query += " WHERE " + " AND ".join(conditions)
-                    
-                    query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
-                    params.extend([limit, offset])
-                    
-                    cur.execute(query, params)
-                    logs = [dict(row) for row in cur.fetchall()]
-                    
-                    return logs
-                    
+            return self._execute(select)
         except Exception as e:
             print(f"Ошибка получения логов из PostgreSQL: {e}")
             return []
     
     def cleanup_old_logs(self, days: int = 30) -> bool:
-        """Удаляет старые логи из PostgreSQL"""
+        """
+        Удаляет старые логи из PostgreSQL
+        
+        Секции, период которых целиком старше days дней, удаляются через DROP TABLE.
+        В секции по умолчанию старые записи удаляются через DELETE.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+        step = self.partition_step
+        
+        def drop_partitions(conn) -> int:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = to_regclass(%s)
+                """, (self.table_name,))
+                expired = [
+                    name for name, in cur.fetchall()
+                    if (start := self._partition_start(name)) is not None and start + step <= cutoff
+                ]
+                for name in expired:
+                    cur.execute(f"DROP TABLE IF EXISTS {name}")
+                cur.execute(f"DELETE FROM {self.table_name}_default WHERE timestamp < %s", (cutoff,))
+            conn.commit()
+            return len(expired)
+        
+        def delete(conn) -> int:
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM {self.table_name} WHERE timestamp < %s", (cutoff,))
+                deleted_count = cur.rowcount
+            conn.commit()
+            return deleted_count
+        
         try:
-            with self.get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(f"""
-                        DELETE FROM {self.table_name} 
-                        WHERE timestamp < NOW() - INTERVAL '{days} days'
-                    """)
-                    
-                    deleted_count = cur.rowcount
-                    conn.commit()
-                    
-                    print(f"Удалено {deleted_count} старых записей логов из PostgreSQL")
-                    return True
-                    
+            if self.partitioned:
+                dropped = self._execute(drop_partitions)
+                print(f"Удалено {dropped} старых секций логов из PostgreSQL")
+            else:
+                deleted_count = self._execute(delete)
+                print(f"Удалено {deleted_count} старых записей логов из PostgreSQL")
+            return True
+            
         except Exception as e:
             print(f"Ошибка очистки старых логов из PostgreSQL: {e}")
             return False
-
-
@@ -19,7 +19,7 @@ class SQLiteAdapter(DatabaseAdapter):
     def _create_table(self) -> None:
         """Создает таблицу для логов если она не существует"""
         try:
-            with self.get_connection() as conn:
+            with self.connection() as conn:
                 cur = conn.cursor()
                 cur.execute(f"""
                     CREATE TABLE IF NOT EXISTS {self.table_name} (
@@ -48,8 +48,17 @@ class SQLiteAdapter(DatabaseAdapter):
             print(f"Ошибка создания таблицы логов SQLite: {e}")
     
     def get_connection(self):
-        """Получает соединение с SQLite"""
-        return sqlite3.connect(self.config['sqlite_path'])
+        """
+        Открывает новое соединение с SQLite
+        
+        Соединение создается в одном потоке, а используется фоновым потоком записи
+        логов, поэтому проверка потока отключена: доступ сериализуется блокировкой адаптера.
+        """
+        return sqlite3.connect(self.config['sqlite_path'], timeout=10, check_same_thread=False)
+    
+    def _is_disconnect(self, error: Exception) -> bool:
+        """Соединение было закрыто (sqlite3.ProgrammingError: Cannot operate on a closed database)"""
+        return isinstance(error, sqlite3.ProgrammingError) and 'closed' in str(error)
     
     def close_connection(self, connection) -> None:
         """Закрывает соединение с SQLite"""
@@ -61,41 +70,41 @@ class SQLiteAdapter(DatabaseAdapter):
         if not logs:
             return True
             
+        # Подготавливаем данные для SQLite
+        prepared_logs = []
+        for log in logs:
+            prepared_log = log.copy()
+            # Конвертируем JSONB в строку для SQLite
+            if 'extra_data' in prepared_log and prepared_log['extra_data']:
+                prepared_log['extra_data'] = json.dumps(prepared_log['extra_data'])
+            prepared_logs.append(prepared_log)
+        
+        def insert(conn) -> None:
+            conn.executemany(f"""
+                INSERT INTO {self.table_name} 
+                (timestamp, level, logger, module, function, line, message, 
+                 thread_name, process_id, exception, extra_data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    log['timestamp'],
+                    log['level'],
+                    log['logger'],
+                    log['module'],
+                    log['function'],
+                    log['line'],
+                    log['message'],
+                    log['thread_name'],
+                    log['process_id'],
+                    log['exception'],
+                    log['extra_data']
+                ) for log in prepared_logs
+            ])
+            conn.commit()
+        
         try:
-            with self.get_connection() as conn:
-                cur = conn.cursor()
-                
-                # Подготавливаем данные для SQLite
-                prepared_logs = []
-                for log in logs:
-                    prepared_log = log.copy()
-                    # Конвертируем JSONB в строку для SQLite
-                    if 'extra_data' in prepared_log and prepared_log['extra_data']:
-                        prepared_log['extra_data'] = json.dumps(prepared_log['extra_data'])
-                    prepared_logs.append(prepared_log)
-                
-                cur.executemany(f"""
-                    INSERT INTO {self.table_name} 
-                    (timestamp, level, logger, module, function, line, message, 
-                     thread_name, process_id, exception, extra_data)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, [
-                    (
-                        log['timestamp'],
-                        log['level'],
-                        log['logger'],
-                        log['module'],
-                        log['function'],
-                        log['line'],
-                        log['message'],
-                        log['thread_name'],
-                        log['process_id'],
-                        log['exception'],
-                        log['extra_data']
-                    ) for log in prepared_logs
-                ])
-                conn.commit()
+            self._execute(insert)
             return True
         except Exception as e:
             print(f"Ошибка записи логов в SQLite: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -3,15 +3,19 @@ import json
 import logging
 import logging.handlers
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Deque, Dict, List, Optional
 from pathlib import Path
+from collections import Counter, deque
 import threading
-from queue import Queue, Empty
 import time
 import os
 
 from .database import DatabaseAdapterFactory
-from config.settings import DatabaseType
+from .spool import LogSpool
+from config.settings import DatabaseType, LogDropPolicy
+
+# Числовые значения уровней логирования по имени
+_LEVELS = {name: logging.getLevelName(name) for name in ('CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG', 'NOTSET')}
 
 
 class ContextFilter(logging.Filter):
@@ -58,7 +62,14 @@ class JSONFormatter(logging.Formatter):
 
 
 class DatabaseLogHandler(logging.Handler):
-    """Обработчик для записи логов в базу данных"""
+    """
+    Обработчик для записи логов в базу данных
+    
+    Записи накапливаются в ограниченной очереди в памяти и пишутся в БД батчами
+    фоновым потоком. При переполнении очереди отбрасываются записи согласно
+    drop_policy. Пока БД недоступна, батчи сохраняются в дисковый спул и
+    загружаются в БД после ее восстановления.
+    """
     
     def __init__(self, db_config, table_name='application_logs', batch_size=100, flush_interval=5):
         super().__init__()
@@ -67,10 +78,27 @@ class DatabaseLogHandler(logging.Handler):
         self.table_name = table_name
         self.batch_size = batch_size
         self.flush_interval = flush_interval
-        self.log_queue = Queue()
-        self.batch = []
+        self.queue_size = getattr(db_config, 'queue_size', 10000)
+        self.drop_policy = LogDropPolicy(getattr(db_config, 'drop_policy', LogDropPolicy.OLDEST))
+        self.retry_interval = getattr(db_config, 'retry_interval', 30.0)
+        self.log_queue: Deque[Dict[str, Any]] = deque()
         self.last_flush = time.time()
-        self.lock = threading.Lock()
+        self._queue_lock = threading.Lock()
+        self.not_empty = threading.Condition(self._queue_lock)
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._retry_at = 0.0
+        # Количество записей каждого уровня в очереди (для политики LOWEST_LEVEL)
+        self._level_counts: Counter = Counter()
+        # Статистика: строк записано/потеряно, число батчей и суммарное время записи,
+        # поставлено в очередь/отброшено при переполнении/сохранено в спул/загружено из спула
+        self.stats = {
+            'written': 0, 'failed': 0, 'batches': 0, 'write_time': 0.0, 'last_rows_per_sec': 0.0,
+            'enqueued': 0, 'dropped': 0, 'spooled': 0, 'replayed': 0,
+        }
+        
+        spool_dir = getattr(db_config, 'spool_dir', None)
+        self.spool = LogSpool(spool_dir, getattr(db_config, 'spool_max_bytes', 100 * 1024 * 1024)) if spool_dir else None
         
         # Создаем адаптер базы данных
         try:
@@ -108,53 +136,169 @@ class DatabaseLogHandler(logging.Handler):
                 'extra_data': getattr(record, 'extra_fields', None)
             }
             
-            self.log_queue.put(log_data, block=False)
+            with self._queue_lock:
+                if len(self.log_queue) >= self.queue_size and not self._make_room(record.levelno):
+                    self.stats['dropped'] += 1
+                    return
+                self.log_queue.append(log_data)
+                self._level_counts[record.levelno] += 1
+                self.stats['enqueued'] += 1
+                if len(self.log_queue) >= self.batch_size:
+                    self.not_empty.notify()
         except Exception:
             self.handleError(record)
     
+    def _make_room(self, levelno: int) -> bool:
+        """
+        Освобождает место в заполненной очереди согласно drop_policy (вызывается под self._queue_lock)
+        
+        Returns:
+            False, если отбросить нужно саму новую запись
+        """
+        if self.drop_policy == LogDropPolicy.LOWEST_LEVEL:
+            lowest = min(level for level, count in self._level_counts.items() if count)
+            if levelno <= lowest:
+                return False
+            for index, queued in enumerate(self.log_queue):
+                if _LEVELS.get(queued['level'], logging.NOTSET) == lowest:
+                    del self.log_queue[index]
+                    break
+        else:
+            lowest = _LEVELS.get(self.log_queue.popleft()['level'], logging.NOTSET)
+        self._level_counts[lowest] -= 1
+        self.stats['dropped'] += 1
+        return True
+    
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._queue_lock:
+            batch = []
+            while self.log_queue and len(batch) < self.batch_size:
+                log_data = self.log_queue.popleft()
+                self._level_counts[_LEVELS.get(log_data['level'], logging.NOTSET)] -= 1
+                batch.append(log_data)
+            return batch
+    
     def _worker(self):
         """Фоновый поток для записи логов в БД"""
         while True:
             try:
-                # Собираем записи в батч
-                while len(self.batch) < self.batch_size:
-                    try:
-                        log_data = self.log_queue.get(timeout=1)
-                        self.batch.append(log_data)
-                    except Empty:
-                        break
+                with self.not_empty:
+                    if len(self.log_queue) < self.batch_size and not self._closed:
+                        self.not_empty.wait(timeout=max(self.flush_interval, 0.1))
+                    if self._closed:
+                        return
                 
                 # Записываем батч если он заполнен или прошло достаточно времени
-                current_time = time.time()
-                if self.batch and (len(self.batch) >= self.batch_size or 
-                                 current_time - self.last_flush >= self.flush_interval):
-                    self._flush_batch()
+                if len(self.log_queue) >= self.batch_size or time.time() - self.last_flush >= self.flush_interval:
+                    self.flush()
                     
             except Exception as e:
                 print(f"Ошибка в worker потоке логов: {e}")
                 time.sleep(1)
     
-    def _flush_batch(self):
-        """Записывает батч логов в базу данных"""
-        if not self.batch or not self.db_adapter:
+    def flush(self):
+        """Записывает все накопленные записи в БД (или в спул, если БД недоступна)"""
+        if not self.db_adapter:
             return
-            
+        
+        with self._flush_lock:
+            self._replay_spool()
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                self._flush_batch(batch)
+            self.last_flush = time.time()
+    
+    def _insert(self, logs: List[Dict[str, Any]]) -> bool:
+        """Записывает записи в БД с учетом статистики"""
+        started = time.perf_counter()
         try:
-            success = self.db_adapter.insert_logs(self.batch)
-            if success:
-                with self.lock:
-                    self.batch.clear()
-                    self.last_flush = time.time()
+            success = self.db_adapter.insert_logs(logs)
+        except Exception as e:
+            print(f"Ошибка записи логов в БД: {e}")
+            success = False
+        elapsed = time.perf_counter() - started
+        
+        if success:
+            with self._queue_lock:
+                self.stats['written'] += len(logs)
+                self.stats['batches'] += 1
+                self.stats['write_time'] += elapsed
+                self.stats['last_rows_per_sec'] = len(logs) / elapsed if elapsed > 0 else 0.0
+        else:
+            # Следующая попытка записи в БД - не раньше чем через retry_interval
+            self._retry_at = time.monotonic() + self.retry_interval
+        return success
+    
+    def _flush_batch(self, batch: List[Dict[str, Any]]):
+        """Записывает батч логов в базу данных"""
+        if self.spool is not None and (time.monotonic() < self._retry_at or self.spool.has_data()):
+            # БД недоступна или в спуле есть более ранние записи: сохраняем порядок записей
+            self._spool_batch(batch)
+            return
+        
+        if not self._insert(batch):
+            if self.spool is not None:
+                self._spool_batch(batch)
             else:
                 print("Ошибка записи логов в БД")
-                # В случае ошибки очищаем батч чтобы не накапливать память
-                with self.lock:
-                    self.batch.clear()
-                
+                with self._queue_lock:
+                    self.stats['failed'] += len(batch)
+    
+    def _spool_batch(self, batch: List[Dict[str, Any]]):
+        try:
+            spooled, dropped = self.spool.append(batch)
         except Exception as e:
-            print(f"Ошибка записи логов в БД: {e}")
-            with self.lock:
-                self.batch.clear()
+            print(f"Ошибка записи логов в спул: {e}")
+            spooled, dropped = 0, 0
+        with self._queue_lock:
+            self.stats['spooled'] += spooled
+            self.stats['dropped'] += dropped
+            self.stats['failed'] += len(batch) - spooled
+    
+    def _replay_spool(self):
+        """Загружает в БД записи из спула, от старых сегментов к новым"""
+        if self.spool is None or time.monotonic() < self._retry_at:
+            return
+        
+        for segment in self.spool.segments():
+            try:
+                records = self.spool.read(segment)
+            except Exception as e:
+                print(f"Ошибка чтения сегмента спула логов {segment}: {e}")
+                continue
+            if records and not self._insert(records):
+                return
+            self.spool.remove(segment)
+            with self._queue_lock:
+                self.stats['replayed'] += len(records)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Статистика записи логов в БД
+        
+        rows_per_sec - средняя скорость записи (строк в секунду времени записи),
+        last_rows_per_sec - скорость записи последнего батча, queued - записей в очереди.
+        """
+        with self._queue_lock:
+            stats = dict(self.stats)
+            stats['queued'] = len(self.log_queue)
+        stats['rows_per_sec'] = stats['written'] / stats['write_time'] if stats['write_time'] > 0 else 0.0
+        return stats
+    
+    def close(self):
+        """Записывает оставшиеся записи и закрывает соединение адаптера с БД"""
+        with self._queue_lock:
+            self._closed = True
+            self.not_empty.notify_all()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Ошибка записи логов в БД при закрытии: {e}")
+        if self.db_adapter:
+            self.db_adapter.close()
+        super().close()
 
 
 class StructuredLogHandler(logging.Handler):
@@ -0,0 +1,185 @@
+# logging/hot_path.py
+"""
+Логирование в часто выполняемом коде (циклы по элементам, каждый HTTP запрос).
+
+- lazy() - сообщение вычисляется, только если запись действительно выводится
+- mask_secret() - ленивое маскирование токенов и паролей
+- RateLimitFilter - ограничение частоты записей для каждого места вызова
+- log_summary() - одна итоговая строка вместо записи на каждую итерацию цикла
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class LazyMessage:
+    """Значение, вычисляемое при первом преобразовании в строку"""
+
+    __slots__ = ('func', 'args', '_value')
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self.func = func
+        self.args = args
+        self._value: Optional[str] = None
+
+    def __str__(self) -> str:
+        if self._value is None:
+            self._value = str(self.func(*self.args))
+        return self._value
+
+    __repr__ = __str__
+
+
+def lazy(func: Callable[..., Any], *args: Any) -> LazyMessage:
+    """
+    Откладывает вычисление аргумента сообщения до форматирования записи
+
+    Пример: logger.debug('Ответ: %s', lazy(json.dumps, data, indent=2)) не вызывает
+    json.dumps, если уровень DEBUG отключен.
+    """
+    return LazyMessage(func, *args)
+
+
+def _mask(secret: Optional[str], head: int, tail: int) -> str:
+    if not secret:
+        return 'НЕ УКАЗАН'
+    if len(secret) <= head + tail:
+        return '***'
+    return f'{secret[:head]}...{secret[-tail:]}'
+
+
+def mask_secret(secret: Optional[str], head: int = 10, tail: int = 5) -> LazyMessage:
+    """Маскированное значение токена или пароля, вычисляемое только при выводе записи"""
+    return LazyMessage(_mask, secret, head, tail)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничивает частоту записей для каждого места вызова (файл и строка)
+
+    Каждое место вызова получает rate записей в секунду с запасом burst
+    (token bucket). Записи сверх лимита отбрасываются, а следующая пропущенная
+    запись сообщает, сколько было отброшено. Записи уровня выше max_level
+    не ограничиваются.
+
+    Один экземпляр фильтра подключается ко всем обработчикам: решение
+    принимается один раз для записи и используется всеми обработчиками.
+    """
+
+    def __init__(self, rate: float, burst: int = 100, loggers: Iterable[str] = (),
+                 max_level: int = logging.INFO):
+        """
+        Args:
+            rate: Записей в секунду на место вызова
+            burst: Сколько записей подряд пропускается без ограничения
+            loggers: Префиксы имен логгеров, к которым применяется ограничение (пусто - ко всем)
+            max_level: Максимальный ограничиваемый уровень
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.prefixes = tuple(loggers)
+        self.max_level = max_level
+        self.suppressed = 0
+        # Место вызова -> [доступные токены, время последнего обновления, отброшено записей]
+        self._buckets: Dict[Tuple[str, int], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _applies_to(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return False
+        if not self.prefixes:
+            return True
+        return any(record.name == prefix or record.name.startswith(prefix + '.') for prefix in self.prefixes)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        passed = getattr(record, '_rate_limit_passed', None)
+        if passed is None:
+            passed = self._allow(record) if self._applies_to(record) else True
+            record._rate_limit_passed = passed
+        return passed
+
+    def _allow(self, record: logging.LogRecord) -> bool:
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = int(bucket[2]), 0
+
+        if suppressed:
+            record.msg = f'{record.getMessage()} (пропущено похожих сообщений: {suppressed})'
+            record.args = None
+        return True
+
+
+class LogSummary:
+    """
+    Накопитель событий цикла: вместо записи на каждую итерацию выводит одну строку
+
+    Пример:
+        with log_summary(logger, 'Получены пользователи') as summary:
+            for user in users:
+                summary.add(user['username'])
+        # INFO Получены пользователи: 20 (alice, bob, carol, dave, eve и еще 15)
+    """
+
+    def __init__(self, logger: logging.Logger, title: str, level: int = logging.INFO, max_items: int = 5):
+        self.logger = logger
+        self.title = title
+        self.level = level
+        self.max_items = max_items
+        self.enabled = logger.isEnabledFor(level)
+        self.count = 0
+        self.items: List[Any] = []
+        self.categories: Counter = Counter()
+
+    def add(self, item: Any = None, category: Optional[str] = None) -> None:
+        """
+        Учитывает событие
+
+        Args:
+            item: Элемент для примера в итоговой строке (сохраняются первые max_items)
+            category: Категория, по которой ведется отдельный счетчик (например, 'ошибка')
+        """
+        self.count += 1
+        if category is not None:
+            self.categories[category] += 1
+        if item is not None and self.enabled and len(self.items) < self.max_items:
+            self.items.append(item)
+
+    def emit(self, stacklevel: int = 2) -> None:
+        """Выводит итоговую строку"""
+        if not self.enabled:
+            return
+        message = f'{self.title}: {self.count}'
+        if self.categories:
+            message += ' [' + ', '.join(f'{name}: {count}' for name, count in self.categories.items()) + ']'
+        if self.items:
+            message += ' (' + ', '.join(str(item) for item in self.items)
+            if self.count > len(self.items):
+                message += f' и еще {self.count - len(self.items)}'
+            message += ')'
+        self.logger.log(self.level, message, stacklevel=stacklevel)
+
+    def __enter__(self) -> 'LogSummary':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.emit(stacklevel=3)
+
+
+def log_summary(logger: logging.Logger, title: str, level: int = logging.INFO, max_items: int = 5) -> LogSummary:
+    """Создает накопитель событий цикла (см. LogSummary)"""
+    return LogSummary(logger, title, level, max_items)
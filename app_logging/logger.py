@@ -8,6 +8,7 @@ import sys
 import threading
 
 from .handlers import DatabaseLogHandler, JSONFormatter, ContextFilter, StructuredLogHandler
+from .hot_path import RateLimitFilter
 from config.settings import config, LogLevel, LogHandler
 
 
@@ -73,11 +74,20 @@ class LoggerManager:
         # Добавляем фильтр шума
         noise_filter = NoiseFilter()
         
+        # Ограничение частоты записей в часто выполняемом коде (общее для всех обработчиков)
+        rate_limit_filter = None
+        if log_config.rate_limit > 0:
+            rate_limit_filter = RateLimitFilter(
+                log_config.rate_limit, log_config.rate_limit_burst, log_config.rate_limit_loggers
+            )
+        
         # Добавляем обработчики в зависимости от конфигурации
         for handler_type in log_config.handlers:
             handler = self._create_handler(handler_type, log_config)
             if handler:
                 handler.addFilter(noise_filter)  # Добавляем фильтр
+                if rate_limit_filter:
+                    handler.addFilter(rate_limit_filter)
                 root_logger.addHandler(handler)
     
     def _create_handler(self, handler_type: LogHandler, log_config) -> Optional[logging.Handler]:
@@ -0,0 +1,101 @@
+# logging/spool.py
+"""
+Дисковый спул записей логов на время недоступности базы данных.
+
+Записи дописываются в сегменты (файлы JSON Lines) и после восстановления БД
+загружаются обратно посегментно, от старых к новым. Сегменты переживают
+перезапуск приложения. Размер спула ограничен: при переполнении удаляются
+самые старые сегменты.
+"""
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class LogSpool:
+    """Спул записей логов в сегментах на диске (используется одним потоком)"""
+
+    def __init__(self, directory: str, max_bytes: int = 100 * 1024 * 1024, segment_bytes: int = 4 * 1024 * 1024):
+        """
+        Args:
+            directory: Каталог сегментов
+            max_bytes: Максимальный суммарный размер сегментов
+            segment_bytes: Размер сегмента, после которого начинается новый
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self._current: Path = None
+
+    def segments(self) -> List[Path]:
+        """Сегменты от старых к новым"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob('segment-*.jsonl'))
+
+    def has_data(self) -> bool:
+        return bool(self.segments())
+
+    def size(self) -> int:
+        return sum(segment.stat().st_size for segment in self.segments())
+
+    def append(self, records: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Дописывает записи в текущий сегмент
+
+        Returns:
+            Кортеж (записано записей, удалено записей из старых сегментов при переполнении)
+        """
+        data = ''.join(json.dumps(record, ensure_ascii=False, default=_encode) + '\n' for record in records)
+        encoded = data.encode('utf-8')
+        if len(encoded) > self.max_bytes:
+            return 0, 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        dropped = 0
+        segments = self.segments()
+        total = sum(segment.stat().st_size for segment in segments)
+        while segments and total + len(encoded) > self.max_bytes:
+            oldest = segments.pop(0)
+            total -= oldest.stat().st_size
+            dropped += self._count(oldest)
+            self.remove(oldest)
+
+        if self._current is None or not self._current.exists() or self._current.stat().st_size >= self.segment_bytes:
+            self._current = self.directory / f'segment-{time.time_ns():020d}.jsonl'
+        with open(self._current, 'ab') as f:
+            f.write(encoded)
+        return len(records), dropped
+
+    def read(self, segment: Path) -> List[Dict[str, Any]]:
+        """Читает записи сегмента (поврежденные строки пропускаются)"""
+        records = []
+        with open(segment, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('timestamp'):
+                    record['timestamp'] = datetime.fromisoformat(record['timestamp'])
+                records.append(record)
+        return records
+
+    def remove(self, segment: Path) -> None:
+        """Удаляет сегмент"""
+        segment.unlink(missing_ok=True)
+        if segment == self._current:
+            self._current = None
+
+    @staticmethod
+    def _count(segment: Path) -> int:
+        with open(segment, 'rb') as f:
+            return sum(1 for _ in f)
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
@@ -1,5 +1,7 @@
-from ldap3 import Server, Connection, SUBTREE, ALL, MODIFY_REPLACE
+from ldap3 import SUBTREE, MODIFY_REPLACE
+from ldap3.utils.conv import escape_filter_chars
 from models import UserSession, AuthResponse, LDAPUser, User
+from auth.ldap_pool import get_ldap_pool
 from config.settings import config
 from datetime import datetime
 import secrets
@@ -24,72 +26,90 @@ class LDAPAuthenticator:
         self.admin_dn = config.ldap_user
         self.admin_password = config.ldap_password
         
-        self.server = Server(self.ldap_server, get_info=ALL)
+        # Соединения и потоки общие для всех экземпляров аутентификатора
+        self.pool = get_ldap_pool(self.ldap_server, self.admin_dn, self.admin_password)
+        self.server = self.pool.server
+    
+    def _find_user_with_groups(self, conn, username: str) -> tuple:
+        """
+        Находит пользователя и его группы (блокирующий вызов, выполняется в пуле потоков LDAP)
         
-    async def authenticate_user(self, username: str, password: str) -> AuthResponse:
-        """Аутентификация пользователя через LDAP"""
+        Returns:
+            Кортеж (запись пользователя или None, список групп)
+        """
+        # Поиск пользователя
+        search_filter = f'(uid={username})'
+        conn.search(
+            self.base_dn, 
+            search_filter, 
+            SUBTREE,
+            attributes=['uid', 'cn', 'givenName', 'sn', 'mail', 'description', 'memberOf', 'userPassword']
+        )
+        
+        if not conn.entries:
+            return None, []
+        
+        user_entry = conn.entries[0]
+        
+        # Проверяем группы пользователя
+        # В OpenLDAP с posixGroup нужно искать группы, где memberUid содержит username
+        groups = []
+        
+        # Извлекаем группу из DN, если пользователь находится внутри группы
+        # Например, из "cn=Денис Имполитов,cn=admins,dc=permgp7,dc=ru" извлекаем "admins"
+        user_dn = str(user_entry.entry_dn)
+        dn_parts = user_dn.split(',')
+        for part in dn_parts:
+            if part.startswith('cn=') and part != f'cn={user_entry.cn.value}':
+                # Это не имя пользователя, а группа
+                group_name = part.split('=')[1]
+                if group_name not in groups:
+                    groups.append(group_name)
+                    logger.debug(f'Извлечена группа из DN для пользователя {username}: {group_name}')
+        
+        # Сначала пробуем получить группы через memberOf (для groupOfNames)
+        if hasattr(user_entry, 'memberOf') and user_entry.memberOf:
+            for group_dn in user_entry.memberOf:
+                group_name = str(group_dn).split(',')[0].split('=')[1]
+                if group_name not in groups:
+                    groups.append(group_name)
+        
+        # Дополнительно ищем группы posixGroup, где memberUid содержит username
         try:
-            # Создаем соединение с LDAP сервером
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
-            # Поиск пользователя
-            search_filter = f'(uid={username})'
+            group_search_filter = f'(&(objectClass=posixGroup)(memberUid={username}))'
             conn.search(
-                self.base_dn, 
-                search_filter, 
+                self.base_dn,
+                group_search_filter,
                 SUBTREE,
-                attributes=['uid', 'cn', 'givenName', 'sn', 'mail', 'description', 'memberOf', 'userPassword']
+                attributes=['cn']
             )
             
-            if not conn.entries:
-                return AuthResponse(
-                    success=False,
-                    message='Пользователь не найден'
-                )
-            
-            user_entry = conn.entries[0]
-            
-            # Проверяем группы пользователя
-            # В OpenLDAP с posixGroup нужно искать группы, где memberUid содержит username
-            groups = []
-            
-            # Извлекаем группу из DN, если пользователь находится внутри группы
-            # Например, из "cn=Денис Имполитов,cn=admins,dc=permgp7,dc=ru" извлекаем "admins"
-            user_dn = str(user_entry.entry_dn)
-            dn_parts = user_dn.split(',')
-            for part in dn_parts:
-                if part.startswith('cn=') and part != f'cn={user_entry.cn.value}':
-                    # Это не имя пользователя, а группа
-                    group_name = part.split('=')[1]
-                    if group_name not in groups:
-                        groups.append(group_name)
-                        logger.debug(f'Извлечена группа из DN для пользователя {username}: {group_name}')
-            
-            # Сначала пробуем получить группы через memberOf (для groupOfNames)
-            if hasattr(user_entry, 'memberOf') and user_entry.memberOf:
-                for group_dn in user_entry.memberOf:
-                    group_name = str(group_dn).split(',')[0].split('=')[1]
+            for group_entry in conn.entries:
+                if hasattr(group_entry, 'cn') and group_entry.cn:
+                    group_name = group_entry.cn.value
                     if group_name not in groups:
                         groups.append(group_name)
+                        logger.debug(f'Найдена группа posixGroup для пользователя {username}: {group_name}')
+        except Exception as e:
+            logger.warning(f'Ошибка при поиске групп posixGroup для пользователя {username}: {e}')
+        
+        return user_entry, groups
+    
+    def _check_password(self, user_dn: str, password: str) -> None:
+        """Проверяет пароль пользователя bind'ом от его имени (блокирующий вызов)"""
+        user_conn = self.pool.open_connection(user=user_dn, password=password)
+        user_conn.unbind()
+    
+    async def authenticate_user(self, username: str, password: str) -> AuthResponse:
+        """Аутентификация пользователя через LDAP"""
+        try:
+            user_entry, groups = await self.pool.run(self.pool.call, self._find_user_with_groups, username)
             
-            # Дополнительно ищем группы posixGroup, где memberUid содержит username
-            try:
-                group_search_filter = f'(&(objectClass=posixGroup)(memberUid={username}))'
-                conn.search(
-                    self.base_dn,
-                    group_search_filter,
-                    SUBTREE,
-                    attributes=['cn']
+            if user_entry is None:
+                return AuthResponse(
+                    success=False,
+                    message='Пользователь не найден'
                 )
-                
-                for group_entry in conn.entries:
-                    if hasattr(group_entry, 'cn') and group_entry.cn:
-                        group_name = group_entry.cn.value
-                        if group_name not in groups:
-                            groups.append(group_name)
-                            logger.debug(f'Найдена группа posixGroup для пользователя {username}: {group_name}')
-            except Exception as e:
-                logger.warning(f'Ошибка при поиске групп posixGroup для пользователя {username}: {e}')
             
             logger.info(f'Пользователь {username} состоит в группах: {groups}')
 
@@ -98,8 +118,7 @@ class LDAPAuthenticator:
             user_dn = str(user_entry.entry_dn)
             logger.info(f"Попытка аутентификации пользователя {username} с DN: {user_dn}")
             try:
-                user_conn = Connection(self.server, user=user_dn, password=password, auto_bind=True)
-                user_conn.unbind()
+                await self.pool.run(self._check_password, user_dn, password)
                 
                 # Создаем сессию пользователя
                 description = user_entry.description.value if hasattr(user_entry, 'description') and user_entry.description.value else None
@@ -183,20 +202,14 @@ class LDAPAuthenticator:
     async def get_user_groups(self, username: str) -> list:
         """Получает группы пользователя из LDAP"""
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
-            search_filter = f'(uid={username})'
-            conn.search(
-                self.base_dn, 
-                search_filter, 
-                SUBTREE,
-                attributes=['memberOf']
+            entries = await self.pool.run(
+                self.pool.search, self.base_dn, f'(uid={username})', ['memberOf']
             )
             
-            if not conn.entries:
+            if not entries:
                 return []
             
-            user_entry = conn.entries[0]
+            user_entry = entries[0]
             groups = []
             
             if hasattr(user_entry, 'memberOf') and user_entry.memberOf:
@@ -210,25 +223,28 @@ class LDAPAuthenticator:
             logger.error(f"Ошибка получения групп пользователя {username}: {e}")
             return []
     
-    async def search_users(self, search_term: str = None) -> list:
-        """Поиск пользователей в LDAP"""
+    async def search_users(self, search_term: str = None, limit: Optional[int] = None) -> list:
+        """
+        Поиск пользователей в LDAP для интерактивного ввода
+        
+        Args:
+            search_term: Подстрока логина, имени или фамилии
+            limit: Максимальное количество результатов (по умолчанию config.ldap_search_limit)
+        """
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
             if search_term:
-                search_filter = f'(|(uid=*{search_term}*)(cn=*{search_term}*)(givenName=*{search_term}*)(sn=*{search_term}*))'
+                term = escape_filter_chars(search_term)
+                search_filter = f'(|(uid=*{term}*)(cn=*{term}*)(givenName=*{term}*)(sn=*{term}*))'
             else:
                 search_filter = '(uid=*)'
             
-            conn.search(
-                self.base_dn, 
-                search_filter, 
-                SUBTREE,
-                attributes=['uid', 'cn', 'givenName', 'sn', 'mail']
+            entries = await self.pool.run(
+                self.pool.search, self.base_dn, search_filter, ['uid', 'cn', 'givenName', 'sn', 'mail'],
+                SUBTREE, limit or config.ldap_search_limit
             )
             
             users = []
-            for entry in conn.entries:
+            for entry in entries:
                 try:
                     user = LDAPUser(
                         dn=str(entry.entry_dn),
@@ -236,7 +252,8 @@ class LDAPAuthenticator:
                         cn=entry.cn.value,
                         givenName=entry.givenName.value,
                         sn=entry.sn.value,
-                        email=entry.mail.value if hasattr(entry, 'mail') else None,
+                        destription='',
+                        mail=entry.mail.value if hasattr(entry, 'mail') else None,
                         memberOf=[]
                     )
                     users.append(user)
@@ -251,22 +268,21 @@ class LDAPAuthenticator:
             return []
 
     def get_user_by_login(self, username: str) -> Optional[LDAPUser]:
-        """Получает информацию о пользователе по логину (синхронно)"""
+        """
+        Получает информацию о пользователе по логину (синхронно)
+        
+        Использует соединение из общего пула. Из async кода вызывайте
+        через await self.pool.run(self.get_user_by_login, username).
+        """
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
-            search_filter = f'(uid={username})'
-            conn.search(
-                self.base_dn, 
-                search_filter, 
-                SUBTREE,
-                attributes=['uid', 'cn', 'givenName', 'sn', 'mail', 'description']
+            entries = self.pool.search(
+                self.base_dn, f'(uid={username})', ['uid', 'cn', 'givenName', 'sn', 'mail', 'description']
             )
             
-            if not conn.entries:
+            if not entries:
                 return None
             
-            entry = conn.entries[0]
+            entry = entries[0]
             
             # ИСПРАВЛЕНИЕ: Правильно обрабатываем поля, которые могут отсутствовать или быть None
             email = entry.mail.value if hasattr(entry, 'mail') and entry.mail.value else None
@@ -283,7 +299,6 @@ class LDAPAuthenticator:
                 memberOf=[]
             )
             
-            conn.unbind()
             return user
             
         except Exception as e:
@@ -291,26 +306,26 @@ class LDAPAuthenticator:
             return None
 
     def find_user_by_login(self, username: str) -> Optional[LDAPUser]:
-        """Находит пользователя по логину с использованием широкого поиска"""
+        """
+        Находит пользователя по логину с использованием широкого поиска (синхронно)
+        
+        Из async кода вызывайте через await self.pool.run(self.find_user_by_login, username).
+        """
         try:
             logger.info(f"Широкий поиск пользователя в LDAP: {username}")
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
             
             # Используем широкий поиск, как в search_users
             search_filter = f'(uid=*{username}*)'
             logger.info(f"LDAP широкий фильтр поиска: {search_filter}")
             
-            conn.search(
-                self.base_dn, 
-                search_filter, 
-                SUBTREE,
-                attributes=['uid', 'cn', 'givenName', 'sn', 'mail', 'description']
+            entries = self.pool.search(
+                self.base_dn, search_filter, ['uid', 'cn', 'givenName', 'sn', 'mail', 'description']
             )
             
-            logger.info(f"LDAP широкий поиск найден записей: {len(conn.entries)}")
+            logger.info(f"LDAP широкий поиск найден записей: {len(entries)}")
             
             # Ищем точное совпадение по uid
-            for entry in conn.entries:
+            for entry in entries:
                 if entry.uid.value == username:
                     logger.info(f"LDAP точное совпадение найдено: {entry.entry_dn}")
                     
@@ -328,65 +343,62 @@ class LDAPAuthenticator:
                         destription=description,
                         memberOf=[]
                     )
-                    conn.unbind()
                     return user
             
             logger.warning(f"Пользователь {username} не найден при широком поиске")
-            conn.unbind()
             return None
             
         except Exception as e:
             logger.error(f"Ошибка широкого поиска пользователя {username}: {e}")
             return None
     
-    async def get_users(self) -> List[User]:
-        """Получает всех пользователей из LDAP и возвращает список объектов User"""
+    def _collect_users(self) -> List[User]:
+        """
+        Загружает всех пользователей постраничным поиском (блокирующий вызов)
+        
+        Записи LDAP преобразуются в User по мере получения страниц и не накапливаются в памяти.
+        """
         users = []
+        for entry in self.pool.iter_search(self.base_dn, '(uid=*)', ['uid', 'givenName', 'sn', 'mail']):
+            try:
+                user = User(
+                    login=entry.uid.value,
+                    first_name=entry.givenName.value if hasattr(entry, 'givenName') and entry.givenName.value else '',
+                    last_name=entry.sn.value if hasattr(entry, 'sn') and entry.sn.value else '',
+                    email=entry.mail.value if hasattr(entry, 'mail') and entry.mail.value else None
+                )
+                users.append(user)
+            except Exception as e:
+                logger.warning(f"Ошибка при обработке пользователя из LDAP {entry}: {e}")
+        return users
+    
+    async def get_users(self) -> List[User]:
+        """
+        Получает всех пользователей из LDAP и возвращает список объектов User
+        
+        Полный обход каталога ограничивается LDAP_DIRECTORY_LOAD_TIMEOUT, а не таймаутом
+        интерактивных запросов LDAP_TIMEOUT.
+        """
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            search_filter = '(uid=*)'
-            conn.search(
-                self.base_dn,
-                search_filter,
-                search_scope=SUBTREE,
-                attributes=['uid', 'givenName', 'sn', 'mail']
-            )
-            
-            for entry in conn.entries:
-                try:
-                    user = User(
-                        login=entry.uid.value,
-                        first_name=entry.givenName.value if hasattr(entry, 'givenName') and entry.givenName.value else '',
-                        last_name=entry.sn.value if hasattr(entry, 'sn') and entry.sn.value else '',
-                        email=entry.mail.value if hasattr(entry, 'mail') and entry.mail.value else None
-                    )
-                    users.append(user)
-                except Exception as e:
-                    logger.warning(f"Ошибка при обработке пользователя из LDAP {entry}: {e}")
-            
-            conn.unbind()
-            return users
-            
+            return await self.pool.run_with_timeout(config.ldap_directory_load_timeout or None, self._collect_users)
         except Exception as e:
             logger.error(f"Ошибка подключения к LDAP серверу при получении пользователей: {e}")
-            return users
+            return []
     
     def get_groups(self) -> List[Dict[str, Any]]:
-        """Получает все группы posixGroup из LDAP"""
+        """
+        Получает все группы posixGroup из LDAP (синхронно, через соединение из общего пула)
+        
+        Из async кода вызывайте через await self.pool.run(self.get_groups).
+        """
         search_filter = '(objectClass=posixGroup)'
         attrs = ['cn', 'memberUid', 'description']
         groups = []
         
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            conn.search(
-                search_base=self.base_dn,
-                search_filter=search_filter,
-                search_scope=SUBTREE,
-                attributes=attrs
-            )
+            entries = self.pool.search(self.base_dn, search_filter, attrs)
             
-            for entry in conn.entries:
+            for entry in entries:
                 try:
                     group = {
                         'cn': entry.cn.value if hasattr(entry, 'cn') and entry.cn.value else '',
@@ -397,42 +409,39 @@ class LDAPAuthenticator:
                 except Exception as e:
                     logger.warning(f"Ошибка при обработке группы из LDAP {entry}: {e}")
             
-            conn.unbind()
             return groups
             
         except Exception as e:
             logger.error(f"Ошибка при получении групп из LDAP: {e}")
             return groups
     
+    def _log_ldap_tree(self, attrs: List[str]) -> int:
+        """Выводит записи LDAP-дерева по мере постраничного получения (блокирующий вызов)"""
+        count = 0
+        for entry in self.pool.iter_search(self.base_dn, '(objectClass=*)', attrs):
+            logger.info(f"📍 DN: {entry.entry_dn}")
+            
+            # Перебираем только те атрибуты, которые есть у записи
+            for attr_name in attrs:
+                if attr_name in entry:
+                    values = entry[attr_name].values
+                    logger.info(f"   {attr_name}: {values}")
+            
+            logger.info("   " + "─" * 40)
+            count += 1
+        return count
+    
     async def browse_ldap(self) -> None:
         """Рекурсивно обходит LDAP-дерево и выводит структуру"""
-        search_filter = '(objectClass=*)'
         attrs = ['objectClass', 'cn', 'ou', 'uid', 'mail', 'sn', 'givenName']
         try:
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            conn.search(
-                self.base_dn,
-                search_filter,
-                search_scope=SUBTREE,
-                attributes=attrs
-            )
-            
-            logger.info(f"\n🔍 Найдено записей в '{self.base_dn}': {len(conn.entries)}\n")
             logger.info(f"\n🌳 Структура начиная с: {self.base_dn}")
             logger.info("─" * 60)
             
-            for entry in conn.entries:
-                logger.info(f"📍 DN: {entry.entry_dn}")
-                
-                # Перебираем только те атрибуты, которые есть у записи
-                for attr_name in attrs:
-                    if attr_name in entry:
-                        values = entry[attr_name].values
-                        logger.info(f"   {attr_name}: {values}")
-                
-                logger.info("   " + "─" * 40)
+            # Полный обход дерева - длительная операция, ограничение как у загрузки каталога
+            count = await self.pool.run_with_timeout(config.ldap_directory_load_timeout or None, self._log_ldap_tree, attrs)
             
-            conn.unbind()
+            logger.info(f"\n🔍 Найдено записей в '{self.base_dn}': {count}\n")
             
         except Exception as e:
             logger.error(f"Ошибка при обходе LDAP: {e}")
@@ -502,32 +511,26 @@ class LDAPAuthenticator:
             Словарь с результатом операции: {'success': bool, 'message': str}
         """
         try:
-            # Сначала проверяем текущий пароль, подключаясь от имени пользователя
-            conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
             # Ищем пользователя
             # DN не является атрибутом, его можно получить из entry.entry_dn
-            search_filter = f'(uid={username})'
-            conn.search(
+            entries = await self.pool.run(
+                self.pool.search,
                 self.base_dn,
-                search_filter,
-                SUBTREE,
-                attributes=['uid']  # Минимальный набор атрибутов для поиска
+                f'(uid={username})',
+                ['uid']  # Минимальный набор атрибутов для поиска
             )
             
-            if not conn.entries:
+            if not entries:
                 return {
                     'success': False,
                     'message': 'Пользователь не найден'
                 }
             
-            user_dn = str(conn.entries[0].entry_dn)
-            conn.unbind()
+            user_dn = str(entries[0].entry_dn)
             
             # Проверяем текущий пароль, подключаясь от имени пользователя
             try:
-                user_conn = Connection(self.server, user=user_dn, password=current_password, auto_bind=True)
-                user_conn.unbind()
+                await self.pool.run(self._check_password, user_dn, current_password)
             except Exception as e:
                 logger.warning(f"Неверный текущий пароль для пользователя {username}: {e}")
                 return {
@@ -535,23 +538,18 @@ class LDAPAuthenticator:
                     'message': 'Неверный текущий пароль'
                 }
             
-            # Подключаемся от имени администратора для изменения пароля
-            admin_conn = Connection(self.server, user=self.admin_dn, password=self.admin_password, auto_bind=True)
-            
-            # Изменяем пароль
+            # Изменяем пароль на служебном соединении
             # В OpenLDAP пароль должен быть захеширован, но ldap3 делает это автоматически
-            admin_conn.modify(user_dn, {'userPassword': [(MODIFY_REPLACE, [new_password])]})
+            result = await self.pool.run(self.pool.call, self._modify_password, user_dn, new_password)
             
-            if admin_conn.result['result'] == 0:
-                admin_conn.unbind()
+            if result['result'] == 0:
                 logger.info(f"Пароль успешно изменен для пользователя {username}")
                 return {
                     'success': True,
                     'message': 'Пароль успешно изменен'
                 }
             else:
-                error_message = admin_conn.result.get('description', 'Неизвестная ошибка')
-                admin_conn.unbind()
+                error_message = result.get('description', 'Неизвестная ошибка')
                 logger.error(f"Ошибка изменения пароля для пользователя {username}: {error_message}")
                 return {
                     'success': False,
@@ -563,4 +561,9 @@ class LDAPAuthenticator:
             return {
                 'success': False,
                 'message': f'Ошибка при изменении пароля: {str(e)}'
-            }
\ No newline at end of file
+            }
+    
+    def _modify_password(self, conn, user_dn: str, new_password: str) -> Dict[str, Any]:
+        """Заменяет userPassword пользователя (блокирующий вызов)"""
+        conn.modify(user_dn, {'userPassword': [(MODIFY_REPLACE, [new_password])]})
+        return dict(conn.result)
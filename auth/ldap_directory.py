@@ -0,0 +1,248 @@
+# auth/ldap_directory.py
+"""
+Снимок каталога LDAP в памяти.
+
+Пользователи (uid -> ФИО, почта, должность) и их группы загружаются из LDAP один
+раз, после чего обновляются инкрементально: запрашиваются только записи, у
+которых modifyTimestamp не меньше последнего известного. Удаленные записи
+инкрементально не обнаруживаются, поэтому раз в full_reload_interval снимок
+загружается целиком.
+
+Страницы получают отображаемые имена пакетно через resolve_display_names
+вместо поиска в LDAP на каждое имя.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app_logging.logger import get_logger
+from config.settings import config
+from models import LDAPUser, User
+
+logger = get_logger(__name__)
+
+
+def format_display_name(user: LDAPUser) -> str:
+    """Формирует отображаемое имя: "Фамилия Имя - Должность" """
+    display_name = ' '.join(filter(None, [user.sn, user.givenName]))
+    if user.destription:
+        display_name += f' - {user.destription}'
+    return display_name or user.uid
+
+
+def _value(entry: Any, name: str) -> Any:
+    """Значение атрибута записи ldap3 или None, если атрибута нет"""
+    return getattr(entry, name).value if hasattr(entry, name) else None
+
+
+def _timestamp(value: Any) -> Optional[str]:
+    """Приводит modifyTimestamp к формату GeneralizedTime для фильтра LDAP"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).strftime('%Y%m%d%H%M%SZ')
+    return str(value) if value else None
+
+
+class LDAPDirectory:
+    """
+    Снимок пользователей и групп LDAP с инкрементальным обновлением
+    """
+
+    USER_ATTRIBUTES = ['uid', 'cn', 'givenName', 'sn', 'mail', 'description', 'modifyTimestamp']
+    GROUP_ATTRIBUTES = ['cn', 'memberUid', 'modifyTimestamp']
+
+    def __init__(self, refresh_interval: float = 60.0, full_reload_interval: float = 3600.0,
+                 load_timeout: Optional[float] = None,
+                 authenticator_factory: Optional[Callable[[], Any]] = None):
+        """
+        Инициализация снимка
+
+        Args:
+            refresh_interval: Время в секундах, после которого снимок обновляется инкрементально
+            full_reload_interval: Время в секундах, после которого снимок загружается целиком
+            load_timeout: Ограничение времени на полную загрузку в секундах (None - без ограничения).
+                Инкрементальные обновления ограничены таймаутом пула LDAP.
+            authenticator_factory: Фабрика LDAPAuthenticator (по умолчанию сам класс)
+        """
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.load_timeout = load_timeout
+        self._authenticator_factory = authenticator_factory
+        self._authenticator = None
+
+        self._users: Dict[str, LDAPUser] = {}
+        self._group_members: Dict[str, Set[str]] = {}
+        self._watermark: Optional[str] = None
+        self._loaded_at: Optional[float] = None
+        self._refreshed_at: Optional[float] = None
+        self._loading: Dict[int, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    @property
+    def is_loaded(self) -> bool:
+        """Снимок хотя бы раз загружен"""
+        return self._loaded_at is not None
+
+    def _get_authenticator(self):
+        if self._authenticator is None:
+            if self._authenticator_factory is None:
+                from auth.ldap_auth import LDAPAuthenticator
+                self._authenticator_factory = LDAPAuthenticator
+            self._authenticator = self._authenticator_factory()
+        return self._authenticator
+
+    async def ensure_fresh(self) -> None:
+        """
+        Загружает или обновляет снимок, если он устарел
+
+        Одновременные вызовы в одном цикле событий выполняют одно обновление.
+        """
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+
+        loop_id = id(asyncio.get_running_loop())
+        task = self._loading.get(loop_id)
+        if task is None:
+            task = asyncio.ensure_future(self._update())
+            self._loading[loop_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(loop_id, None))
+        await asyncio.shield(task)
+
+    async def _update(self) -> None:
+        now = time.monotonic()
+        full = (self._loaded_at is None or self._watermark is None
+                or now - self._loaded_at > self.full_reload_interval)
+        authenticator = self._get_authenticator()
+        since = None if full else self._watermark
+        # Полная загрузка большого каталога может идти дольше интерактивного таймаута LDAP
+        timeout = self.load_timeout if full else authenticator.pool.timeout
+
+        started = time.monotonic()
+        try:
+            user_entries, group_entries = await authenticator.pool.run_with_timeout(
+                timeout, self._fetch, authenticator, since
+            )
+        except Exception:
+            # Имеющийся снимок продолжает использоваться, повторная попытка - через refresh_interval
+            if self.is_loaded:
+                self._refreshed_at = now
+            raise
+        self._apply(user_entries, group_entries, full)
+
+        if full:
+            self._loaded_at = now
+        self._refreshed_at = now
+        logger.info(
+            f'Снимок LDAP {"загружен" if full else "обновлен"} за {time.monotonic() - started:.2f}с: '
+            f'изменено пользователей {len(user_entries)}, групп {len(group_entries)}, всего пользователей {len(self._users)}'
+        )
+
+    def _fetch(self, authenticator, since: Optional[str]) -> Tuple[List[Any], List[Any]]:
+        """Загружает пользователей и группы, измененные начиная с since (блокирующий вызов)"""
+        user_filter = '(uid=*)'
+        group_filter = '(objectClass=posixGroup)'
+        if since:
+            user_filter = f'(&{user_filter}(modifyTimestamp>={since}))'
+            group_filter = f'(&{group_filter}(modifyTimestamp>={since}))'
+
+        pool = authenticator.pool
+        users = pool.search(authenticator.base_dn, user_filter, self.USER_ATTRIBUTES)
+        groups = pool.search(authenticator.base_dn, group_filter, self.GROUP_ATTRIBUTES)
+        return users, groups
+
+    def _apply(self, user_entries: List[Any], group_entries: List[Any], full: bool) -> None:
+        users = {} if full else dict(self._users)
+        group_members = {} if full else dict(self._group_members)
+        watermark = None if full else self._watermark
+
+        for entry in group_entries:
+            cn = _value(entry, 'cn')
+            if cn:
+                group_members[cn] = set(entry.memberUid.values) if hasattr(entry, 'memberUid') else set()
+            watermark = max(filter(None, [watermark, _timestamp(_value(entry, 'modifyTimestamp'))]), default=None)
+
+        for entry in user_entries:
+            uid = _value(entry, 'uid')
+            if not uid:
+                continue
+            try:
+                users[uid] = LDAPUser(
+                    dn=str(entry.entry_dn),
+                    uid=uid,
+                    cn=_value(entry, 'cn') or uid,
+                    givenName=_value(entry, 'givenName') or '',
+                    sn=_value(entry, 'sn') or '',
+                    destription=_value(entry, 'description') or '',
+                    mail=_value(entry, 'mail'),
+                )
+            except Exception as e:
+                logger.warning(f'Ошибка обработки пользователя LDAP {uid}: {e}')
+                continue
+            watermark = max(filter(None, [watermark, _timestamp(_value(entry, 'modifyTimestamp'))]), default=None)
+
+        groups_by_user: Dict[str, List[str]] = {}
+        for cn in sorted(group_members):
+            for uid in group_members[cn]:
+                groups_by_user.setdefault(uid, []).append(cn)
+        for uid, user in users.items():
+            user.memberOf = groups_by_user.get(uid, [])
+
+        self._users = users
+        self._group_members = group_members
+        self._watermark = watermark
+
+    def get_user(self, username: str) -> Optional[LDAPUser]:
+        """Возвращает пользователя из снимка (без обращения к LDAP)"""
+        return self._users.get(username)
+
+    async def resolve_display_names(self, usernames: Iterable[str],
+                                    formatter: Callable[[LDAPUser], str] = format_display_name) -> Dict[str, str]:
+        """
+        Возвращает отображаемые имена пользователей
+
+        Args:
+            usernames: Логины пользователей
+            formatter: Функция форматирования имени пользователя
+
+        Returns:
+            Словарь логин -> отображаемое имя (логин, если пользователь не найден)
+        """
+        try:
+            await self.ensure_fresh()
+        except Exception as e:
+            logger.warning(f'Не удалось обновить снимок LDAP, используются имеющиеся данные: {e}')
+
+        names = {}
+        for username in usernames:
+            user = self._users.get(username)
+            names[username] = (formatter(user) or username) if user else username
+        return names
+
+    async def get_users(self) -> List[User]:
+        """Возвращает всех пользователей каталога"""
+        try:
+            await self.ensure_fresh()
+        except Exception as e:
+            logger.warning(f'Не удалось обновить снимок LDAP, используются имеющиеся данные: {e}')
+
+        return [
+            User(login=user.uid, first_name=user.givenName, last_name=user.sn, email=user.mail)
+            for user in sorted(self._users.values(), key=lambda user: user.uid)
+        ]
+
+    def invalidate(self) -> None:
+        """Сбрасывает снимок (следующее обращение загрузит его целиком)"""
+        self._loaded_at = None
+        self._refreshed_at = None
+
+
+# Общий снимок каталога LDAP
+ldap_directory = LDAPDirectory(
+    refresh_interval=config.ldap_directory_refresh_interval,
+    full_reload_interval=config.ldap_directory_full_reload_interval,
+    load_timeout=config.ldap_directory_load_timeout or None,
+)
@@ -0,0 +1,270 @@
+# auth/ldap_pool.py
+"""
+Общий пул соединений с LDAP сервером.
+
+ldap3 выполняет операции синхронно, поэтому обращения к LDAP из async кода
+выполняются в отдельном пуле потоков (LDAPConnectionPool.run) с ограничением
+времени, а не в цикле событий NiceGUI. Служебные соединения (bind от имени
+администратора) переиспользуются между вызовами вместо открытия нового
+соединения на каждую операцию.
+"""
+import asyncio
+import functools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from ldap3 import ALL, SUBTREE, Connection, Server
+from ldap3.core.exceptions import LDAPCommunicationError
+
+from app_logging.logger import get_logger
+from config.settings import config
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+# OID управляющего элемента постраничного поиска (RFC 2696)
+PAGED_RESULTS_CONTROL = '1.2.840.113556.1.4.319'
+
+
+class LDAPConnectionPool:
+    """
+    Ограниченный пул служебных соединений LDAP и потоков для блокирующих вызовов
+    """
+
+    def __init__(self, server_url: str, user: str, password: str, size: int = 4, timeout: float = 10.0,
+                 page_size: int = 500):
+        """
+        Инициализация пула
+
+        Args:
+            server_url: Адрес LDAP сервера
+            user: DN служебной учетной записи
+            password: Пароль служебной учетной записи
+            size: Максимальное количество соединений и потоков
+            timeout: Ограничение времени на подключение, ответ сервера и ожидание
+                свободного соединения в секундах
+            page_size: Размер страницы постраничного поиска
+        """
+        self.server = Server(server_url, get_info=ALL, connect_timeout=timeout)
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.page_size = page_size
+
+        self._idle: 'queue.LifoQueue[Connection]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='ldap')
+        self._stats_lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0, 'timeouts': 0}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def open_connection(self, user: Optional[str] = None, password: Optional[str] = None) -> Connection:
+        """
+        Открывает новое соединение с bind (по умолчанию от имени служебной учетной записи)
+
+        Используется для проверки пароля пользователя: такое соединение не попадает в пул.
+        """
+        return Connection(
+            self.server,
+            user=user if user is not None else self.user,
+            password=password if password is not None else self.password,
+            auto_bind=True,
+            receive_timeout=self.timeout,
+        )
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """
+        Выдает служебное соединение из пула (блокирующий вызов)
+
+        Соединение, на котором произошла ошибка, закрывается и не возвращается в пул.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            self._count('timeouts')
+            raise TimeoutError(f'Нет свободных соединений LDAP за {self.timeout}с')
+
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            if conn is not None and not conn.closed:
+                self._count('reused')
+            else:
+                conn = self.open_connection()
+                self._count('created')
+            yield conn
+        except Exception:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._idle.put(conn)
+            self._slots.release()
+
+    def _discard(self, conn: Connection) -> None:
+        self._count('discarded')
+        try:
+            conn.unbind()
+        except Exception:
+            pass
+
+    def call(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Вызывает func(conn, *args) на служебном соединении из пула (блокирующий вызов)
+
+        Если сервер закрыл простаивающее соединение, вызов повторяется один раз на новом.
+        """
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    return func(conn, *args)
+            except LDAPCommunicationError:
+                if attempt:
+                    raise
+                logger.debug('Соединение LDAP закрыто сервером, повторяем запрос на новом соединении')
+
+    def iter_search(self, search_base: str, search_filter: str, attributes: List[str],
+                    search_scope: str = SUBTREE, size_limit: int = 0,
+                    page_size: Optional[int] = None) -> Iterator[Any]:
+        """
+        Постраничный поиск (simple paged results, RFC 2696) на служебном соединении
+        из пула (блокирующий генератор)
+
+        Записи запрашиваются страницами по page_size и выдаются по одной, поэтому в
+        памяти одновременно находится не больше одной страницы. Соединение занято,
+        пока генератор не исчерпан или не закрыт.
+
+        Args:
+            search_base: База поиска
+            search_filter: Фильтр LDAP
+            attributes: Запрашиваемые атрибуты
+            search_scope: Область поиска
+            size_limit: Максимальное количество записей (0 - без ограничения)
+            page_size: Размер страницы (по умолчанию self.page_size)
+        """
+        page_size = page_size or self.page_size
+        if size_limit:
+            page_size = min(page_size, size_limit)
+
+        returned = 0
+        for attempt in range(2):
+            try:
+                with self.connection() as conn:
+                    cookie = None
+                    while True:
+                        conn.search(search_base, search_filter, search_scope, attributes=attributes,
+                                    size_limit=size_limit, paged_size=page_size, paged_cookie=cookie)
+                        for entry in conn.entries:
+                            yield entry
+                            returned += 1
+                            if size_limit and returned >= size_limit:
+                                return
+
+                        controls = (conn.result or {}).get('controls') or {}
+                        cookie = controls.get(PAGED_RESULTS_CONTROL, {}).get('value', {}).get('cookie')
+                        if not cookie:
+                            return
+            except LDAPCommunicationError:
+                # Повторять можно, только пока ни одна запись не выдана
+                if attempt or returned:
+                    raise
+                logger.debug('Соединение LDAP закрыто сервером, повторяем поиск на новом соединении')
+
+    def search(self, search_base: str, search_filter: str, attributes: List[str],
+               search_scope: str = SUBTREE, size_limit: int = 0) -> List[Any]:
+        """
+        Выполняет постраничный поиск на служебном соединении из пула (блокирующий вызов)
+
+        Returns:
+            Список найденных записей (не больше size_limit, если он задан)
+        """
+        return list(self.iter_search(search_base, search_filter, attributes, search_scope, size_limit))
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполняет блокирующую функцию в пуле потоков LDAP
+
+        Raises:
+            TimeoutError: Если функция не завершилась за timeout секунд
+        """
+        return await self.run_with_timeout(self.timeout, func, *args, **kwargs)
+
+    async def run_with_timeout(self, timeout: Optional[float], func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Выполняет блокирующую функцию в пуле потоков LDAP с собственным ограничением времени
+
+        Используется для длительных операций (например полной загрузки каталога), для
+        которых ограничение интерактивных вызовов слишком мало.
+
+        Args:
+            timeout: Ограничение времени в секундах (None - без ограничения)
+            func: Блокирующая функция
+
+        Raises:
+            TimeoutError: Если функция не завершилась за timeout секунд
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            logger.error(f'Операция LDAP {getattr(func, "__name__", func)} не завершилась за {timeout}с')
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пула"""
+        with self._stats_lock:
+            return {**self._stats, 'idle': self._idle.qsize(), 'size': self.size}
+
+    def close(self) -> None:
+        """Закрывает простаивающие соединения и останавливает потоки"""
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._executor.shutdown(wait=False)
+
+
+_pools: Dict[Tuple[str, str], LDAPConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_ldap_pool(server_url: str, user: str, password: str) -> LDAPConnectionPool:
+    """
+    Возвращает общий пул соединений для сервера и служебной учетной записи
+
+    Все экземпляры LDAPAuthenticator используют один пул, поэтому создание
+    аутентификатора на каждый запрос не открывает новых соединений.
+    """
+    key = (server_url, user)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close()
+            pool = LDAPConnectionPool(server_url, user, password, size=config.ldap_pool_size,
+                                      timeout=config.ldap_timeout, page_size=config.ldap_page_size)
+            _pools[key] = pool
+        return pool
+
+
+def close_ldap_pools() -> None:
+    """Закрывает все пулы LDAP (при остановке приложения)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
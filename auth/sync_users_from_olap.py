@@ -5,6 +5,7 @@
 """
 
 import asyncio
+import hashlib
 import json
 import os
 import sys
@@ -17,6 +18,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from ldap3 import Server, Connection, SUBTREE, ALL
 from services.mayan_connector import MayanClient
+from services.reference_data import reference_data, ROLE_MEMBERS
 from config.settings import config
 from models import LDAPUser, UserGroup
 from app_logging.logger import setup_logging, get_logger
@@ -26,12 +28,24 @@ setup_logging()
 logger = get_logger(__name__)
 
 class LDAPGroupSyncManager:
-    """Менеджер синхронизации групп между LDAP и Mayan EDMS"""
+    """
+    Менеджер синхронизации групп между LDAP и Mayan EDMS
+    
+    Синхронизация выполняется по разнице множеств: для каждой группы сравниваются
+    участники в LDAP и в Mayan EDMS, и выполняются только недостающие добавления
+    и удаления (параллельно, не более SYNC_CONCURRENCY одновременно).
+    Для каждой группы сохраняется хеш состава в LDAP, и группы, состав которых
+    не изменился с последней успешной синхронизации, пропускаются без запросов к Mayan.
+    """
+    
+    # Максимальное количество одновременных запросов к Mayan EDMS
+    SYNC_CONCURRENCY = 8
     
     def __init__(self, mayan_client: MayanClient):
         self.mayan_client = mayan_client
         self.sync_state_file = Path("logs/group_sync_state.json")
         self.synced_groups = set()
+        self.membership_hashes: Dict[str, str] = {}
         self.remove_old_members = False  # Флаг для удаления старых участников
         self._load_sync_state()
     
@@ -42,6 +56,7 @@ class LDAPGroupSyncManager:
                 with open(self.sync_state_file, 'r', encoding='utf-8') as f:
                     state = json.load(f)
                     self.synced_groups = set(state.get('synced_groups', []))
+                    self.membership_hashes = state.get('membership_hashes', {})
                     logger.info(f"Состояние синхронизации групп загружено: {len(self.synced_groups)} групп")
             else:
                 logger.info("Файл состояния синхронизации групп не найден, начинаем с чистого листа")
@@ -53,7 +68,8 @@ class LDAPGroupSyncManager:
         try:
             state = {
                 'last_sync_time': datetime.now().isoformat(),
-                'synced_groups': list(self.synced_groups)
+                'synced_groups': sorted(self.synced_groups),
+                'membership_hashes': self.membership_hashes
             }
             
             # Создаем директорию logs если её нет
@@ -66,6 +82,12 @@ class LDAPGroupSyncManager:
         except Exception as e:
             logger.error(f"Ошибка сохранения состояния синхронизации групп: {e}")
     
+    def _membership_hash(self, ldap_group: UserGroup) -> str:
+        """Вычисляет хеш состава группы в LDAP (с учетом режима удаления старых участников)"""
+        members = '\n'.join(sorted(set(ldap_group.memberUid)))
+        payload = f"{int(self.remove_old_members)}\n{ldap_group.description or ''}\n{members}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
     def get_ldap_groups(self, ldap_server: Server) -> List[UserGroup]:
         """Получает все группы из LDAP"""
         groups = []
@@ -126,182 +148,89 @@ class LDAPGroupSyncManager:
         
         return groups
     
-    def get_mayan_groups(self) -> List[Dict[str, Any]]:
-        """Получает все группы из Mayan EDMS"""
-        try:
-            # Используем новый метод MayanClient
-            groups = self.mayan_client.get_groups()
-            logger.info(f"Получено {len(groups)} групп из Mayan EDMS")
-            return groups
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения групп из Mayan EDMS: {e}")
-            return []
+    async def _get_group_members(self, group_id: str) -> Set[str]:
+        """Получает множество участников группы Mayan EDMS"""
+        users = await self.mayan_client.get_group_users(group_id)
+        return {user.get('username') for user in users if user.get('username')}
     
-    def _get_group_members(self, group_id: str) -> List[str]:
-        """Получает список участников группы"""
-        try:
-            # Используем новый метод MayanClient
-            users = self.mayan_client.get_group_users(group_id)
-            members = [user.get('username') for user in users if user.get('username')]
-            logger.debug(f"Получено {len(members)} участников группы {group_id}")
-            return members
-            
-        except Exception as e:
-            logger.error(f"Ошибка получения участников группы {group_id}: {e}")
-            return []
+    async def _create_missing_groups(self, ldap_groups: List[UserGroup],
+                                     existing_mayan_groups: Dict[str, Dict[str, Any]],
+                                     sync_stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Создает в Mayan EDMS группы, которых там еще нет
+        
+        Returns:
+            Актуальный словарь групп Mayan EDMS {имя: группа}
+        """
+        missing = [group for group in ldap_groups if group.cn not in existing_mayan_groups]
+        if not missing:
+            return existing_mayan_groups
+        
+        semaphore = asyncio.Semaphore(self.SYNC_CONCURRENCY)
+        
+        async def create(ldap_group: UserGroup) -> bool:
+            async with semaphore:
+                logger.info(f"Создаем группу {ldap_group.cn} в Mayan EDMS")
+                return await self.mayan_client.create_group({
+                    'name': ldap_group.cn,
+                    'description': ldap_group.description or f"Группа {ldap_group.cn} из LDAP"
+                })
+        
+        results = await asyncio.gather(*(create(group) for group in missing), return_exceptions=True)
+        for ldap_group, result in zip(missing, results):
+            if result is True:
+                sync_stats['new_groups_created'] += 1
+            else:
+                sync_stats['errors'] += 1
+                logger.error(f"Не удалось создать группу {ldap_group.cn} в Mayan EDMS: {result}")
+        
+        # Получаем ID созданных групп
+        return {group['name']: group for group in await self.mayan_client.get_groups()}
     
-    def _add_group_members(self, group_name: str, member_usernames: List[str]) -> int:
-        """Добавляет участников в группу Mayan EDMS"""
-        try:
-            logger.info(f"Добавляем участников в группу {group_name}")
-            
-            # Получаем ID группы
-            groups = self.get_mayan_groups()
-            group_id = None
-            for group in groups:
-                if group['name'] == group_name:
-                    group_id = group['id']
-                    break
-            
-            if not group_id:
-                logger.error(f"Не удалось найти ID группы {group_name}")
-                return 0
-            
-            members_added = 0
-            
-            # Добавляем участников в группу используя новый метод
-            for username in member_usernames:
-                try:
-                    success = self.mayan_client.add_user_to_group(group_id, username)
-                    if success:
-                        logger.info(f"Пользователь {username} добавлен в группу {group_name}")
-                        members_added += 1
-                    else:
-                        logger.warning(f"Не удалось добавить пользователя {username} в группу {group_name}")
-                        
-                except Exception as e:
-                    logger.warning(f"Ошибка добавления пользователя {username} в группу {group_name}: {e}")
-            
-            logger.info(f"В группу {group_name} добавлено {members_added} участников из {len(member_usernames)}")
-            return members_added
-            
-        except Exception as e:
-            logger.error(f"Ошибка добавления участников в группу {group_name}: {e}")
-            return 0
-
-    def _update_group_membership(self, group_name: str, member_usernames: List[str]) -> int:
-        """Обновляет членство в группе Mayan EDMS"""
-        try:
-            logger.info(f"Обновляем членство в группе {group_name}")
-            
-            # Получаем ID группы
-            groups = self.get_mayan_groups()
-            group_id = None
-            for group in groups:
-                if group['name'] == group_name:
-                    group_id = group['id']
-                    break
-            
-            if not group_id:
-                logger.error(f"Не удалось найти ID группы {group_name}")
-                return 0
-            
-            # Получаем текущих участников группы
-            current_members = self._get_group_members(group_id)
-            logger.info(f"Текущие участники группы {group_name}: {current_members}")
-            
-            members_added = 0
-            
-            # Добавляем новых участников используя новый метод
-            for username in member_usernames:
-                if username not in current_members:
-                    try:
-                        success = self.mayan_client.add_user_to_group(group_id, username)
-                        if success:
-                            logger.info(f"Пользователь {username} добавлен в группу {group_name}")
-                            members_added += 1
-                        else:
-                            logger.warning(f"Не удалось добавить пользователя {username} в группу {group_name}")
-                            
-                    except Exception as e:
-                        logger.warning(f"Ошибка добавления пользователя {username} в группу {group_name}: {e}")
-                else:
-                    logger.debug(f"Пользователь {username} уже в группе {group_name}")
-            
-            # Удаляем участников, которых нет в LDAP (если включено)
-            if self.remove_old_members:
-                removed_count = self._remove_old_members(group_id, current_members, member_usernames)
-                logger.info(f"Удалено {removed_count} старых участников из группы {group_name}")
-            
-            logger.info(f"В группу {group_name} добавлено {members_added} новых участников")
-            return members_added
-            
-        except Exception as e:
-            logger.error(f"Ошибка обновления членства в группе {group_name}: {e}")
-            return 0
-
-    def _remove_old_members(self, group_id: str, current_members: List[str], ldap_members: List[str]) -> int:
-        """Удаляет участников, которых нет в LDAP группе"""
-        try:
-            members_to_remove = set(current_members) - set(ldap_members)
-            removed_count = 0
-            
-            for username in members_to_remove:
+    async def _sync_group_members(self, ldap_group: UserGroup, group_id: str,
+                                  semaphore: asyncio.Semaphore, sync_stats: Dict[str, Any]) -> bool:
+        """
+        Приводит состав группы Mayan EDMS к составу группы LDAP
+        
+        Returns:
+            True если все изменения применены успешно
+        """
+        async with semaphore:
+            current_members = await self._get_group_members(group_id)
+        
+        ldap_members = set(ldap_group.memberUid)
+        to_add = sorted(ldap_members - current_members)
+        to_remove = sorted(current_members - ldap_members) if self.remove_old_members else []
+        
+        if not to_add and not to_remove:
+            logger.debug(f"Состав группы {ldap_group.cn} не изменился")
+            return True
+        
+        logger.info(f"Группа {ldap_group.cn}: добавить {len(to_add)}, удалить {len(to_remove)}")
+        
+        async def apply(operation, username: str) -> bool:
+            async with semaphore:
                 try:
-                    # Используем новый метод MayanClient
-                    success = self.mayan_client.remove_user_from_group(group_id, username)
-                    if success:
-                        logger.info(f"Пользователь {username} удален из группы")
-                        removed_count += 1
-                    else:
-                        logger.warning(f"Не удалось удалить пользователя {username} из группы")
-                        
+                    return await operation(group_id, username)
                 except Exception as e:
-                    logger.warning(f"Ошибка удаления пользователя {username} из группы: {e}")
-            
-            return removed_count
-            
-        except Exception as e:
-            logger.error(f"Ошибка удаления старых участников: {e}")
-            return 0
-    
-    def create_group_in_mayan(self, ldap_group: UserGroup) -> bool:
-        """Создает группу в Mayan EDMS"""
-        try:
-            logger.info(f"Создаем группу {ldap_group.cn} в Mayan EDMS")
-            
-            # Подготавливаем данные группы
-            group_data = {
-                'name': ldap_group.cn,
-                'description': ldap_group.description or f"Группа {ldap_group.cn} из LDAP"
-            }
-            
-            # Создаем группу используя новый метод MayanClient
-            success = self.mayan_client.create_group(group_data)
-            
-            if success:
-                logger.info(f"Группа {ldap_group.cn} успешно создана в Mayan EDMS")
-                
-                # Добавляем группу в отслеживаемые
-                self.synced_groups.add(ldap_group.cn)
-                
-                # Добавляем участников группы
-                if ldap_group.memberUid:
-                    logger.info(f"Добавляем {len(ldap_group.memberUid)} участников в группу {ldap_group.cn}")
-                    members_added = self._add_group_members(ldap_group.cn, ldap_group.memberUid)
-                    logger.info(f"Добавлено {members_added} участников в группу {ldap_group.cn}")
-                
-                return True
-            else:
-                logger.error(f"Не удалось создать группу {ldap_group.cn} в Mayan EDMS")
-                return False
-                
-        except Exception as e:
-            logger.error(f"Исключение при создании группы {ldap_group.cn}: {e}")
-            return False
+                    logger.warning(f"Ошибка изменения состава группы {ldap_group.cn} для {username}: {e}")
+                    return False
+        
+        results = await asyncio.gather(
+            *(apply(self.mayan_client.add_user_to_group, username) for username in to_add),
+            *(apply(self.mayan_client.remove_user_from_group, username) for username in to_remove)
+        )
+        added = sum(results[:len(to_add)])
+        removed = sum(results[len(to_add):])
+        sync_stats['members_added'] += added
+        sync_stats['members_removed'] += removed
+        
+        failed = len(results) - added - removed
+        if failed:
+            logger.warning(f"Группа {ldap_group.cn}: не удалось применить {failed} изменений")
+        return failed == 0
     
-    def sync_groups(self, ldap_server: Server, force_sync: bool = False) -> Dict[str, Any]:
+    async def sync_groups(self, ldap_server: Server, force_sync: bool = False) -> Dict[str, Any]:
         """Основной метод синхронизации групп с полным обновлением членства"""
         logger.info("Начинаем синхронизацию групп")
         
@@ -313,62 +242,60 @@ class LDAPGroupSyncManager:
             'groups_skipped': 0,
             'groups_already_exist': 0,
             'members_added': 0,
+            'members_removed': 0,
             'errors': 0,
             'start_time': datetime.now().isoformat()
         }
         
         try:
-            # Получаем группы из LDAP
-            ldap_groups = self.get_ldap_groups(ldap_server)
+            # Получаем группы из LDAP (ldap3 синхронный - выполняем в отдельном потоке)
+            ldap_groups = await asyncio.to_thread(self.get_ldap_groups, ldap_server)
             sync_stats['total_ldap_groups'] = len(ldap_groups)
             
             # Получаем группы из Mayan EDMS
-            mayan_groups = self.get_mayan_groups()
+            mayan_groups = await self.mayan_client.get_groups()
             sync_stats['total_mayan_groups'] = len(mayan_groups)
-            
-            # Создаем словарь существующих групп в Mayan для быстрого поиска
             existing_mayan_groups = {group['name']: group for group in mayan_groups}
-            
-            # Обрабатываем каждую группу из LDAP
-            for ldap_group in ldap_groups:
-                try:
-                    logger.info(f"Обрабатываем группу: {ldap_group.cn}")
-                    
-                    # Проверяем, существует ли группа в Mayan EDMS
-                    if ldap_group.cn in existing_mayan_groups:
-                        logger.info(f"Группа {ldap_group.cn} уже существует в Mayan EDMS, обновляем членство")
-                        
-                        # Обновляем членство в существующей группе
-                        members_added = self._update_group_membership(ldap_group.cn, ldap_group.memberUid)
-                        sync_stats['members_added'] += members_added
+            sync_stats['groups_already_exist'] = sum(1 for group in ldap_groups if group.cn in existing_mayan_groups)
+            
+            # Пропускаем группы, состав которых не изменился с последней синхронизации
+            hashes = {group.cn: self._membership_hash(group) for group in ldap_groups}
+            changed_groups = [
+                group for group in ldap_groups
+                if force_sync
+                or group.cn not in existing_mayan_groups
+                or self.membership_hashes.get(group.cn) != hashes[group.cn]
+            ]
+            sync_stats['groups_skipped'] = len(ldap_groups) - len(changed_groups)
+            logger.info(f"Групп с изменениями: {len(changed_groups)}, без изменений: {sync_stats['groups_skipped']}")
+            
+            if changed_groups:
+                existing_mayan_groups = await self._create_missing_groups(changed_groups, existing_mayan_groups, sync_stats)
+                
+                # Один проход по пользователям Mayan вместо поиска каждого участника
+                await self.mayan_client.load_user_index()
+                
+                semaphore = asyncio.Semaphore(self.SYNC_CONCURRENCY)
+                groups_to_sync = [group for group in changed_groups if group.cn in existing_mayan_groups]
+                results = await asyncio.gather(
+                    *(self._sync_group_members(group, existing_mayan_groups[group.cn]['id'], semaphore, sync_stats)
+                      for group in groups_to_sync),
+                    return_exceptions=True
+                )
+                
+                for ldap_group, result in zip(groups_to_sync, results):
+                    if result is True:
                         sync_stats['groups_updated'] += 1
-                        
-                        # Добавляем группу в отслеживаемые
                         self.synced_groups.add(ldap_group.cn)
-                        
+                        self.membership_hashes[ldap_group.cn] = hashes[ldap_group.cn]
                     else:
-                        # Группа не существует, создаем её
-                        logger.info(f"Создаем новую группу: {ldap_group.cn}")
-                        
-                        result = self.create_group_in_mayan(ldap_group)
-                        if result:
-                            sync_stats['new_groups_created'] += 1
-                            logger.info(f"Группа {ldap_group.cn} успешно создана")
-                            
-                            # Участники уже добавлены в create_group_in_mayan
-                            sync_stats['members_added'] += len(ldap_group.memberUid)
-                        else:
-                            # Проверяем, была ли это ошибка дублирования
-                            if ldap_group.cn in self.synced_groups:
-                                sync_stats['groups_already_exist'] += 1
-                                logger.info(f"Группа {ldap_group.cn} уже существовала в Mayan EDMS")
-                            else:
-                                sync_stats['errors'] += 1
-                                logger.error(f"Ошибка синхронизации группы {ldap_group.cn}")
+                        # Хеш не сохраняем - группа будет обработана при следующем запуске
+                        sync_stats['errors'] += 1
+                        if isinstance(result, Exception):
+                            logger.error(f"Ошибка обработки группы {ldap_group.cn}: {result}")
                 
-                except Exception as e:
-                    sync_stats['errors'] += 1
-                    logger.error(f"Ошибка обработки группы {ldap_group.cn}: {e}")
+                # Состав групп изменился - материализованный состав ролей будет загружен заново
+                reference_data.invalidate(ROLE_MEMBERS)
             
             # Сохраняем состояние синхронизации
             self._save_sync_state()
@@ -381,8 +308,9 @@ class LDAPGroupSyncManager:
             logger.info(f"   Всего групп в Mayan: {sync_stats['total_mayan_groups']}")
             logger.info(f"   Новых групп создано: {sync_stats['new_groups_created']}")
             logger.info(f"   Групп обновлено: {sync_stats['groups_updated']}")
-            logger.info(f"   Групп уже существовало: {sync_stats['groups_already_exist']}")
+            logger.info(f"   Групп без изменений: {sync_stats['groups_skipped']}")
             logger.info(f"   Участников добавлено: {sync_stats['members_added']}")
+            logger.info(f"   Участников удалено: {sync_stats['members_removed']}")
             logger.info(f"   Ошибок: {sync_stats['errors']}")
             
             return sync_stats
@@ -427,7 +355,7 @@ class UserSyncManager:
     def _init_mayan_connection(self):
         """Инициализация подключения к Mayan EDMS"""
         try:
-            self.mayan_client = MayanClient.create_default()
+            self.mayan_client = asyncio.run(MayanClient.create_default())
             logger.info("Mayan EDMS клиент инициализирован")
         except Exception as e:
             logger.error(f"Ошибка инициализации Mayan EDMS: {e}")
@@ -666,7 +594,7 @@ class UserSyncManager:
             logger.error("Менеджер синхронизации групп не инициализирован")
             return {'success': False, 'errors': 1}
         
-        return self.group_sync_manager.sync_groups(self.ldap_server, force_sync)
+        return asyncio.run(self.group_sync_manager.sync_groups(self.ldap_server, force_sync))
     
     def full_sync(self, force_sync: bool = False) -> Dict[str, Any]:
         """Полная синхронизация пользователей и групп"""
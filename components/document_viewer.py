@@ -2,7 +2,8 @@
 Компонент для просмотра документов с каруселью страниц
 """
 from nicegui import ui
-from typing import Optional
+from typing import Optional, Dict, Any
+import asyncio
 import base64
 
 from components.loading_indicator import LoadingIndicator
@@ -11,15 +12,66 @@ from app_logging.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Максимальное количество одновременно загружаемых страниц
+PAGE_LOAD_CONCURRENCY = 4
 
-async def show_document_viewer(document_id: str, document_name: Optional[str] = None, mayan_client=None):
+# Сколько страниц после текущей загружается заранее (None - все страницы документа)
+PAGE_PREFETCH_AHEAD = 3
+
+
+async def _load_page_data_uri(mayan_client, page: Dict[str, Any]) -> Optional[str]:
+    """
+    Загружает изображение страницы документа и возвращает его в виде data URI
+    
+    Args:
+        mayan_client: Экземпляр MayanClient
+        page: Данные страницы из get_document_pages
+        
+    Returns:
+        data URI изображения или None
+    """
+    image_url = page.get('image_url')
+    if not image_url:
+        return None
+    
+    if image_url.startswith('http://') or image_url.startswith('https://'):
+        full_url = image_url
+    elif image_url.startswith('/'):
+        full_url = f'{mayan_client.base_url.rstrip("/")}{image_url}'
+    else:
+        full_url = f'{mayan_client.api_url.rstrip("/")}/{image_url.lstrip("/")}'
+    
+    response = await mayan_client.client.get(full_url)
+    if response.status_code != 200:
+        logger.warning(f'Страница {page.get("page_number")} не загружена: HTTP {response.status_code}')
+        return None
+    
+    image_data = response.content
+    mimetype = 'image/jpeg'
+    if image_data[:4] == b'\x89PNG':
+        mimetype = 'image/png'
+    elif image_data[:6] in [b'GIF87a', b'GIF89a']:
+        mimetype = 'image/gif'
+    
+    return f'data:{mimetype};base64,{base64.b64encode(image_data).decode()}'
+
+
+async def show_document_viewer(document_id: str, document_name: Optional[str] = None, mayan_client=None,
+                               prefetch_ahead: Optional[int] = PAGE_PREFETCH_AHEAD):
     """
     Открывает диалог просмотра документа с каруселью страниц
     
+    Первая страница показывается сразу после загрузки, следующие страницы
+    подгружаются в фоне (не более PAGE_LOAD_CONCURRENCY одновременно) на
+    prefetch_ahead страниц вперед от текущей. Остальные страницы загружаются
+    при переходе к ним.
+    
     Args:
         document_id: ID документа в Mayan EDMS
         document_name: Название документа (опционально)
         mayan_client: Экземпляр MayanClient (если не указан, будет создан)
+        prefetch_ahead: Количество страниц, загружаемых заранее после текущей
+                        (None - загрузить в фоне все страницы документа)
     """
     try:
         # Если клиент не передан, создаем его
@@ -60,45 +112,70 @@ async def show_document_viewer(document_id: str, document_name: Optional[str] =
                 
                 dialog.open()
                 
-                # Загружаем изображения всех страниц с обновлением прогресса
-                pages_data = []
                 total_pages = len(pages)
+                current_page = {'index': 0}
+                # Индекс страницы -> data URI (None - страницу не удалось загрузить)
+                page_images: Dict[int, Optional[str]] = {}
+                page_loads: Dict[int, asyncio.Task] = {}
+                load_semaphore = asyncio.Semaphore(PAGE_LOAD_CONCURRENCY)
+                widgets = {}
+                
+                def refresh_page_info():
+                    if 'page_info' not in widgets:
+                        return
+                    index = current_page['index']
+                    page_number = pages[index].get('page_number', index + 1)
+                    text = f'Страница {index + 1} из {total_pages} (страница документа: {page_number})'
+                    if len(page_images) < total_pages:
+                        text += f' · загружено {len(page_images)} из {total_pages}'
+                    widgets['page_info'].text = text
                 
-                for index, page in enumerate(pages, 1):
-                    image_url = page.get('image_url')
-                    if image_url:
+                def update_page_display():
+                    if 'image' not in widgets:
+                        return
+                    refresh_page_info()
+                    index = current_page['index']
+                    page_number = pages[index].get('page_number', index + 1)
+                    if index not in page_images:
+                        content = '<div class="text-gray-500">Загрузка страницы...</div>'
+                    elif page_images[index] is None:
+                        content = '<div class="text-red-500">Не удалось загрузить страницу</div>'
+                    else:
+                        # Изображение центрируется и занимает максимум доступного пространства
+                        content = f'<img src="{page_images[index]}" alt="Страница {page_number}" style="max-width: 100%; max-height: calc(99vh - 250px); height: auto; width: auto; object-fit: contain; display: block; margin: 0 auto;" />'
+                    widgets['image'].content = content
+                    widgets['image'].update()
+                
+                async def load_page(index: int) -> Optional[str]:
+                    async with load_semaphore:
                         try:
-                            # Обновляем прогресс
-                            loading.update_message(f'Загрузка страниц документа... {index} / {total_pages}')
-                            
-                            if image_url.startswith('http://') or image_url.startswith('https://'):
-                                response = await mayan_client.client.get(image_url)
-                            else:
-                                if image_url.startswith('/'):
-                                    full_url = f'{mayan_client.base_url.rstrip("/")}{image_url}'
-                                else:
-                                    full_url = f'{mayan_client.api_url.rstrip("/")}/{image_url.lstrip("/")}'
-                                response = await mayan_client.client.get(full_url)
-                            
-                            if response.status_code == 200:
-                                image_data = response.content
-                                img_base64 = base64.b64encode(image_data).decode()
-                                
-                                mimetype = 'image/jpeg'
-                                if image_data[:4] == b'\x89PNG':
-                                    mimetype = 'image/png'
-                                elif image_data[:6] in [b'GIF87a', b'GIF89a']:
-                                    mimetype = 'image/gif'
-                                
-                                data_uri = f'data:{mimetype};base64,{img_base64}'
-                                pages_data.append({
-                                    'page_number': page.get('page_number', len(pages_data) + 1),
-                                    'data_uri': data_uri
-                                })
+                            data_uri = await _load_page_data_uri(mayan_client, pages[index])
                         except Exception as e:
-                            logger.warning(f'Ошибка загрузки страницы {page.get("page_number")}: {e}')
+                            logger.warning(f'Ошибка загрузки страницы {pages[index].get("page_number")}: {e}')
+                            data_uri = None
+                    page_images[index] = data_uri
+                    if index == current_page['index']:
+                        update_page_display()
+                    else:
+                        refresh_page_info()
+                    return data_uri
                 
-                if not pages_data:
+                def ensure_page_loading(index: int) -> Optional[asyncio.Task]:
+                    if 0 <= index < total_pages and index not in page_loads:
+                        page_loads[index] = asyncio.create_task(load_page(index))
+                    return page_loads.get(index)
+                
+                def prefetch_from(index: int):
+                    last = total_pages if prefetch_ahead is None else min(total_pages, index + prefetch_ahead + 1)
+                    for page_index in range(index, last):
+                        ensure_page_loading(page_index)
+                
+                # Первая страница загружается сразу, следующие - в фоне
+                first_page_task = ensure_page_loading(0)
+                prefetch_from(0)
+                first_page = await first_page_task
+                
+                if first_page is None and total_pages == 1:
                     loading.update_message('Не удалось загрузить страницы документа')
                     ui.timer(3.0, dialog.close, once=True)
                     return
@@ -108,20 +185,10 @@ async def show_document_viewer(document_id: str, document_name: Optional[str] =
                 loading_container.set_visibility(False)
                 
                 # Информация о странице (фиксированная высота)
-                page_info_label = ui.label(f'Страница 1 из {len(pages_data)}').classes('text-sm text-gray-600 mb-2 flex-shrink-0 px-4')
+                widgets['page_info'] = ui.label('').classes('text-sm text-gray-600 mb-2 flex-shrink-0 px-4')
                 
                 # Контейнер для изображения (занимает оставшееся пространство, без пустых отступов)
-                image_container = ui.html('').classes('flex-1 overflow-auto').style('min-height: 0; width: 100%; display: flex; justify-content: center; align-items: center; padding: 0;')
-                
-                current_page = {'index': 0}
-                
-                def update_page_display():
-                    page_data = pages_data[current_page['index']]
-                    page_number = page_data['page_number']
-                    page_info_label.text = f'Страница {current_page["index"] + 1} из {len(pages_data)} (страница документа: {page_number})'
-                    # Изображение центрируется и занимает максимум доступного пространства
-                    image_container.content = f'<img src="{page_data["data_uri"]}" alt="Страница {page_number}" style="max-width: 100%; max-height: calc(99vh - 250px); height: auto; width: auto; object-fit: contain; display: block; margin: 0 auto;" />'
-                    image_container.update()
+                widgets['image'] = ui.html('').classes('flex-1 overflow-auto').style('min-height: 0; width: 100%; display: flex; justify-content: center; align-items: center; padding: 0;')
                 
                 # Кнопки навигации и закрытия (фиксированная высота, отцентрированы)
                 with ui.row().classes('w-full justify-center items-center gap-4 mb-2 flex-shrink-0 px-4'):
@@ -138,21 +205,23 @@ async def show_document_viewer(document_id: str, document_name: Optional[str] =
                     def go_to_previous():
                         if current_page['index'] > 0:
                             current_page['index'] -= 1
+                            ensure_page_loading(current_page['index'])
                             update_page_display()
                             prev_button.set_enabled(current_page['index'] > 0)
-                            next_button.set_enabled(current_page['index'] < len(pages_data) - 1)
+                            next_button.set_enabled(current_page['index'] < total_pages - 1)
                     
                     def go_to_next():
-                        if current_page['index'] < len(pages_data) - 1:
+                        if current_page['index'] < total_pages - 1:
                             current_page['index'] += 1
+                            prefetch_from(current_page['index'])
                             update_page_display()
                             prev_button.set_enabled(current_page['index'] > 0)
-                            next_button.set_enabled(current_page['index'] < len(pages_data) - 1)
+                            next_button.set_enabled(current_page['index'] < total_pages - 1)
                     
                     prev_button.on_click(go_to_previous)
                     next_button.on_click(go_to_next)
                     
-                    if len(pages_data) > 1:
+                    if total_pages > 1:
                         prev_button.set_enabled(False)
                         next_button.set_enabled(True)
                     else:
@@ -229,6 +298,10 @@ async def show_document_viewer(document_id: str, document_name: Optional[str] =
                             }}
                         }})();
                     ''')
+                    # Прекращаем фоновую загрузку страниц
+                    for task in page_loads.values():
+                        if not task.done():
+                            task.cancel()
                     original_close()
                 dialog.close = close_with_cleanup
                 
@@ -30,6 +30,18 @@ class DatabaseType(str, Enum):
     SQLITE = "sqlite"
 
 
+class LogDropPolicy(str, Enum):
+    """Какие записи отбрасываются при переполнении очереди логов"""
+    OLDEST = "oldest"
+    LOWEST_LEVEL = "lowest_level"
+
+
+class LogPartitionInterval(str, Enum):
+    """Период секционирования таблицы логов PostgreSQL"""
+    DAY = "day"
+    WEEK = "week"
+
+
 class DatabaseConfig(BaseSettings):
     """Конфигурация базы данных для логов"""
     
@@ -41,6 +53,13 @@ class DatabaseConfig(BaseSettings):
     password: str = Field(default='', env="LOG_DB_PASSWORD")
     sqlite_path: str = Field(default='logs/app_logs.db', env="LOG_SQLITE_PATH")
     table_name: str = Field(default='application_logs', env="LOG_TABLE_NAME")
+    queue_size: int = Field(default=10000, env="LOG_DB_QUEUE_SIZE")  # Максимум записей в очереди в памяти
+    drop_policy: LogDropPolicy = Field(default=LogDropPolicy.OLDEST, env="LOG_DB_DROP_POLICY")  # Что отбрасывать при переполнении очереди
+    spool_dir: str = Field(default='logs/spool', env="LOG_DB_SPOOL_DIR")  # Каталог спула на время недоступности БД (пусто - без спула)
+    spool_max_bytes: int = Field(default=100 * 1024 * 1024, env="LOG_DB_SPOOL_MAX_BYTES")  # Максимальный размер спула
+    retry_interval: float = Field(default=30.0, env="LOG_DB_RETRY_INTERVAL")  # Пауза перед повторной попыткой записи после ошибки БД в секундах
+    partition_interval: LogPartitionInterval = Field(default=LogPartitionInterval.DAY, env="LOG_DB_PARTITION_INTERVAL")  # Период секций таблицы логов PostgreSQL
+    partitions_ahead: int = Field(default=3, env="LOG_DB_PARTITIONS_AHEAD")  # Сколько секций создавать заранее
     
     model_config = ConfigDict(
         env_file=".env",
@@ -80,6 +99,11 @@ class LoggingConfig(BaseSettings):
     enable_json_logging: bool = Field(default=False, env="LOG_JSON_FORMAT")
     enable_context_logging: bool = Field(default=True, env="LOG_CONTEXT")
     
+    # Ограничение частоты записей ниже WARNING для каждого места вызова
+    rate_limit: float = Field(default=0, env="LOG_RATE_LIMIT")  # Записей в секунду на место вызова (0 - без ограничения)
+    rate_limit_burst: int = Field(default=100, env="LOG_RATE_LIMIT_BURST")  # Сколько записей подряд пропускается без ограничения
+    rate_limit_loggers: List[str] = Field(default=[], env="LOG_RATE_LIMIT_LOGGERS")  # Префиксы логгеров, к которым применяется ограничение (пусто - ко всем)
+    
     model_config = ConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -97,6 +121,14 @@ class LoggingConfig(BaseSettings):
             return [LogHandler(h) for h in handlers if h]
         return v
     
+    @field_validator('rate_limit_loggers', mode='before')
+    @classmethod
+    def parse_rate_limit_loggers(cls, v):
+        """Парсит список логгеров из строки через запятую"""
+        if isinstance(v, str):
+            return [name.strip() for name in v.split(',') if name.strip()]
+        return v
+    
     @field_validator('log_dir', mode='before')
     @classmethod
     def parse_log_dir(cls, v):
@@ -125,12 +157,24 @@ class AppConfig(BaseSettings):
     camunda_username: str = Field(default="", env="CAMUNDA_USERNAME")
     camunda_password: str = Field(default="", env="CAMUNDA_PASSWORD")
     camunda_verify_ssl: bool = Field(default=False, env="CAMUNDA_VERIFY_SSL")
+    camunda_timeout: float = Field(default=30.0, env="CAMUNDA_TIMEOUT")  # Таймаут запросов в секундах
+    camunda_pool_max_connections: int = Field(default=50, env="CAMUNDA_POOL_MAX_CONNECTIONS")  # Размер общего пула соединений
+    camunda_pool_max_keepalive: int = Field(default=20, env="CAMUNDA_POOL_MAX_KEEPALIVE")  # Количество keep-alive соединений
+    camunda_max_concurrent_requests: int = Field(default=40, env="CAMUNDA_MAX_CONCURRENT_REQUESTS")  # Ограничение параллельных запросов (0 - без ограничения)
+    camunda_read_cache_enabled: bool = Field(default=True, env="CAMUNDA_READ_CACHE_ENABLED")  # Кратковременный кеш и объединение одинаковых GET запросов
     
     # Настройки LDAP
     ldap_server: str = Field(default="", env="LDAP_SERVER")
     ldap_user: str = Field(default="", env="LDAP_USER")
     ldap_password: str = Field(default="", env="LDAP_PASSWORD")
     ldap_base_dn: str = Field(default="", env="LDAP_BASE_DN")
+    ldap_pool_size: int = Field(default=4, env="LDAP_POOL_SIZE")  # Количество служебных соединений и потоков для запросов к LDAP
+    ldap_timeout: float = Field(default=10.0, env="LDAP_TIMEOUT")  # Ограничение времени на операцию LDAP в секундах
+    ldap_page_size: int = Field(default=500, env="LDAP_PAGE_SIZE")  # Размер страницы постраничного поиска LDAP
+    ldap_search_limit: int = Field(default=50, env="LDAP_SEARCH_LIMIT")  # Максимум записей в результатах интерактивного поиска пользователей
+    ldap_directory_refresh_interval: int = Field(default=60, env="LDAP_DIRECTORY_REFRESH_INTERVAL")  # Интервал инкрементального обновления снимка каталога LDAP в секундах
+    ldap_directory_full_reload_interval: int = Field(default=3600, env="LDAP_DIRECTORY_FULL_RELOAD_INTERVAL")  # Интервал полной перезагрузки снимка каталога LDAP в секундах
+    ldap_directory_load_timeout: float = Field(default=300.0, env="LDAP_DIRECTORY_LOAD_TIMEOUT")  # Ограничение времени на полную загрузку снимка каталога LDAP в секундах (0 - без ограничения)
     
     # Настройки Mayan
     mayan_url: str = Field(default="http://localhost:8000", env="MAYAN_URL")
@@ -141,6 +185,18 @@ class AppConfig(BaseSettings):
     mayan_incoming_cabinet: str = Field(default="Входящие письма", env="MAYAN_INCOMING_CABINET")
     mayan_directory_document_type: str = Field(default="Входящие", env="MAYAN_DIRECTORY_DOCUMENT_TYPE")
     mayan_directory_cabinet: str = Field(default="Файлы из директории", env="MAYAN_DIRECTORY_CABINET")
+    mayan_timeout: float = Field(default=30.0, env="MAYAN_TIMEOUT")  # Таймаут запросов в секундах
+    mayan_pool_max_connections: int = Field(default=100, env="MAYAN_POOL_MAX_CONNECTIONS")  # Размер общего пула соединений
+    mayan_pool_max_keepalive: int = Field(default=20, env="MAYAN_POOL_MAX_KEEPALIVE")  # Количество keep-alive соединений
+    mayan_pool_keepalive_expiry: float = Field(default=30.0, env="MAYAN_POOL_KEEPALIVE_EXPIRY")  # Время жизни keep-alive в секундах
+    mayan_http2: bool = Field(default=False, env="MAYAN_HTTP2")  # Использовать HTTP/2 (требуется пакет h2)
+    mayan_document_file_cache_ttl: int = Field(default=300, env="MAYAN_DOCUMENT_FILE_CACHE_TTL")  # Время жизни кеша основных файлов документов в секундах
+    mayan_preview_cache_dir: str = Field(default="logs/preview_cache", env="MAYAN_PREVIEW_CACHE_DIR")  # Директория дискового кеша превью
+    mayan_preview_cache_max_mb: int = Field(default=200, env="MAYAN_PREVIEW_CACHE_MAX_MB")  # Максимальный размер кеша превью в МБ
+    mayan_user_index_ttl: int = Field(default=600, env="MAYAN_USER_INDEX_TTL")  # Время жизни индекса пользователей Mayan в секундах
+    mayan_collect_all_max_items: int = Field(default=50000, env="MAYAN_COLLECT_ALL_MAX_ITEMS")  # Максимальное количество элементов, собираемых со всех страниц списка
+    mayan_reference_cache_ttl: int = Field(default=300, env="MAYAN_REFERENCE_CACHE_TTL")  # Время в секундах, в течение которого справочные данные (роли, состав ролей, разрешения) считаются свежими
+    mayan_reference_cache_max_stale: int = Field(default=3600, env="MAYAN_REFERENCE_CACHE_MAX_STALE")  # Время в секундах, в течение которого устаревшие справочные данные отдаются с фоновым обновлением
 
     # Настройки почтового сервера
     email_server: str = Field(default="", env="EMAIL_SERVER")
@@ -168,7 +224,7 @@ class AppConfig(BaseSettings):
         extra="ignore"
     )
     
-    @field_validator('directory_scan_existing', 'directory_watch_recursive', 'camunda_verify_ssl', 'email_use_ssl', 'debug', mode='before')
+    @field_validator('directory_scan_existing', 'directory_watch_recursive', 'camunda_verify_ssl', 'email_use_ssl', 'debug', 'mayan_http2', 'camunda_read_cache_enabled', mode='before')
     @classmethod
     def parse_bool(cls, v):
         """Преобразует строковые значения в boolean, обрабатывая пустые строки"""
@@ -9,6 +9,9 @@ from nicegui import app, ui
 
 from app_logging.logger import setup_logging, get_logger
 from config.settings import config
+from services.http_pool import close_http_pools
+from auth.ldap_pool import close_ldap_pools
+from services.reference_data import reference_data
 
 
 # Настраиваем логирование при старте приложения
@@ -211,6 +214,14 @@ task_assignment = TaskAssignmentPage()
 # Подключаем API роутер для обработки событий КриптоПро
 app.include_router(api_router.router)
 
+# Фоновое обновление ролей и состава ролей для страниц назначения задач
+app.on_startup(reference_data.start_background_refresh)
+app.on_shutdown(reference_data.stop_background_refresh)
+
+# Закрываем общие пулы HTTP и LDAP соединений при остановке приложения
+app.on_shutdown(close_http_pools)
+app.on_shutdown(close_ldap_pools)
+
 # Настройка хоста и порта для работы в Docker
 host = os.getenv('HOST', '0.0.0.0')
 port = int(os.getenv('PORT', os.getenv('APP_PORT', '8080')))
@@ -337,13 +337,12 @@ def create_start_review_section():
                 roles_select = None
                 try:
                     # Получаем доступные роли из Mayan EDMS
-                    from services.mayan_connector import MayanClient
+                    from services.reference_data import reference_data
                     import asyncio
                     
                     async def load_roles():
                         try:
-                            system_client = await MayanClient.create_default()
-                            roles = await system_client.get_roles(page=1, page_size=1000)
+                            roles = await reference_data.get_roles()
                             
                             role_options = {}
                             for role in roles:
@@ -5,7 +5,6 @@ from services.camunda_connector import CamundaClient, create_camunda_client
 from auth.middleware import get_current_user
 from config.settings import config
 from utils import validate_username, create_task_detail_data
-import asyncio
 from components.gantt_chart import create_gantt_chart, parse_task_deadline
 from models import GroupedHistoryTask, CamundaTask, CamundaHistoryTask
 from utils.date_utils import format_date_russian
@@ -30,49 +29,25 @@ def _extract_camunda_variable(variables: dict, key: str) -> str | None:
     return result.strip() if result and isinstance(result, str) else result
 
 
-async def _get_task_process_variables(
-    camunda_client: CamundaClient,
-    task: Union[CamundaTask, CamundaHistoryTask, GroupedHistoryTask, Any],
-    show_finished: bool
-) -> dict[str, str | None]:
-    """Получает переменные процесса для задачи и возвращает извлечённые данные."""
-    result = {
-        'due_date': None,
-        'task_name': None,
-        'task_description': None,
-        'document_name': None,
-        'document_id': None,
-    }
-    
-    if not hasattr(task, 'process_instance_id') or not task.process_instance_id:
-        return result
-    
-    try:
-        var_names = ['dueDate', 'taskName', 'documentName', 'taskDescription', 'documentId', 'mayanDocumentId']
-        if show_finished:
-            process_variables = await camunda_client.get_history_process_instance_variables_by_name(
-                task.process_instance_id, var_names
-            )
-        else:
-            process_variables = await camunda_client.get_process_instance_variables_by_name(
-                task.process_instance_id, var_names
-            )
-        
-        result['due_date'] = _extract_camunda_variable(process_variables, 'dueDate')
-        result['task_name'] = (
+# Переменные процесса, отображаемые в списке задач
+TASK_PROCESS_VARIABLES = ['dueDate', 'taskName', 'documentName', 'taskDescription', 'documentId', 'mayanDocumentId']
+
+
+def _extract_task_process_variables(process_variables: dict) -> dict[str, str | None]:
+    """Извлекает из переменных процесса данные для отображения задачи."""
+    return {
+        'due_date': _extract_camunda_variable(process_variables, 'dueDate'),
+        'task_name': (
             _extract_camunda_variable(process_variables, 'taskName') or
             _extract_camunda_variable(process_variables, 'documentName')
-        )
-        result['task_description'] = _extract_camunda_variable(process_variables, 'taskDescription')
-        result['document_name'] = _extract_camunda_variable(process_variables, 'documentName')
-        result['document_id'] = (
+        ),
+        'task_description': _extract_camunda_variable(process_variables, 'taskDescription'),
+        'document_name': _extract_camunda_variable(process_variables, 'documentName'),
+        'document_id': (
             _extract_camunda_variable(process_variables, 'documentId') or
             _extract_camunda_variable(process_variables, 'mayanDocumentId')
-        )
-    except Exception as e:
-        logger.warning(f'Не удалось получить переменные процесса {task.process_instance_id}: {e}')
-    
-    return result
+        ),
+    }
 
 
 def content() -> None:
@@ -209,31 +184,19 @@ async def create_tasks_page(login: str):
                 )
             logger.info(f'Получено {len(user_tasks)} задач от Camunda API')
             
-            # Оптимизация: загружаем переменные процесса параллельно для всех задач
-            logger.info(f'Загружаем переменные процесса для {len(user_tasks)} задач параллельно...')
-            process_vars_coroutines = [
-                _get_task_process_variables(camunda_client, task, show_finished)
-                for task in user_tasks
-            ]
-            process_vars_results = await asyncio.gather(*process_vars_coroutines, return_exceptions=True)
-            
-            # Создаем словарь кэша: task_id -> process_variables
-            process_vars_cache = {}
-            for task, result in zip(user_tasks, process_vars_results):
-                task_id = getattr(task, 'id', 'unknown')
-                if isinstance(result, Exception):
-                    logger.warning(f'Ошибка при загрузке переменных процесса для задачи {task_id}: {result}')
-                    process_vars_cache[task_id] = {
-                        'due_date': None,
-                        'task_name': None,
-                        'task_description': None,
-                        'document_name': None,
-                        'document_id': None,
-                    }
-                else:
-                    process_vars_cache[task_id] = result
+            # Оптимизация: загружаем переменные процессов всех задач пакетными запросами
+            logger.info(f'Загружаем переменные процесса для {len(user_tasks)} задач...')
+            try:
+                process_variables = await camunda_client.get_variables_for_process_instances(
+                    [getattr(task, 'process_instance_id', None) for task in user_tasks],
+                    TASK_PROCESS_VARIABLES,
+                    history=show_finished
+                )
+            except Exception as e:
+                logger.warning(f'Ошибка при загрузке переменных процессов задач: {e}')
+                process_variables = {}
             
-            logger.info(f'Переменные процесса загружены для {len(process_vars_cache)} задач')
+            logger.info(f'Переменные процесса загружены для {len(process_variables)} процессов')
             
             for task in user_tasks:
                 # Логируем каждую задачу для отладки
@@ -250,14 +213,10 @@ async def create_tasks_page(login: str):
                 document_id = None
                 document_name = None
                 
-                # Получаем переменные процесса из кэша
-                proc_vars = process_vars_cache.get(task_id, {
-                    'due_date': None,
-                    'task_name': None,
-                    'task_description': None,
-                    'document_name': None,
-                    'document_id': None,
-                })
+                # Получаем переменные процесса задачи
+                proc_vars = _extract_task_process_variables(
+                    process_variables.get(getattr(task, 'process_instance_id', None), {})
+                )
                 
                 # Применяем значения из переменных процесса
                 if not due_date and proc_vars['due_date']:
@@ -384,19 +343,14 @@ async def create_tasks_page(login: str):
                 tasks_for_gantt = []
                 
                 for task in user_tasks:
-                    task_id = getattr(task, 'id', 'unknown')
                     due_date = getattr(task, 'due', None)
                     task_name = getattr(task, 'name', '')
                     task_description = ''
                     
-                    # Используем кэш переменных процесса вместо повторных запросов
-                    proc_vars = process_vars_cache.get(task_id, {
-                        'due_date': None,
-                        'task_name': None,
-                        'task_description': None,
-                        'document_name': None,
-                        'document_id': None,
-                    })
+                    # Используем уже загруженные переменные процесса вместо повторных запросов
+                    proc_vars = _extract_task_process_variables(
+                        process_variables.get(getattr(task, 'process_instance_id', None), {})
+                    )
                     
                     if not due_date and proc_vars['due_date']:
                         due_date = proc_vars['due_date']
@@ -2,6 +2,7 @@ from nicegui import ui
 from services.mayan_connector import MayanClient, MayanDocument, MayanTokenExpiredError
 from services.access_types import AccessTypeManager, AccessType
 from services.document_access_manager import document_access_manager
+from services.preview_cache import preview_cache
 from auth.middleware import get_current_user
 from config.settings import config
 from datetime import datetime, date, timedelta
@@ -481,50 +482,54 @@ async def get_cached_tags(client: MayanClient, user_identifier: Optional[str] =
         _metadata_cache[cache_key] = (data, now)
         return data
 
-async def load_previews_batch(document_ids: List[int], client: Optional[MayanClient] = None) -> Dict[int, bytes]:
+async def load_previews_batch(documents: List[MayanDocument], client: Optional[MayanClient] = None) -> Dict[int, str]:
     """
     Загружает превью для нескольких документов параллельно (оптимизация N+1 проблемы)
     
+    Превью берутся из дискового кеша, из Mayan EDMS загружаются только отсутствующие.
+    
     Args:
-        document_ids: Список ID документов для загрузки превью
+        documents: Список документов для загрузки превью
         client: Опциональный клиент Mayan (если не передан, будет создан новый)
     
     Returns:
-        Словарь {document_id: image_data} с загруженными превью
+        Словарь {document_id: preview_url} с URL превью из кеша
     """
-    if not document_ids:
+    documents = [doc for doc in documents if doc.file_latest_id]
+    if not documents:
         return {}
     
     if client is None:
         client = await get_mayan_client()
     
-    previews: Dict[int, bytes] = {}
+    previews: Dict[int, str] = {}
+    clients = {'current': client}
     
     # Создаем задачи для параллельной загрузки всех превью
-    async def load_single_preview(doc_id: int) -> tuple[int, Optional[bytes]]:
+    async def load_single_preview(doc: MayanDocument) -> tuple[int, Optional[str]]:
         """Загружает превью для одного документа"""
         try:
-            image_data = await client.get_document_preview_image(doc_id)
-            return (doc_id, image_data)
+            preview_url = await preview_cache.get_or_fetch(clients['current'], doc.document_id, doc.file_latest_id)
+            return (doc.document_id, preview_url)
         except MayanTokenExpiredError:
             # Токен истек, обновляем клиент и повторяем
-            logger.warning(f'Токен истек при загрузке превью для документа {doc_id}, обновляем...')
+            logger.warning(f'Токен истек при загрузке превью для документа {doc.document_id}, обновляем...')
             state = get_state()
             state.reset_cache()
-            client = await get_mayan_client()
+            clients['current'] = await get_mayan_client()
             try:
-                image_data = await client.get_document_preview_image(doc_id)
-                return (doc_id, image_data)
+                preview_url = await preview_cache.get_or_fetch(clients['current'], doc.document_id, doc.file_latest_id)
+                return (doc.document_id, preview_url)
             except Exception as e:
-                logger.warning(f"Ошибка загрузки превью для {doc_id} после обновления токена: {e}")
-                return (doc_id, None)
+                logger.warning(f"Ошибка загрузки превью для {doc.document_id} после обновления токена: {e}")
+                return (doc.document_id, None)
         except Exception as e:
-            logger.warning(f"Ошибка загрузки превью для {doc_id}: {e}")
-            return (doc_id, None)
+            logger.warning(f"Ошибка загрузки превью для {doc.document_id}: {e}")
+            return (doc.document_id, None)
     
     # Загружаем все превью параллельно
-    logger.info(f'Начинаем батч-загрузку превью для {len(document_ids)} документов')
-    tasks = [load_single_preview(doc_id) for doc_id in document_ids]
+    logger.info(f'Начинаем батч-загрузку превью для {len(documents)} документов')
+    tasks = [load_single_preview(doc) for doc in documents]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     
     # Обрабатываем результаты
@@ -532,11 +537,11 @@ async def load_previews_batch(document_ids: List[int], client: Optional[MayanCli
         if isinstance(result, Exception):
             logger.warning(f"Исключение при загрузке превью: {result}")
         elif isinstance(result, tuple) and len(result) == 2:
-            doc_id, image_data = result
-            if image_data:
-                previews[doc_id] = image_data
+            doc_id, preview_url = result
+            if preview_url:
+                previews[doc_id] = preview_url
     
-    logger.info(f'Батч-загрузка превью завершена: загружено {len(previews)}/{len(document_ids)} превью')
+    logger.info(f'Батч-загрузка превью завершена: загружено {len(previews)}/{len(documents)} превью')
     return previews
 
 async def safe_download_file(content: bytes, filename: str, delay_seconds: float = 5.0):
@@ -1134,37 +1139,26 @@ async def update_file_size(document: MayanDocument, size_label: ui.label):
         logger.error(f"Ошибка при получении количества страниц для документа {document.document_id}: {e}")
         size_label.text = "(ошибка получения страниц)"
 
-def update_preview_in_card(preview_html: ui.html, preview_data_uri: dict, image_data: bytes):
+def update_preview_in_card(preview_html: ui.html, preview_data_uri: dict, image_src: str):
     """
     Обновляет превью в карточке документа с уже загруженными данными
     
     Args:
         preview_html: HTML элемент для отображения превью
-        preview_data_uri: Словарь для хранения data_uri
-        image_data: Байты изображения
+        preview_data_uri: Словарь для хранения адреса превью
+        image_src: URL превью из кеша или data URI изображения
     """
     try:
-        # Конвертируем в base64 для отображения
-        img_base64 = base64.b64encode(image_data).decode()
-        
-        # Определяем MIME-тип изображения
-        mimetype = 'image/jpeg'
-        if image_data[:4] == b'\x89PNG':
-            mimetype = 'image/png'
-        elif image_data[:6] in [b'GIF87a', b'GIF89a']:
-            mimetype = 'image/gif'
-        
-        # Устанавливаем превью через data URI в HTML
-        data_uri = f'data:{mimetype};base64,{img_base64}'
+        data_uri = image_src
         
-        # Сохраняем data_uri для полноразмерного просмотра
+        # Сохраняем адрес превью для полноразмерного просмотра
         preview_data_uri['value'] = data_uri
         
         # Безопасное создание HTML с экранированием
         safe_document_id = html.escape(str(preview_html.id if hasattr(preview_html, 'id') else ''))
         safe_alt_text = html.escape(f"Превью документа")
-        if not data_uri.startswith('data:'):
-            logger.warning(f'Небезопасный data URI для превью')
+        if not data_uri.startswith(('data:', preview_cache.URL_PREFIX)):
+            logger.warning(f'Небезопасный адрес превью')
             data_uri = ''
         
         html_content = f'''
@@ -1187,7 +1181,7 @@ def update_preview_in_card(preview_html: ui.html, preview_data_uri: dict, image_
         preview_html.content = '<div class="w-32 h-32 flex items-center justify-center text-xs text-red-400 bg-gray-100 rounded border">Ошибка загрузки</div>'
         preview_html.update()
 
-def create_document_card(document: MayanDocument, update_cabinet_title_func=None, current_count=None, documents_count_label=None, is_favorites_page: bool = False, favorites_count_label: Optional[ui.label] = None, preview_image_data: Optional[bytes] = None) -> ui.card:
+def create_document_card(document: MayanDocument, update_cabinet_title_func=None, current_count=None, documents_count_label=None, is_favorites_page: bool = False, favorites_count_label: Optional[ui.label] = None, preview_url: Optional[str] = None) -> ui.card:
     """
     Создает карточку документа с возможностью предоставления доступа
     
@@ -1198,7 +1192,7 @@ def create_document_card(document: MayanDocument, update_cabinet_title_func=None
         documents_count_label: Label для отображения счетчика
         is_favorites_page: Флаг, что это страница избранного
         favorites_count_label: Label для счетчика избранного
-        preview_image_data: Опциональные данные превью (если уже загружены батчем)
+        preview_url: Опциональный URL превью (если уже загружено батчем)
     """
     
     # Временное логирование для отладки
@@ -1288,50 +1282,13 @@ def create_document_card(document: MayanDocument, update_cabinet_title_func=None
                             if image_data:
                                 logger.info(f'Получено {len(image_data)} байт изображения для документа {document.document_id}')
                                 
-                                # Конвертируем в base64 для отображения
-                                img_base64 = base64.b64encode(image_data).decode()
-                                
-                                # Определяем MIME-тип изображения
-                                mimetype = 'image/jpeg'
-                                if image_data[:4] == b'\x89PNG':
-                                    mimetype = 'image/png'
-                                elif image_data[:6] in [b'GIF87a', b'GIF89a']:
-                                    mimetype = 'image/gif'
-                                
-                                # Устанавливаем превью через data URI в HTML
-                                data_uri = f'data:{mimetype};base64,{img_base64}'
-                                
-                                # Сохраняем data_uri для полноразмерного просмотра
-                                preview_data_uri['value'] = data_uri
-                                
-                                # Безопасное экранирование данных для HTML
-                                safe_document_id = html.escape(str(document.document_id))
-                                safe_alt_text = html.escape(f"Превью документа {document.document_id}")
-                                # data_uri уже безопасен (base64), но для надежности проверяем, что это data URI
-                                if not data_uri.startswith('data:'):
-                                    logger.warning(f'Небезопасный data URI для документа {document.document_id}')
-                                    data_uri = ''
-                                
-                                # Создаем кликабельное превью с курсором pointer
-                                html_content = f'''
-                                    <div id="preview_clickable_{safe_document_id}" 
-                                         style="cursor: pointer; transition: opacity 0.2s;" 
-                                         onmouseover="this.style.opacity='0.8'" 
-                                         onmouseout="this.style.opacity='1'"
-                                         title="Нажмите для просмотра всех страниц документа">
-                                        <img src="{data_uri}" 
-                                             class="w-32 h-32 object-contain bg-gray-100 rounded border" 
-                                             alt="{safe_alt_text}" 
-                                             style="display: block; pointer-events: none;" />
-                                    </div>
-                                '''
-                                
-                                preview_html.content = html_content
-                                preview_html.update()
+                                # Сохраняем превью в дисковый кеш и показываем его по URL кеша
+                                cached_url = await asyncio.to_thread(
+                                    preview_cache.put, document.document_id, document.file_latest_id, image_data
+                                )
+                                update_preview_in_card(preview_html, preview_data_uri, cached_url)
                                 
                                 # Добавляем обработчик клика через NiceGUI
-                                # NiceGUI поддерживает async функции напрямую в обработчиках
-                                # Регистрируем обработчик клика через NiceGUI
                                 # Используем add_timer для регистрации обработчика после обновления DOM (с сохранением ссылки)
                                 add_timer(0.1, lambda: preview_html.on('click', show_full_preview), once=True)
                             else:
@@ -1352,8 +1309,8 @@ def create_document_card(document: MayanDocument, update_cabinet_title_func=None
                         preview_html.update()
                 
                 # Если превью уже загружено батчем, используем его сразу
-                if preview_image_data:
-                    update_preview_in_card(preview_html, preview_data_uri, preview_image_data)
+                if preview_url:
+                    update_preview_in_card(preview_html, preview_data_uri, preview_url)
                     # Добавляем обработчик клика (с сохранением ссылки на таймер)
                     add_timer(0.1, lambda: preview_html.on('click', show_full_preview), once=True)
                 # Иначе загружаем превью асинхронно (старый механизм для обратной совместимости)
@@ -1530,11 +1487,11 @@ async def search_documents(query: str):
                     return
                 
                 # Оптимизация N+1: загружаем все превью батчем перед созданием карточек
-                document_ids = [doc.document_id for doc in documents if doc.file_latest_id]
+                documents_with_files = [doc for doc in documents if doc.file_latest_id]
                 previews = {}
-                if document_ids:
+                if documents_with_files:
                     try:
-                        previews = await load_previews_batch(document_ids, client)
+                        previews = await load_previews_batch(documents_with_files, client)
                     except Exception as e:
                         logger.error(f"Ошибка при батч-загрузке превью: {e}", exc_info=True)
                         # Продолжаем работу без превью
@@ -1543,8 +1500,8 @@ async def search_documents(query: str):
                 with state.search_results_container:
                     ui.label(f'Найдено документов: {len(documents)}').classes('text-lg font-semibold mb-4')
                     for document in documents:
-                        preview_data = previews.get(document.document_id)
-                        create_document_card(document, preview_image_data=preview_data)
+                        preview_url = previews.get(document.document_id)
+                        create_document_card(document, preview_url=preview_url)
                         
             except TimeoutError as e:
                 logger.error(f"Таймаут при поиске документов: {e}")
@@ -2071,11 +2028,11 @@ async def load_documents_by_cabinets():
                                     
                                     if documents:
                                         # Оптимизация N+1: загружаем все превью батчем перед созданием карточек
-                                        document_ids = [doc.document_id for doc in documents if doc.file_latest_id]
+                                        documents_with_files = [doc for doc in documents if doc.file_latest_id]
                                         previews = {}
-                                        if document_ids:
+                                        if documents_with_files:
                                             try:
-                                                previews = await load_previews_batch(document_ids, client)
+                                                previews = await load_previews_batch(documents_with_files, client)
                                             except Exception as e:
                                                 logger.error(f"Ошибка при батч-загрузке превью: {e}", exc_info=True)
                                                 # Продолжаем работу без превью
@@ -2088,13 +2045,13 @@ async def load_documents_by_cabinets():
                                             
                                             for document in documents:
                                                 # Передаем функцию обновления заголовка, текущий счетчик и label счетчика
-                                                preview_data = previews.get(document.document_id)
+                                                preview_url = previews.get(document.document_id)
                                                 create_document_card(
                                                     document, 
                                                     update_cabinet_title, 
                                                     total_count,
                                                     documents_count_label,
-                                                    preview_image_data=preview_data
+                                                    preview_url=preview_url
                                                 )
                                     else:
                                         with documents_container:
@@ -2640,11 +2597,11 @@ async def load_favorite_documents():
             return
         
         # Оптимизация N+1: загружаем все превью батчем перед созданием карточек
-        document_ids = [doc.document_id for doc in documents if doc.file_latest_id]
+        documents_with_files = [doc for doc in documents if doc.file_latest_id]
         previews = {}
-        if document_ids:
+        if documents_with_files:
             try:
-                previews = await load_previews_batch(document_ids, client)
+                previews = await load_previews_batch(documents_with_files, client)
             except Exception as e:
                 logger.error(f"Ошибка при батч-загрузке превью: {e}", exc_info=True)
                 # Продолжаем работу без превью
@@ -2655,8 +2612,8 @@ async def load_favorite_documents():
             
             for document in documents:
                 # Передаем флаг, что это страница избранных, и счетчик
-                preview_data = previews.get(document.document_id)
-                create_document_card(document, is_favorites_page=True, favorites_count_label=count_label, preview_image_data=preview_data)
+                preview_url = previews.get(document.document_id)
+                create_document_card(document, is_favorites_page=True, favorites_count_label=count_label, preview_url=preview_url)
     except TimeoutError as e:
         logger.error(f"Таймаут при загрузке избранных документов: {e}", exc_info=True)
         state.favorites_container.clear()
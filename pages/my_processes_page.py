@@ -7,6 +7,8 @@ import json
 from components.gantt_chart import create_gantt_chart, parse_task_deadline, prepare_tasks_for_gantt
 from datetime import datetime
 from app_logging.logger import get_logger
+from auth.ldap_directory import ldap_directory
+from models import LDAPUser
 
 logger = get_logger(__name__)
 
@@ -33,38 +35,34 @@ def get_camunda_client() -> CamundaClient:
         verify_ssl=False  # Для разработки отключаем проверку SSL
     )
 
-def get_user_display_name(username: str) -> str:
+def _format_user_name(user_info: LDAPUser) -> str:
+    """Формирует отображаемое имя: "Имя Фамилия - Должность" """
+    return ' '.join(filter(None, [user_info.givenName, user_info.sn])) + (f' - {user_info.destription}' if user_info.destription else '')
+
+def _snapshot_display_name(username: str) -> str:
+    """Отображаемое имя пользователя из уже загруженного снимка каталога LDAP (без обращения к LDAP)"""
+    user_info = ldap_directory.get_user(username)
+    return (_format_user_name(user_info) or username) if user_info else username
+
+async def get_user_display_name(username: str) -> str:
     """
     Получает отформатированное имя пользователя из логина
     
+    Имя берется из снимка каталога LDAP; если снимок еще не загружен, он загружается
+    в пуле потоков LDAP, не блокируя цикл событий.
+    
     Args:
         username: Логин пользователя
         
     Returns:
         Строка с именем, фамилией и должностью или логин, если не найдено
     """
-    try:
-        from auth.ldap_auth import LDAPAuthenticator
-        
-        ldap_auth = LDAPAuthenticator()
-        user_info = ldap_auth.get_user_by_login(username)
-        
-        if user_info:
-            display_parts = [user_info.givenName, user_info.sn]
-            if user_info.destription:
-                display_parts.append(user_info.destription)
-            return ' '.join(filter(None, display_parts[:2])) + (f' - {user_info.destription}' if user_info.destription else '')
-        else:
-            return username
-    except Exception as e:
-        logger.warning(f"Не удалось получить данные пользователя {username} из LDAP: {e}")
-        return username
+    names = await ldap_directory.resolve_display_names([username], formatter=_format_user_name)
+    return names[username]
 
 @require_auth
 def content():
     """Создает страницу для отслеживания созданных пользователем процессов"""
-    from auth.ldap_auth import LDAPAuthenticator
-    
     current_user = get_current_user()
     if not current_user:
         ui.navigate.to('/login')
@@ -72,26 +70,10 @@ def content():
     
     ui.page_title('Мои процессы')
     
-    # Получаем данные пользователя из LDAP
-    try:
-        ldap_auth = LDAPAuthenticator()
-        user_info = ldap_auth.get_user_by_login(current_user.username)
-        
-        # Формируем строку с информацией о пользователе
-        if user_info:
-            # Формат: "Имя Фамилия - Должность" или "Имя Фамилия" если должности нет
-            user_display_parts = [user_info.givenName, user_info.sn]
-            if user_info.destription:
-                user_display_parts.append(user_info.destription)
-            user_display = ' '.join(filter(None, user_display_parts[:2]))
-            if user_info.destription:
-                user_display += f' - {user_info.destription}'
-        else:
-            # Если не удалось получить данные из LDAP, используем логин
-            user_display = current_user.username
-    except Exception as e:
-        logger.error(f"Ошибка при получении данных пользователя из LDAP: {e}")
-        user_display = current_user.username
+    # Получаем данные пользователя из снимка каталога LDAP
+    # Формат: "Имя Фамилия - Должность" или логин, если данные не найдены.
+    # Если снимок еще не загружен, имя подставляется после его загрузки
+    user_display = _snapshot_display_name(current_user.username)
     
     # Глобальная переменная для контейнера деталей процесса
     global _details_container
@@ -156,17 +138,15 @@ def content():
                 ui.label('Процессы, созданные пользователем:').classes('text-lg text-gray-500 font-normal')
                 
                 # Данные пользователя - акцентный цвет, полужирный
-                if user_info:
-                    user_display = f'{user_info.givenName} {user_info.sn}'
-                    if user_info.destription:
-                        user_display += f' - {user_info.destription}'
-                    with ui.row().classes('items-center gap-1'):
-                        ui.icon('badge').classes('text-blue-600 text-lg')
-                        ui.label(user_display).classes('text-xl font-bold text-blue-700')
-                else:
-                    with ui.row().classes('items-center gap-1'):
-                        ui.icon('badge').classes('text-gray-600 text-lg')
-                        ui.label(current_user.username).classes('text-xl font-bold text-gray-800')
+                with ui.row().classes('items-center gap-1'):
+                    ui.icon('badge').classes('text-blue-600 text-lg')
+                    user_label = ui.label(user_display).classes('text-xl font-bold text-blue-700')
+                
+                if not ldap_directory.is_loaded:
+                    async def load_user_display():
+                        user_label.text = await get_user_display_name(current_user.username)
+                    
+                    ui.timer(0, load_user_display, once=True)
             
             with ui.row().classes('items-center gap-2'):
                 # Кнопка показа/скрытия завершенных процессов
@@ -234,6 +214,12 @@ async def load_my_processes(processes_container, completed_processes_container,
         gantt_container.clear()  # Очищаем контейнер диаграммы
         _process_cards.clear()  # Очищаем словарь карточек
         
+        # Обновляем снимок каталога LDAP: имена пользователей на карточках берутся из него
+        try:
+            await ldap_directory.ensure_fresh()
+        except Exception as e:
+            logger.warning(f"Не удалось обновить снимок каталога LDAP: {e}")
+        
         camunda_client = await create_camunda_client()
         
         # Получаем активные процессы
@@ -589,7 +575,7 @@ def create_process_card(process, is_active=True):
                                 
                                 # Получаем данные пользователя вместо логина
                                 user_login = user_status['user']
-                                user_display_name = get_user_display_name(user_login)
+                                user_display_name = _snapshot_display_name(user_login)
                                 
                                 with ui.row().classes('w-full items-center gap-2 mb-1'):
                                     ui.icon(status_icon).classes(f'{status_color} text-sm')
@@ -736,13 +722,18 @@ async def show_process_details(process_id, card_container):
                 if progress_info:
                     ui.label('Статус пользователей:').classes('text-sm font-semibold mb-2')
                     
+                    # Получаем данные пользователей вместо логинов одним запросом
+                    display_names = await ldap_directory.resolve_display_names(
+                        (user_status['user'] for user_status in progress_info.get('user_status', [])),
+                        formatter=_format_user_name,
+                    )
+                    
                     for user_status in progress_info.get('user_status', []):
                         status_color = 'text-green-600' if user_status['completed'] else 'text-orange-600'
                         status_icon = '✅' if user_status['completed'] else '⏳'
                         
-                        # Получаем данные пользователя вместо логина
                         user_login = user_status['user']
-                        user_display_name = get_user_display_name(user_login)
+                        user_display_name = display_names[user_login]
                         
                         with ui.row().classes('items-center mb-2'):
                             ui.label(f'{status_icon} {user_display_name}').classes(f'text-sm {status_color} font-medium')
@@ -880,9 +871,10 @@ async def show_process_history(process_id, card_container):
                 
                 if assignee_list:
                     ui.label('Назначено пользователям:').classes('text-sm font-semibold mb-2')
+                    # Получаем данные пользователей вместо логинов одним запросом
+                    display_names = await ldap_directory.resolve_display_names(assignee_list, formatter=_format_user_name)
                     for assignee in assignee_list:
-                        # Получаем данные пользователя вместо логина
-                        user_display_name = get_user_display_name(assignee)
+                        user_display_name = display_names[assignee]
                         
                         with ui.row().classes('items-center mb-1'):
                             ui.label(f'• {user_display_name}').classes('text-sm text-gray-600')
@@ -2,10 +2,12 @@ from components import theme
 from components.message import message
 from nicegui import ui, events
 from auth.ldap_auth import LDAPAuthenticator
+from auth.ldap_directory import ldap_directory
 from services.camunda_connector import CamundaClient
 from auth.middleware import get_current_user
 from services.document_access_manager import document_access_manager
 from services.mayan_connector import MayanClient
+from services.reference_data import reference_data, ROLE_MEMBERS
 from config.settings import config
 from datetime import datetime, timezone
 import time
@@ -91,7 +93,8 @@ class TaskAssignmentPage:
                     logger.error(f"Ошибка при инициализации LDAP клиента: {e}")
                     ui.notify('Ошибка: не удалось подключиться к LDAP серверу', type='error')
                 
-                all_users = await ldap_authenticator.get_users() if ldap_authenticator else []
+                # Список пользователей берется из снимка каталога LDAP, а не загружается при каждом открытии
+                all_users = await ldap_directory.get_users() if ldap_authenticator else []
                 
                 # Инициализация Camunda клиента с использованием конфигурации
                 camunda_client = None
@@ -115,57 +118,17 @@ class TaskAssignmentPage:
                     ui.notify(f'Ошибка подключения к Camunda: {str(e)}', type='negative')
                     camunda_client = None
                 
-                # Кеш для ролей пользователей (username -> [роли])
-                user_roles_cache = {}
+                # Кеш для ролей пользователей (username -> [роли]). Если состав ролей уже
+                # загружен в общий кеш справочных данных, роли показываются сразу
+                membership = reference_data.peek(ROLE_MEMBERS)
+                user_roles_cache = dict(membership.roles_by_user) if membership else {}
                 
                 async def load_user_roles():
-                    """Загружает роли для всех пользователей через группы ролей"""
+                    """Загружает роли пользователей из общего состава ролей"""
                     try:
-                        logger.info('Начинаем загрузку ролей пользователей...')
-                        system_client = await MayanClient.create_default()
-                        
-                        # Получаем все роли
-                        roles = await system_client.get_roles(page=1, page_size=1000)
-                        logger.info(f'Получено {len(roles)} ролей')
-                        
-                        # Для каждой роли получаем группы, затем пользователей групп
-                        for role in roles:
-                            role_id = role.get('id')
-                            role_label = role.get('label')
-                            
-                            if not role_id or not role_label:
-                                continue
-                            
-                            try:
-                                # Получаем группы роли
-                                role_groups = await system_client.get_role_groups(role_id)
-                                
-                                # Для каждой группы получаем пользователей
-                                for group in role_groups:
-                                    group_id = group.get('id')
-                                    if not group_id:
-                                        continue
-                                    
-                                    try:
-                                        # Получаем пользователей группы
-                                        group_users = await system_client.get_group_users(str(group_id))
-                                        
-                                        # Добавляем роль к каждому пользователю
-                                        for group_user in group_users:
-                                            username = group_user.get('username')
-                                            if username:
-                                                if username not in user_roles_cache:
-                                                    user_roles_cache[username] = []
-                                                if role_label not in user_roles_cache[username]:
-                                                    user_roles_cache[username].append(role_label)
-                                        
-                                    except Exception as e:
-                                        logger.warning(f'Ошибка при получении пользователей группы {group_id}: {e}')
-                                        continue
-                                
-                            except Exception as e:
-                                logger.warning(f'Ошибка при получении групп роли {role_label}: {e}')
-                                continue
+                        membership = await reference_data.get_role_membership()
+                        user_roles_cache.clear()
+                        user_roles_cache.update(membership.roles_by_user)
                         
                         logger.info(f'Загружены роли для {len(user_roles_cache)} пользователей')
                         
@@ -230,7 +193,10 @@ class TaskAssignmentPage:
                                 {'headerName': 'Email', 'field': 'email'},
                                 {'headerName': 'Роли', 'field': 'roles', 'sortable': True, 'filter': True, 'width': 200},
                             ],
-                            'rowData': [ user.__dict__ for user in all_users],
+                            'rowData': [
+                                dict(user.__dict__, roles=', '.join(user_roles_cache.get(user.__dict__.get('login'), [])))
+                                for user in all_users
+                            ],
                             'rowSelection': 'multiple',
                             'localeText': AGGGRID_RUSSIAN_LOCALE,
                             # Простая HTML заглушка
@@ -264,8 +230,7 @@ class TaskAssignmentPage:
                             """Загружает роли для выбора"""
                             nonlocal role_select
                             try:
-                                system_client = await MayanClient.create_default()
-                                roles = await system_client.get_roles(page=1, page_size=1000)
+                                roles = await reference_data.get_roles()
                                 
                                 role_options = {}
                                 for role in roles:
@@ -307,49 +272,18 @@ class TaskAssignmentPage:
                                 if selected_role_label not in selected_roles_from_selection:
                                     selected_roles_from_selection.append(selected_role_label)
                                 
-                                # Получаем роль по label и находим её ID
-                                system_client = await MayanClient.create_default()
-                                roles = await system_client.get_roles(page=1, page_size=1000)
-                                
-                                role_id = None
-                                for role in roles:
-                                    if role.get('label') == selected_role_label:
-                                        role_id = role.get('id')
-                                        break
+                                # Пользователи роли берутся из общего состава ролей (роль -> группы -> пользователи)
+                                membership = await reference_data.get_role_membership()
                                 
-                                if not role_id:
+                                if selected_role_label not in membership:
                                     ui.notify(f'Роль {selected_role_label} не найдена', type='error')
                                     return
                                 
-                                # Получаем группы, состоящие в выбранной роли
-                                role_groups = await system_client.get_role_groups(role_id)
-                                
-                                if not role_groups:
+                                if not membership.roles[selected_role_label]['groups']:
                                     ui.notify(f'В роли {selected_role_label} нет групп', type='warning')
                                     return
                                 
-                                # Собираем всех пользователей из всех групп роли
-                                all_role_usernames = set()
-                                
-                                for group in role_groups:
-                                    group_id = group.get('id')
-                                    if not group_id:
-                                        continue
-                                    
-                                    try:
-                                        # Получаем пользователей группы
-                                        group_users = await system_client.get_group_users(str(group_id))
-                                        
-                                        # Добавляем username в множество
-                                        for group_user in group_users:
-                                            username = group_user.get('username')
-                                            if username:
-                                                all_role_usernames.add(username)
-                                        
-                                        logger.info(f'Группа {group.get("name", group_id)} содержит {len(group_users)} пользователей')
-                                    except Exception as e:
-                                        logger.warning(f'Ошибка при получении пользователей группы {group_id}: {e}')
-                                        continue
+                                all_role_usernames = set(membership.users_with_role(selected_role_label))
                                 
                                 if not all_role_usernames:
                                     ui.notify(f'В группах роли {selected_role_label} не найдено пользователей', type='warning')
@@ -718,9 +652,8 @@ class TaskAssignmentPage:
                                 # Загружаем роли, если это процесс с документами и роли не выбраны вверху
                                 elif process_template_select.value and ('DocumentSigningProcess' in process_template_select.value or 'DocumentReviewProcess' in process_template_select.value or 'Ознаком' in process_template_select.value):
                                     try:
-                                        # Используем системный клиент для получения ролей
-                                        system_client = await MayanClient.create_default()
-                                        roles = await system_client.get_roles(page=1, page_size=1000)
+                                        # Роли берутся из общего кеша справочных данных
+                                        roles = await reference_data.get_roles()
                                         
                                         # Создаем словарь role_label -> role_label для выбора
                                         role_options = {}
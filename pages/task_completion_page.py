@@ -10,6 +10,7 @@ from app_logging.logger import get_logger
 from models import CamundaHistoryTask, LDAPUser, GroupedHistoryTask
 from auth.middleware import get_current_user
 from auth.ldap_auth import LDAPAuthenticator
+from auth.ldap_directory import format_display_name, ldap_directory
 from utils import validate_username
 import api_router
 from ldap3 import Server, Connection, SUBTREE, ALL
@@ -642,13 +643,16 @@ async def create_task_card_with_progress(task):
                         
                         # Список пользователей и их статус
                         if progress["user_status"]:
+                            # Получаем отображаемые имена (ФИО и должность) вместо логинов одним запросом
+                            display_names = await ldap_directory.resolve_display_names(
+                                user_info["user"] for user_info in progress["user_status"]
+                            )
                             with ui.expansion('Статус пользователей', icon='people').classes('w-full mt-2'):
                                 for user_info in progress["user_status"]:
                                     status_icon = 'check_circle' if user_info["completed"] else 'schedule'
                                     status_color = 'text-green-600' if user_info["completed"] else 'text-orange-600'
                                     
-                                    # Получаем отображаемое имя (ФИО и должность) вместо логина
-                                    user_display_name = get_user_display_name(user_info["user"])
+                                    user_display_name = display_names[user_info["user"]]
                                     
                                     with ui.row().classes('w-full items-center gap-2'):
                                         ui.icon(status_icon).classes(status_color)
@@ -1214,7 +1218,7 @@ async def show_grouped_task_details_in_tab(task):
                         
                         with ui.row().classes('items-center gap-2 mb-2'):
                             ui.icon(status_icon).classes(status_color)
-                            user_display_name = get_user_display_name(user_task.assignee)
+                            user_display_name = await get_user_display_name(user_task.assignee)
                             ui.label(f'{user_display_name}').classes('text-sm font-semibold')
                         
                         # ui.label(f'ID задачи: {user_task.task_id}').classes('text-xs text-gray-500 mb-1')  # УБРАНО
@@ -1359,7 +1363,7 @@ async def show_completed_task_details_in_tab(task):
                 
                 # Инициатор
                 if hasattr(task_details, 'assignee') and task_details.assignee:
-                    executor_display_name = get_user_display_name(task_details.assignee)
+                    executor_display_name = await get_user_display_name(task_details.assignee)
                     ui.label(f'Инициатор: {executor_display_name}').classes('text-sm mb-2')
                 
                 # Создана
@@ -1477,6 +1481,9 @@ async def show_completed_task_details_in_tab(task):
                                 if signer_list and isinstance(signer_list, list) and len(signer_list) > 0:
                                     ui.label('Участники процесса:').classes('text-sm font-medium mb-2')
                                     
+                                    display_names = await ldap_directory.resolve_display_names(
+                                        str(signer_login).strip() for signer_login in signer_list
+                                    )
                                     signers_container = ui.column().classes('w-full mb-4')
                                     with signers_container:
                                         for i, signer_login in enumerate(signer_list, 1):
@@ -1486,7 +1493,7 @@ async def show_completed_task_details_in_tab(task):
                                                 if not signer_login_str:
                                                     continue
                                                 
-                                                user_display_name = get_user_display_name(signer_login_str)
+                                                user_display_name = display_names[signer_login_str]
                                                 with ui.row().classes('w-full items-center gap-2 mb-1'):
                                                     ui.icon('person').classes('text-blue-600 text-sm')
                                                     ui.label(f'{i}. {user_display_name}').classes('text-sm')
@@ -1549,8 +1556,9 @@ async def show_completed_task_details_in_tab(task):
                                     all_users.update(review_dates.keys())
                                 
                                 # Отображаем информацию по каждому пользователю
+                                display_names = await ldap_directory.resolve_display_names(all_users)
                                 for username in sorted(all_users):
-                                    user_display_name = get_user_display_name(username)
+                                    user_display_name = display_names[username]
                                     
                                     with ui.card().classes('p-3 mb-3 bg-white border-l-4 border-blue-400'):
                                         ui.label(f'{user_display_name}').classes('text-sm font-semibold mb-2')
@@ -3622,7 +3630,7 @@ async def show_task_details(task):
                         if creator_name:
                             # Для задач подписания документа показываем полные данные пользователя
                             if is_signing_task and creator_login:
-                                creator_display_name = get_user_display_name(creator_login)
+                                creator_display_name = await get_user_display_name(creator_login)
                                 ui.label(f'Создатель: {creator_display_name}').classes('text-sm mb-2')
                             else:
                                 ui.label(f'Создатель: {creator_name}').classes('text-sm mb-2')
@@ -3865,39 +3873,21 @@ async def open_document_preview(document_id: str):
         logger.error(f"Ошибка при открытии просмотра документа {document_id}: {e}", exc_info=True)
         ui.notify(f'Ошибка при открытии просмотра: {str(e)}', type='error')
 
-def get_user_display_name(username: str) -> str:
+async def get_user_display_name(username: str) -> str:
     """
     Получает отформатированное имя пользователя из логина (ФИО и должность)
     
+    Имя берется из снимка каталога LDAP; если снимок еще не загружен, он загружается
+    в пуле потоков LDAP, не блокируя цикл событий.
+    
     Args:
         username: Логин пользователя
         
     Returns:
-        Строка с именем, фамилией и должностью или логин, если не найдено
+        Строка "Фамилия Имя - Должность" или логин, если не найдено
     """
-    try:
-        ldap_auth = LDAPAuthenticator()
-        user_info = ldap_auth.get_user_by_login(username)
-        
-        if user_info:
-            # Формируем строку: "Фамилия Имя - Должность"
-            display_parts = []
-            if user_info.sn:
-                display_parts.append(user_info.sn)
-            if user_info.givenName:
-                display_parts.append(user_info.givenName)
-            
-            display_name = ' '.join(filter(None, display_parts))
-            
-            if user_info.destription:
-                display_name += f' - {user_info.destription}'
-            
-            return display_name if display_name else username
-        else:
-            return username
-    except Exception as e:
-        logger.warning(f"Не удалось получить данные пользователя {username} из LDAP: {e}")
-        return username
+    names = await ldap_directory.resolve_display_names([username])
+    return names[username]
 
 async def download_signed_document_from_task(document_id: str, document_name: str = None):
     """Скачивает документ с подписями из Mayan EDMS"""
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Замер пропускной способности запросов MayanClient при включенном логировании
+в файл и в базу данных (FILE + DATABASE, уровень INFO).
+
+Запросы выполняются к мок-транспорту httpx, поэтому время уходит только на
+работу клиента и логирование. Сравниваются режимы:
+- eager    - запись INFO на каждого пользователя (как было до сводок)
+- summary  - одна строка-сводка на страницу (текущий MayanClient.get_users)
+- limited  - summary + RateLimitFilter на обработчиках
+
+Использование:
+    python scripts/benchmark_logging.py
+    python scripts/benchmark_logging.py --requests 1000 --users 100
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+from app_logging.handlers import DatabaseLogHandler
+from app_logging.hot_path import RateLimitFilter
+from config.settings import DatabaseConfig, DatabaseType
+from services.http_pool import SharedHttpPool
+import services.mayan_connector as mayan_connector
+
+logger = logging.getLogger('benchmark')
+
+
+def configure_handlers(directory: Path, mode: str) -> DatabaseLogHandler:
+    """Подключает к корневому логгеру FILE и DATABASE обработчики"""
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(logging.INFO)
+
+    file_handler = logging.FileHandler(directory / f'{mode}.log', encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s'
+    ))
+    db_handler = DatabaseLogHandler(DatabaseConfig(
+        db_type=DatabaseType.SQLITE,
+        sqlite_path=str(directory / f'{mode}.db'),
+        spool_dir=str(directory / f'{mode}-spool'),
+    ))
+
+    for handler in (file_handler, db_handler):
+        if mode == 'limited':
+            handler.addFilter(rate_filter)
+        root.addHandler(handler)
+    return db_handler
+
+
+rate_filter = RateLimitFilter(rate=50, burst=100)
+
+
+async def run(mode: str, requests: int, users: int, directory: Path) -> None:
+    results = [{'id': i, 'username': f'user{i}'} for i in range(users)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={'count': users, 'next': None, 'results': results})
+
+    mayan_connector.mayan_http_pool = SharedHttpPool('benchmark', transport=httpx.MockTransport(handler))
+    client = mayan_connector.MayanClient('http://mayan', api_token='benchmark-token-0123456789')
+    db_handler = configure_handlers(directory, mode)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        page = await client.get_users(page_size=users)
+        if mode == 'eager':
+            for i, user in enumerate(page):
+                logger.info(f'Пользователь {i+1}: {user.get("username")} (ID: {user.get("id")})')
+    elapsed = time.perf_counter() - started
+
+    db_handler.close()
+    stats = db_handler.get_stats()
+    print(
+        f'{mode:8} {requests / elapsed:10.1f} запросов/с  '
+        f'записано в БД: {stats["written"]:7}  {stats["rows_per_sec"]:10.0f} строк/с  '
+        f'отброшено: {stats["dropped"] + rate_filter.suppressed if mode == "limited" else stats["dropped"]}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер пропускной способности запросов с логированием')
+    parser.add_argument('--requests', type=int, default=300, help='Количество запросов в каждом режиме')
+    parser.add_argument('--users', type=int, default=50, help='Пользователей на странице ответа')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('eager', 'summary', 'limited'):
+            asyncio.run(run(mode, args.requests, args.users, Path(directory)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
+import asyncio
+import hashlib
+import re
 import httpx
 from httpx import BasicAuth
 from datetime import datetime
 from services.document_access_manager import document_access_manager
+from services.http_pool import camunda_http_pool
+from utils.ttl_cache import TTLCache
+from config.settings import config as app_config
 import json
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Set, Union
 from urllib.parse import urljoin
 import os
 
@@ -30,9 +36,61 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# Кратковременный кеш ответов на GET запросы, общий для всех клиентов процесса.
+# Ключ включает учетные данные клиента, поэтому пользователи не видят ответы друг друга.
+_read_cache = TTLCache(max_size=2048, ttl=None)
+# Выполняющиеся GET запросы для объединения одинаковых запросов: ключ -> asyncio.Task
+_inflight_requests: Dict[tuple, 'asyncio.Task'] = {}
+# Номер поколения кеша увеличивается при каждой инвалидации, чтобы ответы на запросы,
+# начатые до изменения данных, не попадали в кеш
+_cache_generation = 0
+
+# Endpoints, принимающие POST запросы на чтение (запросы с фильтрами в теле)
+_QUERY_ENDPOINTS = {
+    'task', 'process-instance', 'variable-instance',
+    'history/task', 'history/process-instance', 'history/variable-instance',
+}
+
+
+def invalidate_camunda_cache() -> None:
+    """Сбрасывает кеш GET запросов к Camunda (вызывается после изменения данных)"""
+    global _cache_generation
+    _cache_generation += 1
+    _read_cache.clear()
+
+
 class CamundaClient:
     """Асинхронный клиент для работы с Camunda Community Edition 7.22 REST API"""
     
+    # Количество ID процессов в одном пакетном запросе переменных (processInstanceIdIn)
+    VARIABLE_BATCH_SIZE = 100
+    # Максимальное количество одновременных пакетных запросов
+    BATCH_CONCURRENCY = 4
+    
+    # Время жизни кешированных ответов на GET запросы по шаблонам endpoint (первое совпадение).
+    # Запросы к остальным endpoints не кешируются.
+    READ_CACHE_TTLS = [
+        (re.compile(r'^process-definition'), 60.0),
+        (re.compile(r'^history/'), 10.0),
+        (re.compile(r'^(task|process-instance)/[^/]+/variables'), 3.0),
+        (re.compile(r'^variable-instance'), 3.0),
+        (re.compile(r'^(task|process-instance)/[^/]+$'), 3.0),
+        (re.compile(r'^(task|process-instance)(/count)?$'), 2.0),
+    ]
+    
+    # Переменные процесса, отображаемые в списках процессов
+    PROCESS_DISPLAY_VARIABLES = [
+        'taskName', 'taskDescription', 'documentName', 'assigneeList',
+        'totalUsers', 'completedTasks', 'processNotes', 'dueDate',
+        'processCreator', 'creatorName'
+    ]
+    # Переменные, по которым рассчитывается прогресс Multi-Instance задач в списках процессов
+    # (assignee - локальная переменная активного экземпляра Multi-Instance)
+    PROGRESS_VARIABLES = [
+        'nrOfInstances', 'nrOfCompletedInstances', 'nrOfActiveInstances',
+        'assigneeList', 'signerList', 'userCompleted', 'signatures', 'assignee'
+    ]
+    
     def __init__(self, base_url: str, username: str = None, password: str = None, 
                  token: str = None, token_type: str = 'Bearer', verify_ssl: bool = False):
         """
@@ -64,13 +122,16 @@ class CamundaClient:
             self.auth_type = 'basic'
         else:
             raise ValueError("Необходимо указать либо username/password, либо token")
+        
+        # Область кеша GET запросов - хеш учетных данных клиента
+        credentials = headers.get('Authorization') or f'{username}:{password}'
+        self._cache_scope = hashlib.sha256(credentials.encode('utf-8')).hexdigest()[:16]
     
-        # Создаем httpx клиент
-        self.client = httpx.AsyncClient(
+        # Используем общий пул соединений процесса, учетные данные применяются к каждому запросу
+        self.client = camunda_http_pool.session(
             auth=auth,
             headers=headers,
-            verify=verify_ssl,
-            timeout=30.0
+            verify_ssl=verify_ssl
         )
     
     async def __aenter__(self):
@@ -82,7 +143,7 @@ class CamundaClient:
         await self.close()
     
     async def close(self):
-        """Закрывает HTTP клиент"""
+        """Освобождает клиент (соединения остаются в общем пуле)"""
         await self.client.aclose()
     
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
@@ -93,8 +154,70 @@ class CamundaClient:
         if 'json' in kwargs and 'files' not in kwargs:
             kwargs.setdefault('headers', {})['Content-Type'] = 'application/json'
         
-        response = await self.client.request(method, url, **kwargs)
-        return response
+        path = endpoint.lstrip('/').split('?', 1)[0].rstrip('/')
+        
+        if method.upper() != 'GET':
+            response = await self.client.request(method, url, **kwargs)
+            # Любое изменение данных (завершение задачи, запуск процесса, изменение переменных...)
+            # сбрасывает кеш чтения
+            if path not in _QUERY_ENDPOINTS:
+                invalidate_camunda_cache()
+            return response
+        
+        ttl = self._read_cache_ttl(path)
+        if ttl is None:
+            return await self.client.request(method, url, **kwargs)
+        return await self._cached_get(url, ttl, **kwargs)
+    
+    def _read_cache_ttl(self, path: str) -> Optional[float]:
+        """Возвращает время жизни кеша для endpoint или None, если ответ не кешируется"""
+        if not app_config.camunda_read_cache_enabled:
+            return None
+        for pattern, ttl in self.READ_CACHE_TTLS:
+            if pattern.match(path):
+                return ttl
+        return None
+    
+    async def _cached_get(self, url: str, ttl: float, **kwargs) -> httpx.Response:
+        """
+        Выполняет GET запрос через кратковременный кеш
+        
+        Одинаковые запросы, выполняющиеся одновременно, объединяются в один запрос к Camunda.
+        
+        Args:
+            url: Полный URL запроса
+            ttl: Время жизни ответа в кеше в секундах
+            **kwargs: Параметры запроса httpx
+            
+        Returns:
+            Ответ Camunda (возможно, из кеша)
+        """
+        params = kwargs.get('params')
+        frozen_params = tuple(sorted((str(k), str(v)) for k, v in params.items())) if isinstance(params, dict) else params
+        key = (self._cache_scope, url, frozen_params)
+        
+        cached = _read_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        generation = _cache_generation
+        flight_key = (id(asyncio.get_running_loop()), generation, key)
+        task = _inflight_requests.get(flight_key)
+        if task is None:
+            async def fetch() -> httpx.Response:
+                try:
+                    response = await self.client.request('GET', url, **kwargs)
+                    if response.status_code == 200 and generation == _cache_generation:
+                        _read_cache.set(key, response, ttl=ttl)
+                    return response
+                finally:
+                    _inflight_requests.pop(flight_key, None)
+            
+            task = asyncio.ensure_future(fetch())
+            _inflight_requests[flight_key] = task
+        
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(task)
     
     async def deploy_process(self, deployment_name: str, bpmn_file_path: str, 
                       enable_duplicate_filtering: bool = False,
@@ -136,9 +259,8 @@ class CamundaClient:
                 'data': (os.path.basename(bpmn_file_path), file_content, 'text/xml')
             }
             
-            # Выполняем запрос через httpx
-            url = urljoin(self.engine_rest_url, endpoint.lstrip('/'))
-            response = await self.client.post(url, data=data, files=files)
+            # Запрос через _make_request: развертывание сбрасывает кеш чтения (определения процессов)
+            response = await self._make_request('POST', endpoint, data=data, files=files)
             response.raise_for_status()
             
             deployment_data = response.json()
@@ -379,11 +501,14 @@ class CamundaClient:
                     tenant_id=task_data.get('tenantId')
                 )
                 
-                if fetch_variables:
-                    task.variables = await self.get_task_variables(task.id)
-                
                 tasks.append(task)
             
+            if fetch_variables and tasks:
+                # Переменные всех задач загружаются пакетно по их процессам
+                task_variables = await self.get_variables_for_tasks(tasks)
+                for task in tasks:
+                    task.variables = task_variables.get(task.id, {})
+            
             return tasks
         except httpx.HTTPError as e:
             logger.error(f"Ошибка при получении задач пользователя {assignee}: {e}")
@@ -1807,11 +1932,287 @@ class CamundaClient:
             logger.error(f"Ошибка при получении переменных исторической задачи {task_id}: {e}")
             return {}
     
+    async def _run_batched(self, items: List[Any], batch_size: int, fetch_batch) -> List[Any]:
+        """
+        Выполняет fetch_batch для пакетов items параллельно (не более BATCH_CONCURRENCY одновременно)
+        
+        Args:
+            items: Элементы для разбиения на пакеты
+            batch_size: Размер пакета
+            fetch_batch: Асинхронная функция, принимающая список элементов пакета
+            
+        Returns:
+            Список результатов fetch_batch в порядке пакетов
+        """
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        
+        async def run(batch: List[Any]) -> Any:
+            async with semaphore:
+                return await fetch_batch(batch)
+        
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        return await asyncio.gather(*(run(batch) for batch in batches))
+    
+    async def _query_variable_instances(self, process_instance_ids: List[str],
+                                        variable_names: Optional[List[str]] = None,
+                                        history: bool = False,
+                                        deserialize_values: bool = True) -> List[Dict[str, Any]]:
+        """
+        Получает экземпляры переменных нескольких процессов пакетными запросами
+        /variable-instance (или /history/variable-instance) с processInstanceIdIn
+        
+        Args:
+            process_instance_ids: ID экземпляров процессов (без повторов)
+            variable_names: Имена нужных переменных (если не указаны - все переменные)
+            history: Использовать историю (для завершенных процессов)
+            deserialize_values: Передавать deserializeValues=true (иначе запрос без параметра,
+                как в /task/{id}/variables)
+            
+        Returns:
+            Список экземпляров переменных в формате Camunda REST API
+        """
+        if not process_instance_ids:
+            return []
+        
+        endpoint = 'history/variable-instance' if history else 'variable-instance'
+        wanted = set(variable_names) if variable_names else None
+        
+        async def fetch_batch(batch: List[str]) -> List[Dict[str, Any]]:
+            query: Dict[str, Any] = {'processInstanceIdIn': batch}
+            if variable_names and len(variable_names) == 1:
+                query['variableName'] = variable_names[0]
+            params = {'deserializeValues': 'true'} if deserialize_values else None
+            response = await self._make_request('POST', endpoint, params=params, json=query)
+            response.raise_for_status()
+            return response.json()
+        
+        results = await self._run_batched(process_instance_ids, self.VARIABLE_BATCH_SIZE, fetch_batch)
+        # Запрос по списку имен есть не во всех версиях REST API, поэтому фильтруем на стороне клиента
+        return [
+            var for batch_result in results for var in batch_result
+            if not wanted or var.get('name') in wanted
+        ]
+    
+    async def get_variables_for_process_instances(self, process_instance_ids: List[str],
+                                                  variable_names: Optional[List[str]] = None,
+                                                  history: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Получает переменные нескольких экземпляров процессов пакетными запросами
+        
+        Args:
+            process_instance_ids: ID экземпляров процессов
+            variable_names: Имена нужных переменных (если не указаны - все переменные)
+            history: Использовать историю (для завершенных процессов)
+            
+        Returns:
+            Словарь {process_instance_id: {имя переменной: значение}}
+        """
+        process_instance_ids = list(dict.fromkeys(pid for pid in process_instance_ids if pid))
+        variable_instances = await self._query_variable_instances(process_instance_ids, variable_names, history)
+        return self._group_process_variables(process_instance_ids, variable_instances)
+    
+    @staticmethod
+    def _group_process_variables(process_instance_ids: List[str], variable_instances: List[Dict[str, Any]],
+                                 variable_names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Раскладывает экземпляры переменных по процессам
+        
+        Args:
+            process_instance_ids: ID экземпляров процессов
+            variable_instances: Экземпляры переменных в формате Camunda REST API
+            variable_names: Имена нужных переменных (если не указаны - все переменные)
+            
+        Returns:
+            Словарь {process_instance_id: {имя переменной: значение}}
+        """
+        variables: Dict[str, Dict[str, Any]] = {pid: {} for pid in process_instance_ids}
+        for var in variable_instances:
+            name = var.get('name')
+            process_instance_id = var.get('processInstanceId')
+            if process_instance_id not in variables or (variable_names and name not in variable_names):
+                continue
+            # Переменные уровня процесса имеют приоритет над локальными переменными задач
+            if var.get('activityInstanceId') not in (None, process_instance_id) and name in variables[process_instance_id]:
+                continue
+            variables[process_instance_id][name] = var.get('value')
+        
+        return variables
+    
+    async def get_variables_for_tasks(self, tasks: List[Any], variable_names: Optional[List[str]] = None,
+                                      history: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Получает переменные для списка задач одним пакетным запросом по их процессам
+        
+        Экземпляры процессов запрашиваются без повторов. Область видимости каждой
+        переменной определяется по activityInstanceId/executionId из того же ответа,
+        без дополнительных запросов. Задаче видны только переменные ее собственной
+        цепочки областей, более вложенная область важнее родительской:
+        локальные переменные задачи, переменные ее исполнения, переменные тела
+        Multi-Instance этой задачи, переменные процесса. Переменные других веток
+        процесса и локальные переменные других задач не видны. Значения
+        запрашиваются без deserializeValues, как и в /task/{id}/variables.
+        
+        Args:
+            tasks: Задачи (объекты с атрибутами id, process_instance_id, execution_id,
+                task_definition_key)
+            variable_names: Имена нужных переменных (если не указаны - все переменные)
+            history: Использовать историю (для завершенных задач)
+            
+        Returns:
+            Словарь {task_id: {имя переменной: значение}}
+        """
+        tasks_by_process: Dict[str, List[Any]] = {}
+        for task in tasks:
+            process_instance_id = getattr(task, 'process_instance_id', None)
+            if process_instance_id:
+                tasks_by_process.setdefault(process_instance_id, []).append(task)
+        
+        variable_instances = await self._query_variable_instances(
+            list(tasks_by_process), variable_names, history, deserialize_values=False
+        )
+        
+        # Экземпляры тел Multi-Instance по (процесс, ID активности): тело однозначно
+        # является родительской областью задачи, только если оно единственное
+        multi_instance_bodies: Dict[tuple, Set[str]] = {}
+        for var in variable_instances:
+            activity_instance_id = var.get('activityInstanceId') or ''
+            if '#multiInstanceBody:' in activity_instance_id:
+                activity_id = activity_instance_id.split('#multiInstanceBody:', 1)[0]
+                multi_instance_bodies.setdefault(
+                    (var.get('processInstanceId'), activity_id), set()
+                ).add(activity_instance_id)
+        
+        result: Dict[str, Dict[str, Any]] = {task.id: {} for task in tasks}
+        priorities: Dict[tuple, int] = {}
+        for var in variable_instances:
+            process_instance_id = var.get('processInstanceId')
+            name = var.get('name')
+            activity_instance_id = var.get('activityInstanceId')
+            execution_id = var.get('executionId')
+            is_process_scope = (activity_instance_id or execution_id or process_instance_id) == process_instance_id
+            for task in tasks_by_process.get(process_instance_id, []):
+                if var.get('taskId'):
+                    # Локальные переменные других задач не видны
+                    if var.get('taskId') != task.id:
+                        continue
+                    priority = 4
+                elif execution_id and execution_id == getattr(task, 'execution_id', None):
+                    priority = 3
+                elif multi_instance_bodies.get(
+                    (process_instance_id, getattr(task, 'task_definition_key', None))
+                ) == {activity_instance_id}:
+                    priority = 2
+                elif is_process_scope:
+                    priority = 1
+                else:
+                    # Переменные других веток процесса не видны
+                    continue
+                if priorities.get((task.id, name), -1) < priority:
+                    priorities[(task.id, name)] = priority
+                    result[task.id][name] = var.get('value')
+        
+        return result
+    
+    async def _get_history_process_instances(self, process_instance_ids: List[str]) -> List[Dict[str, Any]]:
+        """Получает исторические записи нескольких процессов пакетными запросами"""
+        async def fetch_batch(batch: List[str]) -> List[Dict[str, Any]]:
+            response = await self._make_request(
+                'POST', 'history/process-instance', json={'processInstanceIds': batch}
+            )
+            response.raise_for_status()
+            return response.json()
+        
+        results = await self._run_batched(process_instance_ids, self.VARIABLE_BATCH_SIZE, fetch_batch)
+        return [process for batch_result in results for process in batch_result]
+    
+    @staticmethod
+    def _json_variable(value: Any, default: Any) -> Any:
+        """Возвращает значение переменной, сохраненной как JSON строка или объект Camunda"""
+        if isinstance(value, dict) and 'value' in value:
+            value = value['value']
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return default
+        return default if value is None else value
+    
+    def _progress_from_variables(self, process_instance_id: str,
+                                 variable_instances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Рассчитывает прогресс Multi-Instance задачи по экземплярам переменных процесса
+        
+        Результат совпадает по формату с get_task_progress, но не требует запросов:
+        счетчики nrOf* берутся из тела Multi-Instance, списки пользователей - из
+        переменных процесса. Если userCompleted/signatures неполны, пока экземпляры
+        Multi-Instance активны, пользователь считается завершившим задачу, когда у него
+        нет активного экземпляра (локальной переменной assignee).
+        
+        Args:
+            process_instance_id: ID экземпляра процесса
+            variable_instances: Экземпляры переменных этого процесса (PROGRESS_VARIABLES)
+            
+        Returns:
+            Словарь с информацией о прогрессе
+        """
+        process_variables: Dict[str, Any] = {}
+        counters: Dict[str, Any] = {}
+        active_assignees: Set[str] = set()
+        for var in variable_instances:
+            name = var.get('name')
+            is_process_scope = var.get('activityInstanceId') in (None, process_instance_id)
+            if name == 'assignee':
+                if not is_process_scope and var.get('value'):
+                    active_assignees.add(var['value'])
+            elif name.startswith('nrOf'):
+                # Счетчики тела Multi-Instance важнее одноименных переменных процесса
+                if not is_process_scope or name not in counters:
+                    counters[name] = var.get('value')
+            elif is_process_scope or name not in process_variables:
+                process_variables[name] = var.get('value')
+        
+        nr_of_instances = counters.get('nrOfInstances') or 0
+        nr_of_completed_instances = counters.get('nrOfCompletedInstances') or 0
+        
+        # Поддерживаем как задачи ознакомления (assigneeList), так и задачи подписания (signerList)
+        assignee_list = self._json_variable(process_variables.get('assigneeList'), [])
+        signer_list = self._json_variable(process_variables.get('signerList'), [])
+        user_list = signer_list if signer_list and not assignee_list else assignee_list
+        
+        user_completed = self._json_variable(process_variables.get('userCompleted'), {})
+        signatures = self._json_variable(process_variables.get('signatures'), {})
+        if signatures and isinstance(signatures, dict):
+            user_completed = {user: user in signatures for user in user_list}
+        if not isinstance(user_completed, dict):
+            user_completed = {}
+        
+        user_status = []
+        for user in user_list:
+            if user in user_completed:
+                completed = bool(user_completed[user])
+            else:
+                completed = 'nrOfInstances' in counters and user not in active_assignees
+            user_status.append({
+                'user': user,
+                'completed': completed,
+                'status': 'Завершено' if completed else 'В процессе'
+            })
+        
+        return {
+            'completed_reviews': nr_of_completed_instances,
+            'total_reviews': nr_of_instances,
+            'progress_percent': (nr_of_completed_instances / nr_of_instances) * 100 if nr_of_instances > 0 else 0,
+            'user_status': user_status,
+            'is_complete': nr_of_completed_instances >= nr_of_instances
+        }
+    
     async def get_processes_by_creator(self, creator_username: str, active_only: bool = True) -> List[Dict[str, Any]]:
         """
         Получает процессы, созданные конкретным пользователем
         
-        Использует оптимизированный подход с фильтрацией через Camunda REST API
+        Активные процессы отбираются по processCreator на стороне Camunda, а их
+        переменные и прогресс загружаются пакетными запросами с processInstanceIdIn,
+        поэтому количество запросов не зависит линейно от количества процессов.
         
         Args:
             creator_username: Имя пользователя-создателя
@@ -1824,54 +2225,34 @@ class CamundaClient:
             logger.info(f"Поиск процессов создателя: {creator_username}, active_only: {active_only}")
             
             if active_only:
-                # Для активных процессов используем endpoint /process-instance
-                endpoint = 'process-instance'
-                
-                # Получаем все активные процессы
-                response = await self._make_request('GET', endpoint)
+                # Активные процессы создателя отбираются фильтром по переменной на стороне Camunda
+                # (JSON запрос вместо processCreator_eq_<user>, чтобы логин мог содержать '_')
+                response = await self._make_request('POST', 'process-instance', json={
+                    'variables': [{'name': 'processCreator', 'operator': 'eq', 'value': creator_username}]
+                })
                 response.raise_for_status()
-                all_processes = response.json()
+                creator_processes = response.json()
                 
-                logger.info(f"Найдено активных процессов всего: {len(all_processes)}")
-                
-                # Если процессов нет, возвращаем пустой список
-                if not all_processes:
-                    logger.info("Активных процессов не найдено")
-                    return []
-                
-                # Фильтруем по создателю, получая переменные только для нужных процессов
-                creator_processes = []
-                
-                # Оптимизация: проверяем переменные пакетами для уменьшения количества запросов
-                for process in all_processes:
-                    process_id = process['id']
+                if creator_processes:
+                    # Отображаемые переменные и переменные прогресса - одним набором пакетных запросов
+                    process_ids = [process['id'] for process in creator_processes]
+                    variable_instances = await self._query_variable_instances(
+                        process_ids, list(dict.fromkeys(self.PROCESS_DISPLAY_VARIABLES + self.PROGRESS_VARIABLES))
+                    )
+                    variables = self._group_process_variables(
+                        process_ids, variable_instances, self.PROCESS_DISPLAY_VARIABLES
+                    )
+                    by_process: Dict[str, List[Dict[str, Any]]] = {pid: [] for pid in process_ids}
+                    for var in variable_instances:
+                        by_process.setdefault(var.get('processInstanceId'), []).append(var)
                     
-                    try:
-                        # Получаем только переменную processCreator, если она есть
-                        variables = await self.get_process_instance_variables_by_name(
-                            process_id, 
-                            ['processCreator']
-                        )
-                        process_creator = variables.get('processCreator', '')
-                        
-                        logger.debug(f"Процесс {process_id}: processCreator = '{process_creator}', ищем '{creator_username}'")
-                        
-                        if process_creator == creator_username:
-                            logger.info(f"Найден процесс создателя: {process_id}")
-                            # Получаем расширенную информацию о процессе
-                            expanded_process = await self.get_process_with_variables(process_id, is_active=True)
-                            if expanded_process:
-                                creator_processes.append(expanded_process)
-                            else:
-                                # Если не удалось получить расширенную информацию, добавляем базовую
-                                creator_processes.append(process)
-                        elif process_creator:
-                            logger.debug(f"Процесс {process_id} создан другим пользователем: '{process_creator}'")
-                        else:
-                            logger.debug(f"Процесс {process_id} не имеет переменной processCreator")
-                            
-                    except Exception as e:
-                        logger.warning(f"Не удалось получить переменные для процесса {process_id}: {e}")
+                    for process in creator_processes:
+                        process['variables'] = variables.get(process['id'], {})
+                        try:
+                            process['progress'] = self._progress_from_variables(process['id'], by_process[process['id']])
+                        except Exception as e:
+                            logger.warning(f"Не удалось рассчитать прогресс процесса {process['id']}: {e}")
+                            process['progress'] = None
                 
                 logger.info(f"Найдено процессов создателя '{creator_username}': {len(creator_processes)}")
                 return creator_processes
@@ -1892,39 +2273,29 @@ class CamundaClient:
                     variable_instances = response.json()
                     
                     # Получаем уникальные ID процессов из переменных
-                    process_ids = set()
-                    for var_instance in variable_instances:
-                        process_instance_id = var_instance.get('processInstanceId')
-                        if process_instance_id:
-                            process_ids.add(process_instance_id)
+                    process_ids = list(dict.fromkeys(
+                        var_instance.get('processInstanceId')
+                        for var_instance in variable_instances
+                        if var_instance.get('processInstanceId')
+                    ))
                     
                     if not process_ids:
                         logger.info("Завершенных процессов создателя не найдено")
                         return []
                     
-                    # Получаем информацию о процессах по их ID и ПРОВЕРЯЕМ, ЧТО ОНИ ЗАВЕРШЕНЫ
-                    creator_processes = []
-                    for process_id in process_ids:
-                        try:
-                            # Получаем информацию о процессе из истории
-                            history_endpoint = f'history/process-instance/{process_id}'
-                            process_response = await self._make_request('GET', history_endpoint)
-                            process_response.raise_for_status()
-                            process_data = process_response.json()
-                            
-                            # ВАЖНО: Проверяем, что процесс действительно завершен (имеет endTime)
-                            if process_data and process_data.get('endTime'):
-                                # Получаем расширенную информацию о процессе
-                                expanded_process = await self.get_process_with_variables(process_id, is_active=False)
-                                if expanded_process:
-                                    creator_processes.append(expanded_process)
-                                else:
-                                    creator_processes.append(process_data)
-                            else:
-                                # Процесс еще активен, пропускаем его (он будет в списке активных)
-                                logger.debug(f"Процесс {process_id} еще активен (нет endTime), пропускаем в завершенных")
-                        except Exception as e:
-                            logger.warning(f"Не удалось получить информацию о процессе {process_id}: {e}")
+                    # ВАЖНО: оставляем только действительно завершенные процессы (имеющие endTime),
+                    # активные процессы попадут в список активных
+                    history_processes = await self._get_history_process_instances(process_ids)
+                    creator_processes = [process for process in history_processes if process.get('endTime')]
+                    
+                    if creator_processes:
+                        variables = await self.get_variables_for_process_instances(
+                            [process['id'] for process in creator_processes],
+                            self.PROCESS_DISPLAY_VARIABLES,
+                            history=True
+                        )
+                        for process in creator_processes:
+                            process['variables'] = variables.get(process['id'], {})
                     
                     logger.info(f"Найдено завершенных процессов создателя '{creator_username}': {len(creator_processes)}")
                     return creator_processes
@@ -2281,9 +2652,7 @@ class CamundaClient:
                 # Получаем переменные процесса
                 process_variables = await self.get_process_instance_variables_by_name(
                     process_id,
-                    ['taskName', 'taskDescription', 'documentName', 'assigneeList', 
-                     'totalUsers', 'completedTasks', 'processNotes', 'dueDate',
-                     'processCreator', 'creatorName']
+                    self.PROCESS_DISPLAY_VARIABLES
                 )
             else:
                 # Для исторических процессов
@@ -2295,9 +2664,7 @@ class CamundaClient:
                 # Получаем исторические переменные
                 process_variables = await self.get_history_process_instance_variables_by_name(
                     process_id,
-                    ['taskName', 'taskDescription', 'documentName', 'assigneeList',
-                     'totalUsers', 'completedTasks', 'processNotes', 'dueDate',
-                     'processCreator', 'creatorName']
+                    self.PROCESS_DISPLAY_VARIABLES
                 )
             
             # Добавляем переменные к данным процесса
@@ -2368,6 +2735,10 @@ async def create_camunda_client(username: str = None, password: str = None, use_
     """
     Создает клиент Camunda с настройками из конфигурации или с учетными данными пользователя
     
+    Клиент легковесный: соединения берутся из общего пула camunda_http_pool,
+    а учетные данные применяются к каждому запросу, поэтому создание клиента
+    на каждое обновление страницы не открывает новых соединений.
+    
     Args:
         username: Имя пользователя для аутентификации (если не указано, используется системное)
         password: Пароль для аутентификации (если не указано, используется системный)
@@ -1,7 +1,8 @@
 # services/document_access_manager.py
 
 from typing import List, Optional, Dict, Any
-from services.mayan_connector import MayanClient, MayanDocument
+from services.mayan_connector import MayanClient, MayanDocument, mayan_user_index
+from services.reference_data import reference_data, PERMISSIONS
 from models import UserSession
 from app_logging.logger import get_logger
 
@@ -42,31 +43,14 @@ class DocumentAccessManager:
         try:
             client = await self._get_mayan_client()
             
-            # Получаем список пользователей
-            users = await client.get_users()
-            logger.info(f'Получено {len(users)} пользователей из Mayan EDMS')
-            
-            if not users:
-                logger.error('В Mayan EDMS не найдено пользователей')
-                return False
-            
-            # Находим пользователя по имени
-            user_id = None
-            user_info = None
-            for user in users:
-                logger.info(f'Проверяем пользователя: {user.get("username")}')
-                if user['username'] == username:
-                    user_id = user['id']
-                    user_info = user
-                    break
+            # Находим пользователя по имени в общем индексе пользователей (все страницы users/)
+            user_id = await mayan_user_index.get_user_id(username)
             
             if not user_id:
                 logger.error(f'Пользователь {username} не найден в Mayan EDMS')
-                logger.error(f'Доступные пользователи: {[u["username"] for u in users]}')
                 return False
             
             logger.info(f'Найден пользователь {username} с ID: {user_id}')
-            logger.info(f'Информация о пользователе: {user_info}')
             
             # Создаем ACL для документа с пользователем через правильный endpoint
             acl = await client.create_acl_for_object('documents', 'document', document_id, user_id=user_id)
@@ -117,7 +101,7 @@ class DocumentAccessManager:
             client = await self._get_mayan_client()
             
             # Получаем список ролей
-            roles = await client.get_roles()
+            roles = await client.collect_all(client.iter_roles())
             logger.info(f'Получено {len(roles)} ролей из Mayan EDMS')
             
             # Находим роль по имени
@@ -253,7 +237,7 @@ class DocumentAccessManager:
             client = await self._get_mayan_client()
             
             # Получаем список ролей
-            roles = await client.get_roles()
+            roles = await client.collect_all(client.iter_roles())
             logger.info(f'Получено {len(roles)} ролей из Mayan EDMS')
             
             # Находим роль по имени
@@ -321,7 +305,7 @@ class DocumentAccessManager:
             client = await self._get_mayan_client()
             
             # Получаем список ролей
-            roles = await client.get_roles()
+            roles = await client.collect_all(client.iter_roles())
             logger.info(f'Получено {len(roles)} ролей из Mayan EDMS')
             
             # Находим роль по имени
@@ -386,12 +370,7 @@ class DocumentAccessManager:
             acls = await client.get_object_acls_list('documents', 'document', document_id)
             
             # Находим пользователя
-            users = await client.get_users()
-            user_id = None
-            for user in users:
-                if user['username'] == username:
-                    user_id = user['id']
-                    break
+            user_id = await mayan_user_index.get_user_id(username)
             
             if not user_id:
                 logger.error(f'Пользователь {username} не найден')
@@ -436,7 +415,7 @@ class DocumentAccessManager:
             acls = await client.get_object_acls_list('documents', 'document', document_id)
             
             # Находим роль
-            roles = await client.get_roles()
+            roles = await client.collect_all(client.iter_roles())
             role_id = None
             for role in roles:
                 if role['label'] == role_name:
@@ -499,8 +478,8 @@ class DocumentAccessManager:
                 if acls_list:
                     # Получаем роли и пользователей для контекста
                     try:
-                        roles = {role['id']: role for role in await client.get_roles()}
-                        users = {user['id']: user for user in await client.get_users()}
+                        roles = {role['id']: role for role in await client.collect_all(client.iter_roles())}
+                        users = {user['id']: user for user in await client.collect_all(client.iter_users())}
                     except Exception as e:
                         logger.warning(f'Не удалось получить роли или пользователей: {e}')
                         roles = {}
@@ -597,7 +576,7 @@ class DocumentAccessManager:
             client = await self._get_mayan_client()
             
             logger.info('=== ПОЛУЧАЕМ РОЛИ ===')
-            roles = await client.get_roles()
+            roles = await client.collect_all(client.iter_roles())
             logger.info(f'Получено {len(roles)} ролей из Mayan EDMS')
             
             if not roles:
@@ -656,7 +635,7 @@ class DocumentAccessManager:
         """
         try:
             client = await self._get_mayan_client()
-            permissions = await client.get_permissions()
+            permissions = await client.collect_all(client.iter_permissions())
             
             logger.info(f'Получено {len(permissions)} разрешений')
             
@@ -695,7 +674,7 @@ class DocumentAccessManager:
         """
         try:
             client = await self._get_mayan_client()
-            permissions = await client.get_permissions()
+            permissions = await client.collect_all(client.iter_permissions())
             
             logger.info('=== ДОСТУПНЫЕ РАЗРЕШЕНИЯ ===')
             logger.info(f'Всего разрешений: {len(permissions)}')
@@ -739,14 +718,11 @@ class DocumentAccessManager:
     async def _get_permission_id(self, client: MayanClient, permission_name: str) -> Optional[int]:
         """
         Получает ID разрешения по названию
+        
+        Соответствие label -> ID берется из общего кеша справочных данных,
+        поэтому список разрешений не загружается заново для каждой выдачи доступа.
         """
         try:
-            logger.info(f'=== ПОИСК РАЗРЕШЕНИЯ ===')
-            logger.info(f'Ищем разрешение: {permission_name}')
-            
-            permissions = await client.get_permissions()
-            logger.info(f'Получено {len(permissions)} разрешений')
-            
             # Маппинг разрешений - используем человекочитаемые названия
             permission_map = {
                 'read': 'View documents',
@@ -762,40 +738,14 @@ class DocumentAccessManager:
                 logger.error(f'Доступные разрешения: {list(permission_map.keys())}')
                 return None
             
-            logger.info(f'Ищем разрешение по label: {mayan_permission}')
-            
-            # Ищем разрешение по label
-            for permission in permissions:
-                if permission:
-                    label = permission.get('label', '')
-                    if label == mayan_permission:
-                        pk = permission.get('pk')
-                        if pk:
-                            logger.info(f'Найдено разрешение {mayan_permission} с pk: {pk}')
-                            
-                            # Получаем числовой ID через детальную информацию
-                            numeric_id = await client.get_permission_id_by_pk(pk)
-                            if numeric_id:
-                                logger.info(f'Получен числовой ID: {numeric_id}')
-                                return numeric_id
-                            else:
-                                logger.warning(f'Не удалось получить числовой ID для {pk}')
-                                # Попробуем использовать pk как есть (может сработать)
-                                return pk
-            
-            logger.error(f'Разрешение {mayan_permission} не найдено')
-            
-            # Показываем все разрешения для отладки
-            logger.error('=== ВСЕ РАЗРЕШЕНИЯ ДЛЯ ОТЛАДКИ ===')
-            for permission in permissions[:10]:  # Показываем первые 10
-                if permission:
-                    perm_id = permission.get('id', 'N/A')
-                    perm_pk = permission.get('pk', 'N/A')
-                    perm_label = permission.get('label', 'N/A')
-                    perm_url = permission.get('url', 'N/A')
-                    logger.error(f'ID: {perm_id}, PK: {perm_pk}, Label: {perm_label}, URL: {perm_url}')
+            permissions = await reference_data.get(PERMISSIONS, fallback_client=client)
+            permission_id = permissions.get(mayan_permission)
+            if permission_id is None:
+                logger.error(f'Разрешение {mayan_permission} не найдено среди {len(permissions)} разрешений')
+                return None
             
-            return None
+            logger.debug(f'Найдено разрешение {mayan_permission} с ID: {permission_id}')
+            return permission_id
             
         except Exception as e:
             logger.error(f'Ошибка при поиске разрешения: {e}')
@@ -864,9 +814,9 @@ class DocumentAccessManager:
         try:
             client = await self._get_mayan_client()
             
-            # Получаем все роли (без пагинации, если возможно)
+            # Получаем все роли со всех страниц
             logger.info(f'Получаем все роли для поиска пользователя {username}')
-            all_roles = await client.get_roles(page=1, page_size=1000)
+            all_roles = await client.collect_all(client.iter_roles())
             logger.info(f'Получено {len(all_roles)} ролей')
             
             # Находим роли, в которых состоит пользователь
@@ -932,7 +882,7 @@ class DocumentAccessManager:
             
             # Шаг 1: Получаем все группы через системный клиент
             logger.info('Шаг 1: Получаем все группы (используем системный клиент)')
-            all_groups = await system_client.get_groups()
+            all_groups = await system_client.collect_all(system_client.iter_groups())
             logger.info(f'Получено {len(all_groups)} групп')
             
             if not all_groups:
@@ -992,7 +942,7 @@ class DocumentAccessManager:
             # Шаг 4: Получаем все роли и для каждой роли получаем группы
             # Используем системный клиент для получения ролей
             logger.info('Шаг 4: Получаем роли и их группы (используем системный клиент)')
-            all_roles = await system_client.get_roles(page=1, page_size=1000)
+            all_roles = await reference_data.get_roles()
             logger.info(f'Получено {len(all_roles)} ролей')
             
             if not all_roles:
@@ -1042,7 +992,7 @@ class DocumentAccessManager:
             permission_names = AccessTypeManager.get_access_type_permissions(AccessType.SUBSCRIBE_DOCUMENT)
             
             # Получаем все разрешения через пользовательский клиент
-            all_permissions = await user_client.get_permissions()
+            all_permissions = await user_client.collect_all(user_client.iter_permissions())
             
             # Составляем маппинг название -> pk
             permission_map = {}
@@ -1123,7 +1073,7 @@ class DocumentAccessManager:
             permission_names = AccessTypeManager.get_access_type_permissions(AccessType.SUBSCRIBE_DOCUMENT)
             
             # Получаем все разрешения
-            all_permissions = await client.get_permissions()
+            all_permissions = await client.collect_all(client.iter_permissions())
             
             # Составляем маппинг название -> pk
             permission_map = {}
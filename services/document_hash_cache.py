@@ -2,53 +2,108 @@
 """
 Модуль для постоянного кеширования хешей документов из Mayan EDMS.
 Использует SQLite для быстрого поиска дубликатов по хешу файла.
+
+Все обращения к базе выполняются в отдельном потоке, которому принадлежит
+единственное долгоживущее соединение в режиме WAL, поэтому проверки
+дубликатов из email/directory конвейеров не блокируют цикл событий
+дисковым вводом-выводом.
+
+Синхронизация с Mayan инкрементальная: для каждого кабинета хранится
+максимальный ID документа, до которого документы прочитаны без пропусков,
+и при следующем запуске запрашиваются только более новые документы.
 """
+import asyncio
+import functools
+import json
+import math
+import re
 import sqlite3
-from pathlib import Path
-from typing import Optional, Set, List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
-import asyncio
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
 from app_logging.logger import get_logger
 
 logger = get_logger(__name__)
 
+T = TypeVar('T')
+
+_HASH_PATTERN = re.compile(r'"attachment_hash"\s*:\s*"([a-f0-9]{64})"')
+
+_UPSERT_SQL = """
+    INSERT INTO document_hashes
+        (hash, document_id, filename, message_id, cabinet_id, created_at, updated_at, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(hash) DO UPDATE SET
+        document_id = excluded.document_id,
+        filename = excluded.filename,
+        message_id = excluded.message_id,
+        cabinet_id = excluded.cabinet_id,
+        updated_at = excluded.updated_at,
+        metadata = excluded.metadata
+"""
+
 
 class DocumentHashCache:
     """
     Кеш хешей документов для быстрой проверки дубликатов.
     Использует SQLite с индексом по хешу для быстрого поиска.
     """
-    
+
+    # Размер страницы документов при синхронизации с Mayan
+    SYNC_PAGE_SIZE = 100
+    # Максимальное количество параллельных запросов страниц при синхронизации
+    SYNC_CONCURRENCY = 4
+
     def __init__(self, cache_db_path: Optional[Path] = None):
         """
         Инициализация кеша
-        
+
         Args:
-            cache_db_path: Путь к файлу SQLite базы данных. 
+            cache_db_path: Путь к файлу SQLite базы данных.
                           Если None, используется logs/document_hash_cache.db
         """
         if cache_db_path is None:
             # Используем директорию logs в корне проекта
             cache_db_path = Path(__file__).parent.parent / 'logs' / 'document_hash_cache.db'
-        
+
         self.cache_db_path = Path(cache_db_path)
         self.cache_db_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Блокировка для потокобезопасности
+
+        # Блокировка, чтобы синхронизация с Mayan не выполнялась параллельно
         self._lock = asyncio.Lock()
-        
+
+        # Единственный поток, которому принадлежит соединение с базой
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hash-cache')
+        self._conn: Optional[sqlite3.Connection] = None
+
         # Инициализируем базу данных
-        self._init_database()
-    
+        self._executor.submit(self._init_database).result()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Соединение потока кеша (создается при первом обращении)"""
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.cache_db_path), timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            # WAL: чтение не блокируется записью, fsync только при контрольной точке
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        """Выполняет блокирующую функцию в потоке кеша"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
     def _init_database(self):
         """Инициализирует базу данных и создает таблицу если не существует"""
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=30.0) as conn:
-                cursor = conn.cursor()
-                
+            conn = self._connection()
+            with conn:
                 # Создаем таблицу для хранения хешей
-                cursor.execute("""
+                conn.execute("""
                     CREATE TABLE IF NOT EXISTS document_hashes (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         hash TEXT NOT NULL UNIQUE,
@@ -61,129 +116,113 @@ class DocumentHashCache:
                         metadata TEXT
                     )
                 """)
-                
+
                 # Создаем уникальный индекс по хешу для быстрого поиска
-                cursor.execute("""
-                    CREATE UNIQUE INDEX IF NOT EXISTS idx_hash_unique 
+                conn.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_hash_unique
                     ON document_hashes(hash)
                 """)
-                
+
                 # Создаем индекс по document_id для быстрого поиска по ID документа
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_document_id 
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_document_id
                     ON document_hashes(document_id)
                 """)
-                
+
                 # Создаем индекс по message_id для быстрого поиска по message_id
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_message_id 
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_message_id
                     ON document_hashes(message_id)
                 """)
-                
+
                 # Создаем индекс по cabinet_id для фильтрации по кабинету
-                cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_cabinet_id 
+                conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_cabinet_id
                     ON document_hashes(cabinet_id)
                 """)
-                
-                conn.commit()
-                
-                logger.info(f"База данных кеша хешей инициализирована: {self.cache_db_path}")
+
+                # Последний синхронизированный документ Mayan для каждого кабинета
+                # (cabinet_key = 0 - синхронизация без кабинета)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS sync_state (
+                        cabinet_key INTEGER PRIMARY KEY,
+                        last_document_id INTEGER NOT NULL,
+                        synced_at DATETIME NOT NULL
+                    )
+                """)
+
+            logger.info(f"База данных кеша хешей инициализирована: {self.cache_db_path}")
         except Exception as e:
             logger.error(f"Ошибка инициализации базы данных кеша хешей: {e}", exc_info=True)
             raise
-    
-    def hash_exists(self, file_hash: str, cabinet_id: Optional[int] = None) -> bool:
-        """
-        Проверяет, существует ли хеш в кеше
-        
-        Args:
-            file_hash: SHA256 хеш файла
-            cabinet_id: ID кабинета для фильтрации (опционально)
-        
-        Returns:
-            True если хеш найден, False иначе
-        """
-        if not file_hash:
-            return False
-        
-        try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                cursor = conn.cursor()
-                
-                if cabinet_id is not None:
-                    cursor.execute("""
-                        SELECT 1 FROM document_hashes 
-                        WHERE hash = ? AND cabinet_id = ?
-                        LIMIT 1
-                    """, (file_hash, cabinet_id))
-                else:
-                    cursor.execute("""
-                        SELECT 1 FROM document_hashes 
-                        WHERE hash = ?
-                        LIMIT 1
-                    """, (file_hash,))
-                
-                return cursor.fetchone() is not None
-        except Exception as e:
-            logger.error(f"Ошибка проверки хеша в кеше: {e}", exc_info=True)
-            return False
-    
-    def get_document_by_hash(
-        self, 
-        file_hash: str, 
+
+    async def get_document_by_hash(
+        self,
+        file_hash: str,
         cabinet_id: Optional[int] = None
     ) -> Optional[Dict[str, Any]]:
         """
-        Получает информацию о документе по хешу
-        
+        Получает информацию о документе по хешу (один запрос к базе)
+
         Args:
             file_hash: SHA256 хеш файла
             cabinet_id: ID кабинета для фильтрации (опционально)
-        
+
         Returns:
             Словарь с информацией о документе или None
         """
         if not file_hash:
             return None
-        
+
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                if cabinet_id is not None:
-                    cursor.execute("""
-                        SELECT * FROM document_hashes 
-                        WHERE hash = ? AND cabinet_id = ?
-                        LIMIT 1
-                    """, (file_hash, cabinet_id))
-                else:
-                    cursor.execute("""
-                        SELECT * FROM document_hashes 
-                        WHERE hash = ?
-                        LIMIT 1
-                    """, (file_hash,))
-                
-                row = cursor.fetchone()
-                if row:
-                    return {
-                        'id': row['id'],
-                        'hash': row['hash'],
-                        'document_id': row['document_id'],
-                        'filename': row['filename'],
-                        'message_id': row['message_id'],
-                        'cabinet_id': row['cabinet_id'],
-                        'created_at': row['created_at'],
-                        'updated_at': row['updated_at'],
-                        'metadata': json.loads(row['metadata']) if row['metadata'] else None
-                    }
-                return None
+            return await self._run(self._get_document_by_hash, file_hash, cabinet_id)
         except Exception as e:
             logger.error(f"Ошибка получения документа по хешу: {e}", exc_info=True)
             return None
-    
-    def add_hash(
+
+    def _get_document_by_hash(self, file_hash: str, cabinet_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        conn = self._connection()
+        if cabinet_id is not None:
+            row = conn.execute("""
+                SELECT * FROM document_hashes
+                WHERE hash = ? AND cabinet_id = ?
+                LIMIT 1
+            """, (file_hash, cabinet_id)).fetchone()
+        else:
+            row = conn.execute("""
+                SELECT * FROM document_hashes
+                WHERE hash = ?
+                LIMIT 1
+            """, (file_hash,)).fetchone()
+
+        if row:
+            return {
+                'id': row['id'],
+                'hash': row['hash'],
+                'document_id': row['document_id'],
+                'filename': row['filename'],
+                'message_id': row['message_id'],
+                'cabinet_id': row['cabinet_id'],
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+                'metadata': json.loads(row['metadata']) if row['metadata'] else None
+            }
+        return None
+
+    async def hash_exists(self, file_hash: str, cabinet_id: Optional[int] = None) -> bool:
+        """
+        Проверяет, существует ли хеш в кеше
+
+        Args:
+            file_hash: SHA256 хеш файла
+            cabinet_id: ID кабинета для фильтрации (опционально)
+
+        Returns:
+            True если хеш найден, False иначе
+        """
+        return await self.get_document_by_hash(file_hash, cabinet_id) is not None
+
+    async def add_hash(
         self,
         file_hash: str,
         document_id: str,
@@ -193,8 +232,8 @@ class DocumentHashCache:
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
         """
-        Добавляет хеш в кеш
-        
+        Добавляет хеш в кеш (существующая запись обновляется, дата создания сохраняется)
+
         Args:
             file_hash: SHA256 хеш файла
             document_id: ID документа в Mayan EDMS
@@ -202,246 +241,319 @@ class DocumentHashCache:
             message_id: Message-ID письма
             cabinet_id: ID кабинета
             metadata: Дополнительные метаданные
-        
+
         Returns:
             True если успешно добавлено, False иначе
         """
-        if not file_hash or not document_id:
-            return False
-        
+        return await self.add_hashes([{
+            'file_hash': file_hash,
+            'document_id': document_id,
+            'filename': filename,
+            'message_id': message_id,
+            'cabinet_id': cabinet_id,
+            'metadata': metadata,
+        }]) == 1
+
+    async def add_hashes(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """
+        Добавляет несколько хешей в кеш одной транзакцией
+
+        Args:
+            entries: Словари с ключами аргументов add_hash (file_hash, document_id, ...)
+
+        Returns:
+            Количество добавленных/обновленных записей (0 при ошибке)
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                entry['file_hash'], str(entry['document_id']), entry.get('filename'),
+                entry.get('message_id'), entry.get('cabinet_id'), now, now,
+                json.dumps(entry['metadata'], ensure_ascii=False) if entry.get('metadata') else None,
+            )
+            for entry in entries
+            if entry.get('file_hash') and entry.get('document_id')
+        ]
+        if not rows:
+            return 0
+
         try:
-            now = datetime.now().isoformat()
-            metadata_json = json.dumps(metadata, ensure_ascii=False) if metadata else None
-            
-            with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                cursor = conn.cursor()
-                
-                # Используем INSERT OR REPLACE для обновления существующих записей
-                cursor.execute("""
-                    INSERT OR REPLACE INTO document_hashes 
-                    (hash, document_id, filename, message_id, cabinet_id, created_at, updated_at, metadata)
-                    VALUES (?, ?, ?, ?, ?, 
-                        COALESCE((SELECT created_at FROM document_hashes WHERE hash = ?), ?),
-                        ?, ?)
-                """, (
-                    file_hash, document_id, filename, message_id, cabinet_id,
-                    file_hash, now,  # created_at (сохраняем оригинальную дату если запись существует)
-                    now,  # updated_at
-                    metadata_json
-                ))
-                
-                conn.commit()
-                return True
-        except sqlite3.IntegrityError:
-            # Хеш уже существует, обновляем информацию
-            try:
-                now = datetime.now().isoformat()
-                metadata_json = json.dumps(metadata, ensure_ascii=False) if metadata else None
-                
-                with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("""
-                        UPDATE document_hashes 
-                        SET document_id = ?, filename = ?, message_id = ?, cabinet_id = ?,
-                            updated_at = ?, metadata = ?
-                        WHERE hash = ?
-                    """, (document_id, filename, message_id, cabinet_id, now, metadata_json, file_hash))
-                    conn.commit()
-                return True
-            except Exception as e:
-                logger.error(f"Ошибка обновления хеша в кеше: {e}", exc_info=True)
-                return False
+            return await self._run(self._add_hashes, rows)
         except Exception as e:
-            logger.error(f"Ошибка добавления хеша в кеш: {e}", exc_info=True)
-            return False
-    
-    def remove_hash(self, file_hash: str) -> bool:
+            logger.error(f"Ошибка добавления хешей в кеш: {e}", exc_info=True)
+            return 0
+
+    def _add_hashes(self, rows: List[Tuple]) -> int:
+        conn = self._connection()
+        with conn:
+            conn.executemany(_UPSERT_SQL, rows)
+        return len(rows)
+
+    async def remove_hash(self, file_hash: str) -> bool:
         """
         Удаляет хеш из кеша
-        
+
         Args:
             file_hash: SHA256 хеш файла
-        
+
         Returns:
             True если успешно удалено, False иначе
         """
         if not file_hash:
             return False
-        
+
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM document_hashes WHERE hash = ?", (file_hash,))
-                conn.commit()
-                return cursor.rowcount > 0
+            return await self._run(self._write, "DELETE FROM document_hashes WHERE hash = ?", (file_hash,)) > 0
         except Exception as e:
             logger.error(f"Ошибка удаления хеша из кеша: {e}", exc_info=True)
             return False
-    
-    def get_all_hashes(self, cabinet_id: Optional[int] = None) -> Set[str]:
+
+    def _write(self, sql: str, params: Tuple = ()) -> int:
+        conn = self._connection()
+        with conn:
+            return conn.execute(sql, params).rowcount
+
+    async def get_all_hashes(self, cabinet_id: Optional[int] = None) -> Set[str]:
         """
         Получает все хеши из кеша
-        
+
         Args:
             cabinet_id: ID кабинета для фильтрации (опционально)
-        
+
         Returns:
             Множество всех хешей
         """
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=30.0) as conn:
-                cursor = conn.cursor()
-                
-                if cabinet_id is not None:
-                    cursor.execute("SELECT hash FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
-                else:
-                    cursor.execute("SELECT hash FROM document_hashes")
-                
-                return {row[0] for row in cursor.fetchall()}
+            if cabinet_id is not None:
+                rows = await self._run(self._read, "SELECT hash FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
+            else:
+                rows = await self._run(self._read, "SELECT hash FROM document_hashes")
+            return {row[0] for row in rows}
         except Exception as e:
             logger.error(f"Ошибка получения всех хешей из кеша: {e}", exc_info=True)
             return set()
-    
-    def get_count(self, cabinet_id: Optional[int] = None) -> int:
+
+    def _read(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        return self._connection().execute(sql, params).fetchall()
+
+    async def get_count(self, cabinet_id: Optional[int] = None) -> int:
         """
         Получает количество хешей в кеше
-        
+
         Args:
             cabinet_id: ID кабинета для фильтрации (опционально)
-        
+
         Returns:
             Количество хешей
         """
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=10.0) as conn:
-                cursor = conn.cursor()
-                
-                if cabinet_id is not None:
-                    cursor.execute("SELECT COUNT(*) FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
-                else:
-                    cursor.execute("SELECT COUNT(*) FROM document_hashes")
-                
-                return cursor.fetchone()[0]
+            if cabinet_id is not None:
+                rows = await self._run(self._read, "SELECT COUNT(*) FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
+            else:
+                rows = await self._run(self._read, "SELECT COUNT(*) FROM document_hashes")
+            return rows[0][0]
         except Exception as e:
             logger.error(f"Ошибка получения количества хешей: {e}", exc_info=True)
             return 0
-    
+
+    async def get_watermark(self, cabinet_id: Optional[int] = None) -> Optional[int]:
+        """
+        Возвращает максимальный ID документа, до которого кабинет синхронизирован
+
+        Args:
+            cabinet_id: ID кабинета
+
+        Returns:
+            ID документа или None, если синхронизации еще не было
+        """
+        try:
+            rows = await self._run(
+                self._read, "SELECT last_document_id FROM sync_state WHERE cabinet_key = ?", (cabinet_id or 0,)
+            )
+            return rows[0][0] if rows else None
+        except Exception as e:
+            logger.error(f"Ошибка получения состояния синхронизации кеша: {e}", exc_info=True)
+            return None
+
+    async def _set_watermark(self, cabinet_id: Optional[int], document_id: int) -> None:
+        await self._run(self._write, """
+            INSERT INTO sync_state (cabinet_key, last_document_id, synced_at) VALUES (?, ?, ?)
+            ON CONFLICT(cabinet_key) DO UPDATE SET
+                last_document_id = excluded.last_document_id,
+                synced_at = excluded.synced_at
+        """, (cabinet_id or 0, document_id, datetime.now().isoformat()))
+
     async def sync_from_mayan(
         self,
         mayan_client,
         cabinet_id: Optional[int] = None,
-        max_pages: int = 100
+        max_pages: int = 100,
+        incremental: bool = True
     ) -> int:
         """
         Синхронизирует кеш с документами из Mayan EDMS
-        
+
+        Документы читаются по возрастанию ID, начиная после сохраненного ID
+        (если кабинет уже синхронизировался, обычно это один запрос), страницы
+        запрашиваются параллельно. Сохраняется максимальный ID непрерывно
+        прочитанных страниц, поэтому синхронизация, прерванная ошибкой или
+        лимитом страниц, продолжается со следующего документа при следующем запуске.
+
         Args:
             mayan_client: Клиент Mayan EDMS
             cabinet_id: ID кабинета для синхронизации
             max_pages: Максимальное количество страниц для проверки
-        
+            incremental: Использовать сохраненный ID последнего документа
+
         Returns:
             Количество добавленных/обновленных записей
         """
         async with self._lock:
-            logger.info(f"Начинаем синхронизацию кеша хешей из Mayan (кабинет: {cabinet_id})...")
-            
-            synced_count = 0
-            checked_documents = 0
-            
+            watermark = await self.get_watermark(cabinet_id) if incremental else None
+            mode = f"новее документа {watermark}" if watermark is not None else "полная"
+            logger.info(f"Начинаем синхронизацию кеша хешей из Mayan (кабинет: {cabinet_id}, {mode})...")
+
             try:
-                for page in range(1, max_pages + 1):
-                    documents = await mayan_client.get_documents(
-                        page=page,
-                        page_size=100,
-                        cabinet_id=cabinet_id
-                    )
-                    
-                    if not documents:
-                        break
-                    
-                    for doc in documents:
-                        checked_documents += 1
-                        
-                        try:
-                            if not doc.description:
-                                continue
-                            
-                            # Парсим метаданные
-                            try:
-                                metadata = json.loads(doc.description)
-                            except json.JSONDecodeError:
-                                # Если не JSON, пробуем найти хеш в тексте
-                                if 'attachment_hash' in doc.description:
-                                    # Извлекаем хеш из текста (простой поиск)
-                                    import re
-                                    hash_match = re.search(r'"attachment_hash"\s*:\s*"([a-f0-9]{64})"', doc.description)
-                                    if hash_match:
-                                        file_hash = hash_match.group(1)
-                                        if self.add_hash(
-                                            file_hash=file_hash,
-                                            document_id=str(doc.id),
-                                            filename=metadata.get('attachment_filename') if 'attachment_filename' in doc.description else None,
-                                            message_id=metadata.get('email_message_id') if 'email_message_id' in doc.description else None,
-                                            cabinet_id=cabinet_id,
-                                            metadata={'source': 'text_parsing'}
-                                        ):
-                                            synced_count += 1
-                                continue
-                            
-                            # Извлекаем хеш из метаданных
-                            file_hash = metadata.get('attachment_hash')
-                            if not file_hash:
-                                continue
-                            
-                            # Добавляем в кеш
-                            if self.add_hash(
-                                file_hash=file_hash,
-                                document_id=str(doc.id),
-                                filename=metadata.get('attachment_filename'),
-                                message_id=metadata.get('email_message_id'),
-                                cabinet_id=cabinet_id,
-                                metadata=metadata
-                            ):
-                                synced_count += 1
-                        
-                        except Exception as e:
-                            logger.debug(f"Ошибка обработки документа {doc.id}: {e}")
-                            continue
-                
-                logger.info(
-                    f"Синхронизация завершена: проверено {checked_documents} документов, "
-                    f"добавлено/обновлено {synced_count} записей в кеш"
+                synced_count, checked_documents, last_id, complete = await self._sync_after(
+                    mayan_client, cabinet_id, max_pages, watermark
                 )
-                return synced_count
-                
             except Exception as e:
                 logger.error(f"Ошибка синхронизации кеша из Mayan: {e}", exc_info=True)
-                return synced_count
-    
-    def clear_cache(self, cabinet_id: Optional[int] = None) -> bool:
+                return 0
+
+            if last_id is not None and (watermark is None or last_id > watermark):
+                await self._set_watermark(cabinet_id, last_id)
+            if not complete:
+                logger.warning(
+                    f"Синхронизация кеша кабинета {cabinet_id} не завершена (ошибка запроса или лимит {max_pages} страниц), "
+                    f"будет продолжена после документа {last_id if last_id is not None else watermark} при следующем запуске"
+                )
+
+            logger.info(
+                f"Синхронизация завершена: проверено {checked_documents} документов, "
+                f"добавлено/обновлено {synced_count} записей в кеш"
+            )
+            return synced_count
+
+    async def _store_page(self, documents: List[Any], cabinet_id: Optional[int]) -> Tuple[int, Optional[int]]:
+        """Записывает хеши страницы документов одной транзакцией, возвращает (записано, максимальный ID)"""
+        entries = [entry for entry in (self._entry_from_document(doc, cabinet_id) for doc in documents) if entry]
+        last_id = max((int(doc.document_id) for doc in documents), default=None)
+        return await self.add_hashes(entries), last_id
+
+    async def _sync_after(
+        self, mayan_client, cabinet_id: Optional[int], max_pages: int, watermark: Optional[int]
+    ) -> Tuple[int, int, Optional[int], bool]:
+        """
+        Синхронизация документов с ID больше watermark: первая страница, затем остальные параллельно
+
+        Документы запрашиваются по возрастанию ID, чтобы созданные во время
+        синхронизации документы не сдвигали еще не прочитанные страницы.
+
+        Returns:
+            Кортеж (записано, проверено документов, максимальный ID непрерывно
+            прочитанных страниц, прочитаны ли все страницы)
+        """
+        page_size = self.SYNC_PAGE_SIZE
+
+        async def get_page(page: int) -> Tuple[List[Any], int]:
+            return await mayan_client.get_documents(
+                page=page, page_size=page_size, cabinet_id=cabinet_id, ordering='id', id__gt=watermark
+            )
+
+        documents, total = await get_page(1)
+        if not documents:
+            return 0, 0, None, total == 0
+
+        total_pages = math.ceil(total / page_size)
+        pages = min(total_pages, max_pages)
+        synced_count, last_id = await self._store_page(documents, cabinet_id)
+        semaphore = asyncio.Semaphore(self.SYNC_CONCURRENCY)
+
+        async def fetch_page(page: int) -> Tuple[int, int, Optional[int]]:
+            async with semaphore:
+                page_documents, _ = await get_page(page)
+            return (len(page_documents),) + await self._store_page(page_documents, cabinet_id)
+
+        results = await asyncio.gather(*(fetch_page(page) for page in range(2, pages + 1)))
+
+        checked_documents = len(documents) + sum(checked for checked, _, _ in results)
+        synced_count += sum(synced for _, synced, _ in results)
+        # Пустая страница внутри диапазона означает ошибку запроса: ID сохраняется
+        # только до первой такой страницы, следующие страницы будут прочитаны повторно
+        for checked, _, page_last_id in results:
+            if not checked:
+                return synced_count, checked_documents, last_id, False
+            last_id = max(last_id, page_last_id)
+        return synced_count, checked_documents, last_id, pages == total_pages
+
+    @staticmethod
+    def _entry_from_document(doc, cabinet_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Запись кеша из метаданных документа Mayan (None, если хеша в описании нет)"""
+        if not doc.description:
+            return None
+
+        # Парсим метаданные
+        try:
+            metadata = json.loads(doc.description)
+        except json.JSONDecodeError:
+            # Если не JSON, пробуем найти хеш в тексте
+            hash_match = _HASH_PATTERN.search(doc.description)
+            if not hash_match:
+                return None
+            return {
+                'file_hash': hash_match.group(1),
+                'document_id': str(doc.document_id),
+                'cabinet_id': cabinet_id,
+                'metadata': {'source': 'text_parsing'},
+            }
+
+        # Извлекаем хеш из метаданных (вложения писем и файлы из директории)
+        if not isinstance(metadata, dict):
+            return None
+        file_hash = metadata.get('attachment_hash') or metadata.get('file_hash')
+        if not file_hash:
+            return None
+        return {
+            'file_hash': file_hash,
+            'document_id': str(doc.document_id),
+            'filename': metadata.get('attachment_filename') or metadata.get('file_name'),
+            'message_id': metadata.get('email_message_id'),
+            'cabinet_id': cabinet_id,
+            'metadata': metadata,
+        }
+
+    async def clear_cache(self, cabinet_id: Optional[int] = None) -> bool:
         """
         Очищает кеш
-        
+
         Args:
             cabinet_id: ID кабинета для очистки (если None, очищает весь кеш)
-        
+
         Returns:
             True если успешно очищено, False иначе
         """
         try:
-            with sqlite3.connect(str(self.cache_db_path), timeout=30.0) as conn:
-                cursor = conn.cursor()
-                
-                if cabinet_id is not None:
-                    cursor.execute("DELETE FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
-                else:
-                    cursor.execute("DELETE FROM document_hashes")
-                
-                conn.commit()
-                deleted_count = cursor.rowcount
-                logger.info(f"Кеш очищен: удалено {deleted_count} записей")
-                return True
+            if cabinet_id is not None:
+                deleted_count = await self._run(self._write, "DELETE FROM document_hashes WHERE cabinet_id = ?", (cabinet_id,))
+            else:
+                deleted_count = await self._run(self._write, "DELETE FROM document_hashes")
+            logger.info(f"Кеш очищен: удалено {deleted_count} записей")
+            return True
         except Exception as e:
             logger.error(f"Ошибка очистки кеша: {e}", exc_info=True)
             return False
+
+    def close(self) -> None:
+        """Закрывает соединение и останавливает поток кеша"""
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        try:
+            self._executor.submit(_close).result()
+        except RuntimeError:
+            # Поток уже остановлен
+            return
+        self._executor.shutdown(wait=True)
@@ -91,18 +91,15 @@ class EmailProcessor:
             return
         
         try:
-            cache_count = self.hash_cache.get_count(cabinet_id=self.incoming_cabinet_id)
+            cache_count = await self.hash_cache.get_count(cabinet_id=self.incoming_cabinet_id)
             logger.info(f"Текущий размер кеша: {cache_count} записей")
             
-            if cache_count == 0:
-                logger.info("Кеш пуст, начинаем полную синхронизацию из Mayan...")
-                await self.hash_cache.sync_from_mayan(
-                    self.mayan_client,
-                    cabinet_id=self.incoming_cabinet_id,
-                    max_pages=100
-                )
-            else:
-                logger.info(f"Кеш уже содержит {cache_count} записей, пропускаем синхронизацию")
+            # После первой полной синхронизации запрашиваются только новые документы
+            await self.hash_cache.sync_from_mayan(
+                self.mayan_client,
+                cabinet_id=self.incoming_cabinet_id,
+                max_pages=100
+            )
             
             self._cache_initialized = True
         except Exception as e:
@@ -261,14 +258,13 @@ class EmailProcessor:
         
         # ПЕРВЫЙ ПРИОРИТЕТ: Проверка в локальном кеше (быстро!)
         if file_hash:
-            if self.hash_cache.hash_exists(file_hash, cabinet_id=self.incoming_cabinet_id):
-                cached_doc = self.hash_cache.get_document_by_hash(file_hash, cabinet_id=self.incoming_cabinet_id)
-                if cached_doc and str(cached_doc['document_id']) != str(exclude_document_id):
-                    logger.error(
-                        f"ДУБЛИКАТ НАЙДЕН в кеше: документ {cached_doc['document_id']}, "
-                        f"hash={file_hash[:32]}..., filename='{filename}'"
-                    )
-                    return True
+            cached_doc = await self.hash_cache.get_document_by_hash(file_hash, cabinet_id=self.incoming_cabinet_id)
+            if cached_doc and str(cached_doc['document_id']) != str(exclude_document_id):
+                logger.error(
+                    f"ДУБЛИКАТ НАЙДЕН в кеше: документ {cached_doc['document_id']}, "
+                    f"hash={file_hash[:32]}..., filename='{filename}'"
+                )
+                return True
         
         # ВТОРОЙ ПРИОРИТЕТ: Проверка в Mayan (медленнее, но более полная)
         try:
@@ -313,7 +309,7 @@ class EmailProcessor:
                                 f"hash={file_hash[:32]}..., filename='{filename}'"
                             )
                             # Добавляем в кеш для будущих проверок
-                            self.hash_cache.add_hash(
+                            await self.hash_cache.add_hash(
                                 file_hash=file_hash,
                                 document_id=str(doc.id),
                                 filename=metadata.get('attachment_filename'),
@@ -461,7 +457,7 @@ class EmailProcessor:
                     document_id = document_result['document_id']
                     
                     # КРИТИЧЕСКИ ВАЖНО: Добавляем хеш в кеш СРАЗУ после создания
-                    self.hash_cache.add_hash(
+                    await self.hash_cache.add_hash(
                         file_hash=file_hash,
                         document_id=str(document_id),
                         filename=filename,
@@ -0,0 +1,326 @@
+# services/http_pool.py
+"""
+Общий пул HTTP соединений для клиентов внешних сервисов (Mayan EDMS, Camunda).
+
+Вместо создания отдельного httpx.AsyncClient на каждый экземпляр клиента
+все экземпляры используют один долгоживущий пул соединений на процесс,
+а учетные данные конкретного пользователя передаются с каждым запросом.
+Общий клиент не сохраняет cookie: иначе сессионная cookie одного пользователя
+(sessionid Mayan, JSESSIONID Camunda) отправлялась бы с запросами остальных.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app_logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class _RejectAllCookiesPolicy(DefaultCookiePolicy):
+    """Политика cookie, не сохраняющая и не отправляющая ни одной cookie"""
+
+    def set_ok(self, cookie, request) -> bool:
+        return False
+
+    def return_ok(self, cookie, request) -> bool:
+        return False
+
+
+def _cookieless_jar() -> CookieJar:
+    """Хранилище cookie общего клиента, которое всегда остается пустым"""
+    return CookieJar(policy=_RejectAllCookiesPolicy())
+
+
+class SharedHttpPool:
+    """
+    Пул httpx.AsyncClient, разделяемый всеми клиентами одного сервиса.
+
+    httpx.AsyncClient привязан к event loop, в котором были открыты соединения,
+    поэтому пул хранит отдельный клиент для каждого event loop (основное
+    приложение NiceGUI и фоновые скрипты синхронизации работают в разных loop).
+    """
+
+    def __init__(self, name: str, max_connections: int = 100,
+                 max_keepalive_connections: int = 20, keepalive_expiry: float = 30.0,
+                 http2: bool = False, timeout: float = 30.0, max_concurrency: int = 0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        """
+        Инициализация пула
+
+        Args:
+            name: Имя пула (используется в логах и метриках)
+            max_connections: Максимальное количество одновременных соединений
+            max_keepalive_connections: Максимальное количество keep-alive соединений
+            keepalive_expiry: Время жизни простаивающего keep-alive соединения в секундах
+            http2: Использовать ли HTTP/2 (требуется пакет h2)
+            timeout: Таймаут запросов по умолчанию в секундах
+            max_concurrency: Максимальное количество одновременных запросов (0 - без ограничения),
+                             лишние запросы ожидают в очереди вместо ошибки PoolTimeout
+            transport: Явный транспорт httpx (используется в тестах)
+        """
+        self.name = name
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2 and self._http2_available()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.transport = transport
+
+        self._clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[bool, httpx.AsyncClient]]' = weakref.WeakKeyDictionary()
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+        # Метрики использования пула
+        self._requests_total = 0
+        self._errors_total = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._waiting = 0
+        self._clients_created = 0
+        self._total_time = 0.0
+
+    def _http2_available(self) -> bool:
+        """Проверяет наличие пакета h2, необходимого для HTTP/2"""
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning(f'HTTP пул {self.name}: HTTP/2 запрошен, но пакет h2 не установлен, используется HTTP/1.1')
+            return False
+
+    def get_client(self, verify_ssl: bool = False) -> httpx.AsyncClient:
+        """
+        Возвращает общий httpx клиент для текущего event loop
+
+        Args:
+            verify_ssl: Проверять ли SSL сертификаты
+
+        Returns:
+            httpx.AsyncClient без собственных учетных данных и без cookie
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_clients = self._clients.setdefault(loop, {})
+            client = loop_clients.get(verify_ssl)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    verify=verify_ssl,
+                    timeout=self.timeout,
+                    limits=self.limits,
+                    http2=self.http2,
+                    transport=self.transport,
+                    cookies=_cookieless_jar()
+                )
+                loop_clients[verify_ssl] = client
+                self._clients_created += 1
+                logger.info(f'HTTP пул {self.name}: создан клиент (verify_ssl={verify_ssl}, http2={self.http2})')
+            return client
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Возвращает семафор ограничения параллельности для текущего event loop"""
+        if self.max_concurrency <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+            return semaphore
+
+    async def request(self, method: str, url: str, verify_ssl: bool = False, **kwargs) -> httpx.Response:
+        """Выполняет запрос через общий клиент, собирая метрики использования"""
+        semaphore = self._get_semaphore()
+        if semaphore is None:
+            return await self._send(method, url, verify_ssl, **kwargs)
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        try:
+            return await self._send(method, url, verify_ssl, **kwargs)
+        finally:
+            semaphore.release()
+
+    async def _send(self, method: str, url: str, verify_ssl: bool, **kwargs) -> httpx.Response:
+        """Отправляет запрос через клиент текущего event loop"""
+        client = self.get_client(verify_ssl)
+        with self._lock:
+            self._requests_total += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        started = time.monotonic()
+        try:
+            return await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            with self._lock:
+                self._errors_total += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._total_time += time.monotonic() - started
+
+    def session(self, auth: Optional[httpx.Auth] = None, headers: Optional[Dict[str, str]] = None,
+                verify_ssl: bool = False) -> 'PooledSession':
+        """
+        Создает легковесное представление пула с учетными данными пользователя
+
+        Args:
+            auth: Аутентификация httpx (например BasicAuth), применяется к каждому запросу
+            headers: Заголовки, добавляемые к каждому запросу (например Authorization)
+            verify_ssl: Проверять ли SSL сертификаты
+
+        Returns:
+            PooledSession, не владеющий соединениями
+        """
+        return PooledSession(self, auth=auth, headers=headers, verify_ssl=verify_ssl)
+
+    def _connection_counts(self) -> Tuple[int, int]:
+        """Возвращает количество открытых и простаивающих соединений во всех клиентах"""
+        total = 0
+        idle = 0
+        with self._lock:
+            clients = [c for loop_clients in self._clients.values() for c in loop_clients.values()]
+        for client in clients:
+            pool = getattr(getattr(client, '_transport', None), '_pool', None)
+            connections = getattr(pool, 'connections', None) or []
+            total += len(connections)
+            idle += sum(1 for conn in connections if getattr(conn, 'is_idle', lambda: False)())
+        return total, idle
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики использования пула
+
+        Returns:
+            Словарь с количеством запросов, ошибок, активных запросов и соединений
+        """
+        connections, idle_connections = self._connection_counts()
+        with self._lock:
+            requests_total = self._requests_total
+            return {
+                'name': self.name,
+                'requests_total': requests_total,
+                'errors_total': self._errors_total,
+                'in_flight': self._in_flight,
+                'peak_in_flight': self._peak_in_flight,
+                'waiting': self._waiting,
+                'max_concurrency': self.max_concurrency,
+                'clients_created': self._clients_created,
+                'connections': connections,
+                'idle_connections': idle_connections,
+                'max_connections': self.limits.max_connections,
+                'utilization': connections / self.limits.max_connections if self.limits.max_connections else 0.0,
+                'avg_request_time': self._total_time / requests_total if requests_total else 0.0,
+                'http2': self.http2,
+            }
+
+    async def aclose(self) -> None:
+        """Закрывает клиенты пула, принадлежащие текущему event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loop_clients = self._clients.pop(loop, {})
+            self._semaphores.pop(loop, None)
+        for client in loop_clients.values():
+            await client.aclose()
+        if loop_clients:
+            logger.info(f'HTTP пул {self.name}: соединения закрыты')
+
+
+class PooledSession:
+    """
+    Клиент с учетными данными одного пользователя поверх общего пула.
+
+    Повторяет используемую часть интерфейса httpx.AsyncClient (request/get/post/...,
+    headers, auth), поэтому может подставляться вместо собственного клиента.
+    Закрытие сессии не закрывает общие соединения.
+    """
+
+    def __init__(self, pool: SharedHttpPool, auth: Optional[httpx.Auth] = None,
+                 headers: Optional[Dict[str, str]] = None, verify_ssl: bool = False):
+        self.pool = pool
+        self.auth = auth
+        self.headers = httpx.Headers(headers or {})
+        self.verify_ssl = verify_ssl
+        self.is_closed = False
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Выполняет запрос через общий пул с учетными данными сессии"""
+        headers = httpx.Headers(self.headers)
+        headers.update(kwargs.pop('headers', None) or {})
+        kwargs.setdefault('auth', self.auth)
+        return await self.pool.request(method, url, verify_ssl=self.verify_ssl, headers=headers, **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('PUT', url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('PATCH', url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('DELETE', url, **kwargs)
+
+    async def aclose(self) -> None:
+        """Помечает сессию закрытой; соединения остаются в общем пуле"""
+        self.is_closed = True
+
+
+def _create_mayan_pool() -> SharedHttpPool:
+    """Создает пул соединений Mayan EDMS по настройкам из конфигурации"""
+    from config.settings import config
+
+    return SharedHttpPool(
+        name='mayan',
+        max_connections=config.mayan_pool_max_connections,
+        max_keepalive_connections=config.mayan_pool_max_keepalive,
+        keepalive_expiry=config.mayan_pool_keepalive_expiry,
+        http2=config.mayan_http2,
+        timeout=config.mayan_timeout
+    )
+
+
+def _create_camunda_pool() -> SharedHttpPool:
+    """Создает пул соединений Camunda по настройкам из конфигурации"""
+    from config.settings import config
+
+    return SharedHttpPool(
+        name='camunda',
+        max_connections=config.camunda_pool_max_connections,
+        max_keepalive_connections=config.camunda_pool_max_keepalive,
+        timeout=config.camunda_timeout,
+        max_concurrency=config.camunda_max_concurrent_requests
+    )
+
+
+# Глобальные пулы соединений внешних сервисов
+mayan_http_pool = _create_mayan_pool()
+camunda_http_pool = _create_camunda_pool()
+
+
+async def close_http_pools() -> None:
+    """Закрывает все общие пулы соединений (вызывается при остановке приложения)"""
+    for pool in (mayan_http_pool, camunda_http_pool):
+        try:
+            await pool.aclose()
+        except Exception as e:
+            logger.warning(f'Ошибка закрытия HTTP пула {pool.name}: {e}')
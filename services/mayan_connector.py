@@ -1,8 +1,13 @@
+import hashlib
 import httpx
+import logging
 from httpx import BasicAuth
 from datetime import datetime
+import asyncio
 import json
-from typing import List, Optional, Dict, Any, Union
+import re
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Dict, Any, Union
 from urllib.parse import urljoin
 import os
 import base64
@@ -10,6 +15,11 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from app_logging.logger import get_logger
+from app_logging.hot_path import log_summary, mask_secret
+from services.http_pool import mayan_http_pool
+from services.reference_data import reference_data
+from utils.ttl_cache import TTLCache
+from config.settings import config as app_config
 
 logger = get_logger(__name__)
 
@@ -39,9 +49,201 @@ class MayanDocument:
         return f'MayanDocument(id={self.document_id}, label=\'{self.label}\', filename=\'{self.file_latest_filename}\')'
 
 
+def _is_signature_filename(filename: str) -> bool:
+    """Проверяет, является ли файл подписью (.p7s) или метаданными подписи"""
+    return filename.endswith('.p7s') or 'signature_metadata_' in filename
+
+
+def _main_file_sort_key(file_info: Dict[str, Any]) -> tuple:
+    """
+    Ключ сортировки кандидатов в основной файл документа:
+    сначала по приоритету MIME типа (PDF, изображения, офисные документы), затем по ID (старые файлы первыми)
+    """
+    mimetype = str(file_info.get('mimetype') or '').lower()
+    
+    if 'pdf' in mimetype:
+        priority = 3
+    elif 'image' in mimetype:
+        priority = 2
+    elif 'office' in mimetype or 'word' in mimetype or 'excel' in mimetype:
+        priority = 2
+    else:
+        priority = 1
+    
+    file_id = file_info.get('id', 0)
+    if isinstance(file_id, str):
+        try:
+            file_id = int(file_id)
+        except ValueError:
+            file_id = 0
+    return (-priority, file_id)
+
+
+# Кеш основных файлов документов, у которых file_latest является подписью/метаданными.
+# Ключ (document_id, file_latest_id) меняется при загрузке нового файла, поэтому явная инвалидация не нужна.
+_main_file_memo = TTLCache(max_size=2048, ttl=None)
+
+# Кеш результата _get_main_document_file по (ID документа, область учетных данных клиента):
+# сведения, полученные с правами одного пользователя, не отдаются другим. Записи удаляются
+# при любом изменяющем запросе к documents/{id}/ (загрузка файлов, подписи, удаление), TTL
+# защищает от изменений, сделанных в обход приложения (например через веб-интерфейс Mayan)
+_main_document_file_cache = TTLCache(max_size=1024, ttl=app_config.mayan_document_file_cache_ttl)
+# Поколение кеша документов: увеличивается при каждой инвалидации, чтобы чтение,
+# начатое до изменения, не вернуло в кеш устаревшие данные
+_document_cache_generation = 0
+
+# Кеш URL превью (image_url первой страницы) по версии документа (document_id, file_id)
+_preview_url_cache = TTLCache(max_size=4096, ttl=None)
+
+_DOCUMENT_ENDPOINT_RE = re.compile(r'^documents/(\d+)/')
+_MISSING = object()
+
+
+def invalidate_document_cache(document_id: Union[str, int]) -> None:
+    """
+    Сбрасывает закешированные сведения о файлах документа
+    
+    Args:
+        document_id: ID документа
+    """
+    global _document_cache_generation
+    _document_cache_generation += 1
+    _main_document_file_cache.invalidate_where(lambda key: key[0] == str(document_id))
+    _preview_url_cache.invalidate_where(lambda key: key[0] == str(document_id))
+
+
+class MayanUserIndex:
+    """
+    Индекс пользователей Mayan EDMS username <-> id
+    
+    Загружается постранично одним проходом по users/ и используется операциями
+    с членством в группах вместо поиска пользователя по API для каждой операции.
+    Индекс общий для процесса, поэтому всегда загружается системным клиентом:
+    пользователь Mayan с ограниченными правами видит только часть пользователей.
+    Новые пользователи добавляются в индекс при создании, при промахе индекс
+    перезагружается (не чаще MISS_RELOAD_INTERVAL секунд).
+    """
+    
+    # Размер страницы при загрузке пользователей
+    PAGE_SIZE = 100
+    # Минимальный интервал между перезагрузками индекса при промахе в секундах
+    MISS_RELOAD_INTERVAL = 30.0
+    
+    def __init__(self, max_age: float = 600.0,
+                 client_factory: Optional[Callable[[], Awaitable['MayanClient']]] = None):
+        """
+        Инициализация индекса
+        
+        Args:
+            max_age: Время в секундах, после которого индекс перезагружается при обращении
+            client_factory: Фабрика клиента, от имени которого загружаются пользователи
+                (по умолчанию системный клиент MayanClient.create_default)
+        """
+        self.max_age = max_age
+        self._client_factory = client_factory
+        self._ids: Dict[str, int] = {}
+        self._usernames: Dict[int, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._loading: Dict[int, asyncio.Task] = {}
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    @property
+    def is_stale(self) -> bool:
+        """Индекс не загружен или устарел"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+    
+    async def load(self) -> int:
+        """
+        Загружает всех пользователей Mayan EDMS в индекс системным клиентом
+        
+        Одновременные вызовы в одном цикле событий выполняют одну загрузку.
+        
+        Returns:
+            Количество пользователей в индексе
+        """
+        loop_id = id(asyncio.get_running_loop())
+        task = self._loading.get(loop_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load())
+            self._loading[loop_id] = task
+            task.add_done_callback(lambda _: self._loading.pop(loop_id, None))
+        return await asyncio.shield(task)
+    
+    async def _load(self) -> int:
+        """Постранично загружает пользователей из users/"""
+        if self._client_factory is not None:
+            client = await self._client_factory()
+        else:
+            client = await MayanClient.create_default()
+        ids: Dict[str, int] = {}
+        async for user in client.iter_users(page_size=self.PAGE_SIZE):
+            if user.get('username') and user.get('id') is not None:
+                ids[user['username']] = user['id']
+        
+        self._ids = ids
+        self._usernames = {user_id: username for username, user_id in ids.items()}
+        self._loaded_at = time.monotonic()
+        logger.info(f'Индекс пользователей Mayan загружен: {len(ids)} пользователей')
+        return len(ids)
+    
+    async def get_user_id(self, username: str) -> Optional[int]:
+        """
+        Возвращает ID пользователя по имени
+        
+        Args:
+            username: Имя пользователя
+            
+        Returns:
+            ID пользователя или None если пользователь не найден
+        """
+        if self.is_stale:
+            await self.load()
+        user_id = self._ids.get(username)
+        if user_id is None and time.monotonic() - self._loaded_at > self.MISS_RELOAD_INTERVAL:
+            # Пользователь мог быть создан в обход приложения
+            await self.load()
+            user_id = self._ids.get(username)
+        return user_id
+    
+    async def get_username(self, user_id: int) -> Optional[str]:
+        """Возвращает имя пользователя по ID"""
+        if self.is_stale:
+            await self.load()
+        return self._usernames.get(user_id)
+    
+    def add(self, username: str, user_id: int) -> None:
+        """Добавляет пользователя в индекс"""
+        self._ids[username] = user_id
+        self._usernames[user_id] = username
+    
+    def remove(self, username: str) -> None:
+        """Удаляет пользователя из индекса"""
+        user_id = self._ids.pop(username, None)
+        if user_id is not None:
+            self._usernames.pop(user_id, None)
+    
+    def clear(self) -> None:
+        """Очищает индекс (следующее обращение перезагрузит его)"""
+        self._ids = {}
+        self._usernames = {}
+        self._loaded_at = None
+
+
+# Общий индекс пользователей Mayan EDMS
+mayan_user_index = MayanUserIndex(max_age=app_config.mayan_user_index_ttl)
+
+
 class MayanClient:
     """Асинхронный клиент для работы с Mayan EDMS REST API"""
     
+    # Максимальное количество параллельных запросов списка файлов при разборе страницы документов
+    MAIN_FILE_LOOKUP_CONCURRENCY = 8
+    
+    # Размер страницы при постраничном обходе списков (iter_pages)
+    LIST_PAGE_SIZE = 100
+    
     def __init__(self, base_url: str, username: str = '', password: str = '', 
                  api_token: str = '', verify_ssl: bool = False, 
                  token_refresh_callback: Optional[callable] = None):
@@ -73,7 +275,7 @@ class MayanClient:
         if api_token:
             headers['Authorization'] = f'Token {api_token}'
             logger.info(f'MayanClient: Используется API токен для аутентификации')
-            logger.info(f'MayanClient: Токен: {api_token[:10]}...{api_token[-5:] if len(api_token) > 15 else "***"}')
+            logger.info('MayanClient: Токен: %s', mask_secret(api_token))
         elif username and password:
             auth = BasicAuth(username, password)
             logger.info(f'MayanClient: Используется username/password для аутентификации')
@@ -82,14 +284,20 @@ class MayanClient:
         else:
             raise ValueError('Необходимо указать либо API токен, либо username/password')
         
-        # Создаем httpx клиент
-        self.client = httpx.AsyncClient(
+        # Область кеша сведений о документах - хеш учетных данных клиента
+        self._set_cache_scope(headers.get('Authorization') or f'{username}:{password}')
+        
+        # Используем общий пул соединений процесса, учетные данные применяются к каждому запросу
+        self.client = mayan_http_pool.session(
             auth=auth,
             headers=headers,
-            verify=verify_ssl,
-            timeout=30.0
+            verify_ssl=verify_ssl
         )
     
+    def _set_cache_scope(self, credentials: str) -> None:
+        """Задает область кеша сведений о документах по учетным данным клиента"""
+        self._cache_scope = hashlib.sha256(credentials.encode('utf-8')).hexdigest()[:16]
+    
     async def __aenter__(self):
         """Асинхронный контекстный менеджер: вход"""
         return self
@@ -99,32 +307,39 @@ class MayanClient:
         await self.close()
     
     async def close(self):
-        """Закрывает HTTP клиент"""
+        """Освобождает клиент (соединения остаются в общем пуле)"""
         await self.client.aclose()
     
     async def _make_request(self, method: str, endpoint: str, **kwargs) -> httpx.Response:
         """Выполняет HTTP запрос к Mayan EDMS API"""
         url = urljoin(self.api_url, endpoint.lstrip('/'))
         
-        logger.debug(f'MayanClient: Выполняем {method} запрос к {url}')
+        logger.debug('MayanClient: Выполняем %s запрос к %s', method, url)
         
-        # Логируем способ аутентификации для каждого запроса
+        # Логируем способ аутентификации для каждого запроса (маскирование токена - только если DEBUG включен)
         if self.client.auth:
-            logger.debug(f'MayanClient: Аутентификация через Basic Auth (username/password)')
+            logger.debug('MayanClient: Аутентификация через Basic Auth (username/password)')
         elif 'Authorization' in self.client.headers:
             auth_header = self.client.headers['Authorization']
             if auth_header.startswith('Token '):
-                token = auth_header[6:]  # Убираем "Token "
-                logger.debug(f'MayanClient: Аутентификация через API токен: {token[:10]}...{token[-5:] if len(token) > 15 else "***"}')
+                logger.debug('MayanClient: Аутентификация через API токен: %s', mask_secret(auth_header[6:]))
             else:
-                logger.debug(f'MayanClient: Аутентификация через заголовок Authorization')
+                logger.debug('MayanClient: Аутентификация через заголовок Authorization')
         else:
-            logger.warning(f'MayanClient: Запрос без аутентификации!')
+            logger.warning('MayanClient: Запрос без аутентификации!')
         
         # Устанавливаем Content-Type только если передаем JSON и НЕ передаем файлы
         if 'json' in kwargs and 'files' not in kwargs:
             kwargs.setdefault('headers', {})['Content-Type'] = 'application/json'
         
+        # Любой изменяющий запрос к документу сбрасывает закешированный основной файл,
+        # а запрос к ролям и группам - соответствующие справочные данные. Сброс выполняется
+        # до запроса и повторно после его завершения (успешного или нет), чтобы чтения,
+        # выполненные во время записи, не оставили в кеше старые данные.
+        is_write = method.upper() != 'GET'
+        if is_write:
+            self._invalidate_caches_for(endpoint)
+        
         # Добавляем логирование для загрузки файлов
         if 'files' in kwargs:
             logger.info(f'MayanClient: Загружаем файлы: {list(kwargs["files"].keys())}')
@@ -132,7 +347,7 @@ class MayanClient:
         
         try:
             response = await self.client.request(method, url, **kwargs)
-            logger.debug(f'MayanClient: Ответ получен: {response.status_code}')
+            logger.debug('MayanClient: Ответ получен: %s', response.status_code)
             
             # Проверяем на ошибки аутентификации
             if response.status_code == 401:
@@ -147,6 +362,7 @@ class MayanClient:
                             # Обновляем токен в клиенте
                             self.api_token = new_token
                             self.client.headers['Authorization'] = f'Token {new_token}'
+                            self._set_cache_scope(f'Token {new_token}')
                             logger.info('MayanClient: Токен обновлен, повторяем запрос...')
                             
                             # Повторяем запрос с новым токеном
@@ -172,6 +388,17 @@ class MayanClient:
         except MayanTokenExpiredError:
             # Пробрасываем исключение дальше
             raise
+        finally:
+            if is_write:
+                self._invalidate_caches_for(endpoint)
+    
+    @staticmethod
+    def _invalidate_caches_for(endpoint: str) -> None:
+        """Сбрасывает кеши, которые может изменить изменяющий запрос к endpoint'у"""
+        document_match = _DOCUMENT_ENDPOINT_RE.match(endpoint.lstrip('/'))
+        if document_match:
+            invalidate_document_cache(document_match.group(1))
+        reference_data.invalidate_for_endpoint(endpoint)
     
     def _get_search_models_root(self) -> str:
         return 'search_models/'
@@ -393,13 +620,12 @@ class MayanClient:
                 'Accept': 'application/json'
             }
             
-            # Выполняем запрос БЕЗ аутентификации через отдельный клиент
-            async with httpx.AsyncClient(verify=False, timeout=30.0) as temp_client:
-                response = await temp_client.post(
-                    url, 
-                    json=payload, 
-                    headers=headers
-                )
+            # Выполняем запрос БЕЗ аутентификации через общий пул
+            response = await mayan_http_pool.session(verify_ssl=self.verify_ssl).post(
+                url, 
+                json=payload, 
+                headers=headers
+            )
             
             logger.info(f'MayanClient: Статус ответа: {response.status_code}')
             logger.info(f'MayanClient: Заголовки ответа: {dict(response.headers)}')
@@ -420,7 +646,7 @@ class MayanClient:
                         
                         if api_token:
                             logger.info(f'MayanClient: API токен успешно создан для пользователя {username}')
-                            logger.info(f'MayanClient: Токен: {api_token[:10]}...{api_token[-5:] if len(api_token) > 15 else "***"}')
+                            logger.info('MayanClient: Токен: %s', mask_secret(api_token))
                             return api_token
                         else:
                             logger.error(f'MayanClient: Поле "token" не найдено в ответе')
@@ -485,12 +711,118 @@ class MayanClient:
             logger.error(f'Исключение при отзыве API токена: {e}')
             return False
     
+    async def _resolve_main_files(self, documents_data: List[Dict[str, Any]]) -> Dict[tuple, Optional[Dict[str, Any]]]:
+        """
+        Находит основные файлы для документов, у которых file_latest является подписью или метаданными
+        
+        Списки файлов запрашиваются параллельно (не более MAIN_FILE_LOOKUP_CONCURRENCY одновременно),
+        результат запоминается по ключу (document_id, file_latest_id).
+        
+        Args:
+            documents_data: Данные документов из ответа API
+            
+        Returns:
+            Словарь (document_id, file_latest_id) -> основной файл (None, если в документе только подписи).
+            Документы, для которых не удалось получить список файлов, в словарь не попадают
+        """
+        resolved = {}
+        pending = {}
+        for doc_data in documents_data:
+            file_latest_data = doc_data.get('file_latest') or {}
+            if doc_data.get('id') is None or not _is_signature_filename(file_latest_data.get('filename', '')):
+                continue
+            key = (str(doc_data['id']), str(file_latest_data.get('id', '')))
+            cached = _main_file_memo.get(key, _MISSING)
+            if cached is not _MISSING:
+                resolved[key] = cached
+            else:
+                pending[key] = doc_data['id']
+        
+        if not pending:
+            return resolved
+        
+        logger.debug(f'Ищем основные файлы для {len(pending)} документов (из кеша: {len(resolved)})')
+        semaphore = asyncio.Semaphore(self.MAIN_FILE_LOOKUP_CONCURRENCY)
+        
+        async def fetch_main_file(key: tuple, document_id: Any):
+            async with semaphore:
+                try:
+                    files_response = await self._make_request('GET', f'documents/{document_id}/files/', params={'page': 1, 'page_size': 100})
+                    files_response.raise_for_status()
+                    all_files = files_response.json().get('results', [])
+                except Exception as e:
+                    logger.warning(f'Ошибка при получении основных файлов документа {document_id}: {e}')
+                    return
+            
+            main_files = [f for f in all_files if not _is_signature_filename(f.get('filename', ''))]
+            if main_files:
+                main_file = min(main_files, key=_main_file_sort_key)
+                logger.debug(f'Документ {document_id}: выбран основной файл {main_file.get("filename")} (MIME: {main_file.get("mimetype")})')
+            else:
+                main_file = None
+                logger.warning(f'Не найден основной файл в документе {document_id}, только подписи/метаданные')
+            
+            resolved[key] = main_file
+            _main_file_memo.set(key, main_file)
+        
+        await asyncio.gather(*(fetch_main_file(key, document_id) for key, document_id in pending.items()))
+        return resolved
+    
+    async def _build_documents(self, documents_data: List[Dict[str, Any]]) -> List[MayanDocument]:
+        """
+        Создает объекты MayanDocument из данных ответа API
+        
+        Если file_latest документа является подписью или метаданными, вместо него
+        используется основной файл документа (см. _resolve_main_files).
+        
+        Args:
+            documents_data: Данные документов из ответа API
+            
+        Returns:
+            Список документов (документы с некорректными данными пропускаются)
+        """
+        main_files = await self._resolve_main_files(documents_data)
+        documents = []
+        summary = log_summary(logger, 'Документы созданы из ответа API', logging.DEBUG)
+        
+        for i, doc_data in enumerate(documents_data):
+            try:
+                file_info = doc_data.get('file_latest') or {}
+                main_file = main_files.get((str(doc_data.get('id')), str(file_info.get('id', ''))))
+                if main_file:
+                    file_info = main_file
+                    file_latest_id = str(main_file.get('id', ''))
+                else:
+                    file_latest_id = file_info.get('id', '')
+                
+                document = MayanDocument(
+                    document_id=doc_data['id'],
+                    label=doc_data['label'],
+                    description=doc_data.get('description', ''),
+                    file_latest_id=file_latest_id,
+                    file_latest_filename=file_info.get('filename', ''),
+                    file_latest_mimetype=file_info.get('mimetype', ''),
+                    file_latest_size=file_info.get('size', 0),
+                    datetime_created=doc_data.get('datetime_created', ''),
+                    datetime_modified=doc_data.get('datetime_modified', '')
+                )
+                documents.append(document)
+                summary.add(document.document_id)
+            except Exception as e:
+                logger.warning(f'Ошибка при парсинге документа {i}: {e}')
+                continue
+        
+        summary.emit()
+        return documents
+    
     async def get_documents(self, page: int = 1, page_size: int = 20, 
                     search: str = '', label: str = '',
                     datetime_created__gte: Optional[str] = None,
                     datetime_created__lte: Optional[str] = None,
                     cabinet_id: Optional[int] = None,
-                    user__id: Optional[int] = None) -> tuple[List[MayanDocument], int]:
+                    user__id: Optional[int] = None,
+                    ordering: str = '-datetime_created',
+                    id__gt: Optional[int] = None) -> tuple[List[MayanDocument], int]:
         """
         Получает список документов из Mayan EDMS
         
@@ -503,6 +835,8 @@ class MayanClient:
             datetime_created__lte: Дата создания <= (формат: YYYY-MM-DD или YYYY-MM-DDTHH:MM:SS)
             cabinet_id: ID кабинета для фильтрации
             user__id: ID пользователя для фильтрации
+            ordering: Поле сортировки (с '-' - по убыванию)
+            id__gt: Только документы с ID больше указанного
             
         Returns:
             Кортеж (список документов, общее количество)
@@ -511,7 +845,7 @@ class MayanClient:
         params = {
             'page': page,
             'page_size': page_size,
-            'ordering': '-datetime_created'
+            'ordering': ordering
         }
         
         if search:
@@ -533,6 +867,9 @@ class MayanClient:
         if user__id:
             params['user__id'] = user__id
         
+        if id__gt is not None:
+            params['id__gt'] = id__gt
+        
         logger.info(f'Получаем документы: страница {page}, размер {page_size}, поиск: \'{search}\', фильтры: {params}')
         
         try:
@@ -540,121 +877,11 @@ class MayanClient:
             response.raise_for_status()
             
             data = response.json()
-            documents = []
             total_count = data.get('count', 0)  # Получаем общее количество
             
             logger.info(f'Получено {len(data.get("results", []))} документов из {total_count}')
             
-            for i, doc_data in enumerate(data.get('results', [])):
-                try:
-                    # Получаем file_latest из API
-                    file_latest_data = doc_data.get('file_latest', {})
-                    file_latest_filename = file_latest_data.get('filename', '')
-                    
-                    # Проверяем, не является ли это файлом подписи или метаданных
-                    is_signature_file = (file_latest_filename.endswith('.p7s') or 
-                                       'signature_metadata_' in file_latest_filename)
-                    
-                    # Если это файл подписи/метаданных, получаем основной файл из всех файлов документа
-                    if is_signature_file:
-                        logger.debug(f'Документ {doc_data["id"]}: file_latest является файлом подписи/метаданных, ищем основной файл')
-                        
-                        try:
-                            # Получаем все файлы документа напрямую
-                            files_response = await self._make_request('GET', f'documents/{doc_data["id"]}/files/', params={'page': 1, 'page_size': 100})
-                            files_response.raise_for_status()
-                            files_data = files_response.json()
-                            all_files = files_data.get('results', [])
-                            
-                            logger.debug(f'Получено {len(all_files)} файлов для документа {doc_data["id"]}')
-                            
-                            # Фильтруем файлы: исключаем подписи и метаданные
-                            main_files = []
-                            for file_info in all_files:
-                                filename = file_info.get('filename', '')
-                                # Пропускаем файлы подписей и метаданных
-                                if filename.endswith('.p7s') or 'signature_metadata_' in filename:
-                                    logger.debug(f'Пропускаем файл подписи/метаданных: {filename}')
-                                    continue
-                                main_files.append(file_info)
-                            
-                            # Если нашли основные файлы, берем самый старый (первый созданный)
-                            # или предпочитаем файлы с определенными типами MIME
-                            if main_files:
-                                # Сортируем по datetime_created (если есть) или по ID
-                                # Старшие ID обычно означают более ранние файлы
-                                def get_sort_key(file_info):
-                                    # ИСПРАВЛЕНИЕ: Обрабатываем случай, когда mimetype может быть None
-                                    mimetype = file_info.get('mimetype') or ''
-                                    if mimetype:
-                                        mimetype = str(mimetype).lower()
-                                    else:
-                                        mimetype = ''
-                                    
-                                    priority = 0
-                                    if 'pdf' in mimetype:
-                                        priority = 3
-                                    elif 'image' in mimetype:
-                                        priority = 2
-                                    elif 'office' in mimetype or 'word' in mimetype or 'excel' in mimetype:
-                                        priority = 2
-                                    else:
-                                        priority = 1
-                                    
-                                    # Сортируем по приоритету (убывание), затем по ID (возрастание - старые файлы первыми)
-                                    file_id = file_info.get('id', 0)
-                                    if isinstance(file_id, str):
-                                        try:
-                                            file_id = int(file_id)
-                                        except:
-                                            file_id = 0
-                                    return (-priority, file_id)
-                                
-                                main_files_sorted = sorted(main_files, key=get_sort_key)
-                                main_file = main_files_sorted[0]
-                                
-                                logger.debug(f'Выбран основной файл: {main_file.get("filename")} (MIME: {main_file.get("mimetype")})')
-                                file_latest_id = str(main_file.get('id', ''))
-                                file_latest_filename = main_file.get('filename', '')
-                                file_latest_mimetype = main_file.get('mimetype', '')
-                                file_latest_size = main_file.get('size', 0)
-                            else:
-                                # Если не нашли основные файлы, оставляем file_latest как есть
-                                logger.warning(f'Не найден основной файл в документе {doc_data["id"]}, только подписи/метаданные')
-                                file_latest_id = file_latest_data.get('id', '')
-                                file_latest_mimetype = file_latest_data.get('mimetype', '')
-                                file_latest_size = file_latest_data.get('size', 0)
-                        except Exception as e:
-                            logger.warning(f'Ошибка при получении основных файлов документа {doc_data["id"]}: {e}')
-                            import traceback
-                            logger.debug(f'Traceback: {traceback.format_exc()}')
-                            # В случае ошибки используем file_latest как есть
-                            file_latest_id = file_latest_data.get('id', '')
-                            file_latest_filename = file_latest_data.get('filename', '')
-                            file_latest_mimetype = file_latest_data.get('mimetype', '')
-                            file_latest_size = file_latest_data.get('size', 0)
-                    else:
-                        # Если это не файл подписи/метаданных, используем file_latest как есть
-                        file_latest_id = file_latest_data.get('id', '')
-                        file_latest_mimetype = file_latest_data.get('mimetype', '')
-                        file_latest_size = file_latest_data.get('size', 0)
-                    
-                    document = MayanDocument(
-                        document_id=doc_data['id'],
-                        label=doc_data['label'],
-                        description=doc_data.get('description', ''),
-                        file_latest_id=file_latest_id,
-                        file_latest_filename=file_latest_filename,
-                        file_latest_mimetype=file_latest_mimetype,
-                        file_latest_size=file_latest_size,
-                        datetime_created=doc_data.get('datetime_created', ''),
-                        datetime_modified=doc_data.get('datetime_modified', '')
-                    )
-                    documents.append(document)
-                    logger.debug(f'Документ {i+1} создан успешно: {document}')
-                except Exception as e:
-                    logger.warning(f'Ошибка при парсинге документа {i}: {e}')
-                    continue
+            documents = await self._build_documents(data.get('results', []))
             
             return documents, total_count  # Возвращаем кортеж
             
@@ -810,16 +1037,30 @@ class MayanClient:
         не поддерживается в Mayan EDMS API v4, поэтому сразу используем 
         проверенный метод через /documents/{id}/files/
         
+        Результат кешируется по ID документа и учетным данным клиента
+        (см. _main_document_file_cache)
+        
         Args:
             document_id: ID документа
             
         Returns:
             Информация о файле или None
         """
+        cache_key = (str(document_id), self._cache_scope)
+        cached = _main_document_file_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            logger.debug(f'Основной файл документа {document_id} получен из кеша')
+            return cached
+        
+        generation = _document_cache_generation
         try:
             # Сразу используем fallback метод, так как endpoint версий недоступен
             logger.debug(f'Получаем основной файл документа {document_id} через fallback метод')
-            return await self._get_main_document_file_fallback(document_id)
+            file_info = await self._get_main_document_file_fallback(document_id)
+            # Если во время запроса документ изменился, ответ мог устареть - не кешируем его
+            if file_info and generation == _document_cache_generation:
+                _main_document_file_cache.set(cache_key, file_info)
+            return file_info
             
         except Exception as e:
             logger.error(f'Ошибка при получении файла документа {document_id}: {e}', exc_info=True)
@@ -1017,8 +1258,11 @@ class MayanClient:
 
     async def get_document_preview_url(self, document_id: str) -> Optional[str]:
         """
-        Получает URL для предварительного просмотра документа
-        Использует метод get_document_pages для получения image_url первой страницы
+        Получает URL для предварительного просмотра документа (image_url первой страницы)
+        
+        Сначала используется pages_first из записи основного файла, затем запрашивается
+        только первая страница файла. Результат кешируется по версии документа
+        (document_id, file_id), поэтому загрузка нового файла дает новый URL.
         
         Args:
             document_id: ID документа
@@ -1027,43 +1271,35 @@ class MayanClient:
             URL для предварительного просмотра (image_url первой страницы) или None
         """
         try:
-            # Получаем список страниц документа
-            pages = await self.get_document_pages(document_id)
-            
-            logger.info(f'Получено страниц для документа {document_id}: {len(pages) if pages else 0}')
-            
-            if pages and len(pages) > 0:
-                # Берем первую страницу (page_number = 1)
-                first_page = pages[0]
-                image_url = first_page.get('image_url')
-                
-                logger.info(f'Первая страница для документа {document_id}: page_number={first_page.get("page_number")}, image_url={image_url}')
-                
-                if image_url:
-                    logger.info(f'URL превью из API страниц для документа {document_id}: {image_url}')
-                    return image_url
-                else:
-                    logger.debug(f'Первая страница не содержит image_url для документа {document_id}')
-            
-            # Fallback: пытаемся использовать старый метод через _get_main_document_file
             file_info = await self._get_main_document_file(document_id)
             if not file_info:
                 return None
-                
+            
+            file_id = file_info.get('id')
+            cache_key = (str(document_id), str(file_id))
+            cached = _preview_url_cache.get(cache_key)
+            if cached:
+                return cached
+            
             # Используем готовый image_url из ответа API для превью
-            if 'pages_first' in file_info and 'image_url' in file_info['pages_first']:
-                preview_url = file_info['pages_first']['image_url']
+            preview_url = (file_info.get('pages_first') or {}).get('image_url')
+            if preview_url:
                 logger.debug(f'URL превью из API (pages_first): {preview_url}')
-                return preview_url
-                
-            # Если нет image_url, строим URL вручную (старый способ)
-            file_id = file_info.get('id')
-            if file_id:
-                preview_url = f'{self.api_url}documents/{document_id}/files/{file_id}/preview/'
-                logger.debug(f'Сформирован URL превью (fallback): {preview_url}')
-                return preview_url
-                
-            return None
+            elif file_id:
+                # Запрашиваем только первую страницу файла
+                pages = await self.get_document_pages(document_id, file_id=file_id, page_size=1)
+                if pages:
+                    preview_url = pages[0].get('image_url')
+                    logger.debug(f'URL превью из API страниц для документа {document_id}: {preview_url}')
+                
+                # Если нет image_url, строим URL вручную (старый способ)
+                if not preview_url:
+                    preview_url = f'{self.api_url}documents/{document_id}/files/{file_id}/preview/'
+                    logger.debug(f'Сформирован URL превью (fallback): {preview_url}')
+            
+            if preview_url:
+                _preview_url_cache.set(cache_key, preview_url)
+            return preview_url
             
         except Exception as e:
             logger.warning(f'Ошибка при получении URL превью для документа {document_id}: {e}')
@@ -1278,11 +1514,7 @@ class MayanClient:
         logger.info('Получаем список кабинетов')
         
         try:
-            response = await self._make_request('GET', endpoint)
-            response.raise_for_status()
-            
-            data = response.json()
-            cabinets = data.get('results', [])
+            cabinets = await self.collect_all(self.iter_cabinets())
             
             logger.info(f'Получено {len(cabinets)} кабинетов')
             
@@ -1886,7 +2118,7 @@ class MayanClient:
         Endpoint: GET /api/v4/roles/
         """
         endpoint = 'roles/'
-        params = {}
+        params = {'page': page, 'page_size': page_size}
         
         try:
             logger.info(f'Запрашиваем роли через endpoint: {endpoint}')
@@ -1923,10 +2155,7 @@ class MayanClient:
         endpoint = f'roles/{role_id}/users/'
         
         try:
-            response = await self._make_request('GET', endpoint)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('results', [])
+            return await self.collect_all(endpoint)
         except httpx.HTTPError as e:
             logger.error(f'Ошибка при получении пользователей роли {role_id}: {e}')
             return []
@@ -1939,10 +2168,7 @@ class MayanClient:
         endpoint = f'roles/{role_id}/groups/'
         
         try:
-            response = await self._make_request('GET', endpoint)
-            response.raise_for_status()
-            data = response.json()
-            return data.get('results', [])
+            return await self.collect_all(endpoint)
         except httpx.HTTPError as e:
             logger.error(f'Ошибка при получении групп роли {role_id}: {e}')
             return []
@@ -1969,6 +2195,101 @@ class MayanClient:
             logger.error(f'Ошибка при создании ACL с пользователем: {e}')
             return None
 
+    async def iter_pages(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                         page_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Постранично обходит список Mayan EDMS, пока ответ содержит ссылку next
+        
+        Следующая страница запрашивается сразу после получения текущей и загружается,
+        пока вызывающий код обрабатывает текущую. В памяти находится не более двух страниц.
+        
+        Args:
+            endpoint: Endpoint списка (например 'users/')
+            params: Дополнительные параметры запроса
+            page_size: Размер страницы
+            
+        Yields:
+            Списки элементов страниц (results)
+        """
+        page_size = page_size or self.LIST_PAGE_SIZE
+        base_params = dict(params or {})
+        
+        async def fetch(page: int) -> Dict[str, Any]:
+            response = await self._make_request(
+                'GET', endpoint, params={**base_params, 'page': page, 'page_size': page_size}
+            )
+            response.raise_for_status()
+            return response.json()
+        
+        page = 1
+        pending = asyncio.ensure_future(fetch(page))
+        try:
+            while pending is not None:
+                data = await pending
+                pending = None
+                if data.get('next'):
+                    page += 1
+                    pending = asyncio.ensure_future(fetch(page))
+                yield data.get('results', [])
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def iter_list(self, endpoint: str, params: Optional[Dict[str, Any]] = None,
+                        page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит все элементы списка Mayan EDMS (см. iter_pages)"""
+        async for results in self.iter_pages(endpoint, params=params, page_size=page_size):
+            for item in results:
+                yield item
+
+    def iter_users(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит всех пользователей"""
+        return self.iter_list('users/', page_size=page_size)
+
+    def iter_groups(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит все группы"""
+        return self.iter_list('groups/', page_size=page_size)
+
+    def iter_roles(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит все роли"""
+        return self.iter_list('roles/', page_size=page_size)
+
+    def iter_permissions(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит все разрешения"""
+        return self.iter_list('permissions/', page_size=page_size)
+
+    def iter_cabinets(self, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Обходит все кабинеты"""
+        return self.iter_list('cabinets/', page_size=page_size)
+
+    async def collect_all(self, source: Union[str, AsyncIterator[Dict[str, Any]]],
+                          max_items: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Собирает все элементы списка Mayan EDMS в список
+        
+        Args:
+            source: Endpoint списка или итератор (например client.iter_roles())
+            max_items: Максимальное количество элементов (по умолчанию mayan_collect_all_max_items).
+                При превышении сбор прекращается с предупреждением в логе.
+            
+        Returns:
+            Список элементов
+        """
+        if isinstance(source, str):
+            source = self.iter_list(source)
+        max_items = max_items or app_config.mayan_collect_all_max_items
+        
+        items: List[Dict[str, Any]] = []
+        try:
+            async for item in source:
+                if len(items) >= max_items:
+                    logger.warning(f'collect_all: достигнут лимит {max_items} элементов, остальные элементы не загружены')
+                    break
+                items.append(item)
+        finally:
+            await source.aclose()
+        return items
+
     async def get_users(self, page: int = 1, page_size: int = 20) -> List[Dict[str, Any]]:
         """
         Получает список пользователей
@@ -1978,21 +2299,16 @@ class MayanClient:
         params = {'page': page, 'page_size': page_size}
         
         try:
-            logger.info(f'Запрашиваем пользователей через endpoint: {endpoint}')
-            logger.info(f'Параметры: {params}')
+            logger.debug('Запрашиваем пользователей через endpoint: %s, параметры: %s', endpoint, params)
             
             response = await self._make_request('GET', endpoint, params=params)
-            logger.info(f'Статус ответа: {response.status_code}')
-            
             response.raise_for_status()
             data = response.json()
             
-            logger.info(f'Получен ответ с count: {data.get("count", 0)}')
-            logger.info(f'Количество результатов: {len(data.get("results", []))}')
-            
-            # Отладочная информация о пользователях
-            for i, user in enumerate(data.get('results', [])):
-                logger.info(f'Пользователь {i+1}: {user.get("username")} (ID: {user.get("id")})')
+            # Одна строка на страницу вместо строки на каждого пользователя
+            with log_summary(logger, f'Получены пользователи (всего {data.get("count", 0)})') as summary:
+                for user in data.get('results', []):
+                    summary.add(user.get('username'))
             
             return data.get('results', [])
         except httpx.HTTPError as e:
@@ -2100,26 +2416,11 @@ class MayanClient:
         endpoint = f'groups/{group_id}/users/'
         
         logger.info(f'Получаем пользователей группы {group_id}')
-        logger.info(f'URL: {urljoin(self.api_url, endpoint)}')
         
         try:
-            response = await self._make_request('GET', endpoint)
-            
-            logger.info(f'Статус ответа: {response.status_code}')
-            logger.info(f'Ответ: {response.text[:500]}...')
-            
-            if response.status_code == 200:
-                data = response.json()
-                users = data.get('results', [])
-                
-                logger.info(f'В группе {group_id} найдено {len(users)} пользователей')
-                
-                return users
-            else:
-                logger.error(f'Ошибка получения пользователей группы {group_id}: {response.status_code}')
-                logger.error(f'Ответ: {response.text}')
-                return []
-                
+            users = await self.collect_all(endpoint)
+            logger.info(f'В группе {group_id} найдено {len(users)} пользователей')
+            return users
         except httpx.HTTPError as e:
             logger.error(f'Ошибка при получении пользователей группы {group_id}: {e}')
             return []
@@ -2221,7 +2522,7 @@ class MayanClient:
 
     async def _get_user_id_by_username(self, username: str) -> Optional[int]:
         """
-        Получает ID пользователя по имени пользователя
+        Получает ID пользователя по имени пользователя через индекс пользователей
         
         Args:
             username: Имя пользователя
@@ -2230,15 +2531,22 @@ class MayanClient:
             ID пользователя или None если не найден
         """
         try:
-            users = await self.get_users()
-            for user in users:
-                if user.get('username') == username:
-                    return user.get('id')
-            return None
+            return await mayan_user_index.get_user_id(username)
         except Exception as e:
             logger.error(f'Ошибка при поиске пользователя {username}: {e}')
             return None
 
+    async def load_user_index(self) -> int:
+        """
+        Загружает (перезагружает) индекс пользователей Mayan EDMS.
+        Вызывается в начале синхронизации, чтобы операции с группами не искали пользователей по одному.
+        Индекс загружается системным клиентом, а не этим клиентом.
+        
+        Returns:
+            Количество пользователей в индексе
+        """
+        return await mayan_user_index.load()
+
     async def create_user(self, user_data: Dict[str, Any]) -> bool:
         """
         Создает нового пользователя
@@ -2258,6 +2566,12 @@ class MayanClient:
             
             if response.status_code in [200, 201]:
                 logger.info(f'Пользователь {user_data.get("username")} успешно создан')
+                try:
+                    created = response.json()
+                    if created.get('id') is not None:
+                        mayan_user_index.add(created.get('username') or user_data.get('username'), created['id'])
+                except ValueError:
+                    pass
                 return True
             else:
                 logger.error(f'Ошибка создания пользователя {user_data.get("username")}: {response.status_code}')
@@ -2537,7 +2851,7 @@ class MayanClient:
         
         # Получаем все разрешения для получения их namespace, pk, label
         logger.info(f'Получаем список всех разрешений для формирования payload')
-        all_permissions = await self.get_permissions()
+        all_permissions = await self.collect_all(self.iter_permissions())
         
         # Формируем список объектов разрешений для payload
         permission_objects = []
@@ -2757,7 +3071,7 @@ class MayanClient:
         try:
             # Подход 1: Попробуем найти разрешение в общем списке
             try:
-                permissions = await self.get_permissions()
+                permissions = await self.collect_all(self.iter_permissions())
                 for permission in permissions:
                     if permission and permission.get('pk') == permission_pk:
                         # Попробуем извлечь числовой ID из URL
@@ -3308,117 +3622,11 @@ class MayanClient:
             response.raise_for_status()
             
             data = response.json()
-            documents = []
             total_count = data.get('count', 0)  # Получаем общее количество
             
             logger.info(f'Получено {len(data.get("results", []))} документов из {total_count} в кабинете {cabinet_id}')
             
-            for i, doc_data in enumerate(data.get('results', [])):
-                try:
-                    # Получаем file_latest из API
-                    file_latest_data = doc_data.get('file_latest', {})
-                    file_latest_filename = file_latest_data.get('filename', '')
-                    
-                    # Проверяем, не является ли это файлом подписи или метаданных
-                    is_signature_file = (file_latest_filename.endswith('.p7s') or 
-                                       'signature_metadata_' in file_latest_filename)
-                    
-                    # Если это файл подписи/метаданных, получаем основной файл из всех файлов документа
-                    if is_signature_file:
-                        logger.debug(f'Документ {doc_data["id"]}: file_latest является файлом подписи/метаданных, ищем основной файл')
-                        
-                        try:
-                            # Получаем все файлы документа напрямую
-                            files_response = await self._make_request('GET', f'documents/{doc_data["id"]}/files/', params={'page': 1, 'page_size': 100})
-                            files_response.raise_for_status()
-                            files_data = files_response.json()
-                            all_files = files_data.get('results', [])
-                            
-                            logger.debug(f'Получено {len(all_files)} файлов для документа {doc_data["id"]}')
-                            
-                            # Фильтруем файлы: исключаем подписи и метаданные
-                            main_files = []
-                            for file_info in all_files:
-                                filename = file_info.get('filename', '')
-                                # Пропускаем файлы подписей и метаданных
-                                if filename.endswith('.p7s') or 'signature_metadata_' in filename:
-                                    logger.debug(f'Пропускаем файл подписи/метаданных: {filename}')
-                                    continue
-                                main_files.append(file_info)
-                            
-                            # Если нашли основные файлы, берем самый старый (первый созданный)
-                            if main_files:
-                                # Сортируем по приоритету
-                                def get_sort_key(file_info):
-                                    mimetype = file_info.get('mimetype') or ''
-                                    if mimetype:
-                                        mimetype = str(mimetype).lower()
-                                    else:
-                                        mimetype = ''
-                                    
-                                    priority = 0
-                                    if 'pdf' in mimetype:
-                                        priority = 3
-                                    elif 'image' in mimetype:
-                                        priority = 2
-                                    elif 'office' in mimetype or 'word' in mimetype or 'excel' in mimetype:
-                                        priority = 2
-                                    else:
-                                        priority = 1
-                                    
-                                    file_id = file_info.get('id', 0)
-                                    if isinstance(file_id, str):
-                                        try:
-                                            file_id = int(file_id)
-                                        except:
-                                            file_id = 0
-                                    return (-priority, file_id)
-                                
-                                main_files_sorted = sorted(main_files, key=get_sort_key)
-                                main_file = main_files_sorted[0]
-                                
-                                logger.debug(f'Выбран основной файл: {main_file.get("filename")} (MIME: {main_file.get("mimetype")})')
-                                file_latest_id = str(main_file.get('id', ''))
-                                file_latest_filename = main_file.get('filename', '')
-                                file_latest_mimetype = main_file.get('mimetype', '')
-                                file_latest_size = main_file.get('size', 0)
-                            else:
-                                # Если не нашли основные файлы, оставляем file_latest как есть
-                                logger.warning(f'Не найден основной файл в документе {doc_data["id"]}, только подписи/метаданные')
-                                file_latest_id = file_latest_data.get('id', '')
-                                file_latest_mimetype = file_latest_data.get('mimetype', '')
-                                file_latest_size = file_latest_data.get('size', 0)
-                        except Exception as e:
-                            logger.warning(f'Ошибка при получении основных файлов документа {doc_data["id"]}: {e}')
-                            # В случае ошибки используем file_latest как есть
-                            file_latest_id = file_latest_data.get('id', '')
-                            file_latest_filename = file_latest_data.get('filename', '')
-                            file_latest_mimetype = file_latest_data.get('mimetype', '')
-                            file_latest_size = file_latest_data.get('size', 0)
-                    else:
-                        # Если это не файл подписи/метаданных, используем file_latest как есть
-                        file_latest_id = file_latest_data.get('id', '')
-                        file_latest_mimetype = file_latest_data.get('mimetype', '')
-                        file_latest_size = file_latest_data.get('size', 0)
-                    
-                    document = MayanDocument(
-                        document_id=doc_data['id'],
-                        label=doc_data['label'],
-                        description=doc_data.get('description', ''),
-                        file_latest_id=file_latest_id,
-                        file_latest_filename=file_latest_filename,
-                        file_latest_mimetype=file_latest_mimetype,
-                        file_latest_size=file_latest_size,
-                        datetime_created=doc_data.get('datetime_created', ''),
-                        datetime_modified=doc_data.get('datetime_modified', '')
-                    )
-                    documents.append(document)
-                    logger.debug(f'Документ {i+1} создан успешно: {document}')
-                except Exception as e:
-                    logger.error(f'Ошибка при создании документа {i+1}: {e}')
-                    logger.error(f'Данные документа: {doc_data}')
-                    # Пропускаем проблемный документ, но продолжаем обработку остальных
-                    continue
+            documents = await self._build_documents(data.get('results', []))
             
             logger.info(f'Успешно создано {len(documents)} документов из {len(data.get("results", []))}')
             
@@ -3469,13 +3677,14 @@ class MayanClient:
             logger.error(f'Ошибка при получении количества документов кабинета {cabinet_id}: {e}')
             return 0
 
-    async def get_document_pages(self, document_id: str, file_id: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    async def get_document_pages(self, document_id: str, file_id: Optional[int] = None, page_size: int = 100) -> Optional[List[Dict[str, Any]]]:
         """
         Получает список страниц документа через API /documents/{document_id}/files/{file_id}/pages/
         
         Args:
             document_id: ID документа
             file_id: ID файла (если не указан, используется основной файл документа)
+            page_size: Максимальное количество возвращаемых страниц
             
         Returns:
             Список страниц с информацией (id, page_number, image_url и т.д.) или None
@@ -3495,7 +3704,7 @@ class MayanClient:
             
             # Используем endpoint для получения страниц файла
             endpoint = f'documents/{document_id}/files/{file_id}/pages/'
-            params = {'page': 1, 'page_size': 100}  # Получаем все страницы (обычно их не так много)
+            params = {'page': 1, 'page_size': page_size}
             
             logger.debug(f'Запрашиваем страницы файла через endpoint: {endpoint}')
             
@@ -3836,121 +4045,18 @@ class MayanClient:
             response.raise_for_status()
             
             data = response.json()
-            documents = []
             total_count = data.get('count', 0)
             
             logger.info(f'Получено {len(data.get("results", []))} избранных документов из {total_count}')
             logger.debug(f'Структура ответа favorites API: {json.dumps(data.get("results", [])[:1] if data.get("results") else [], indent=2, ensure_ascii=False)}')
             
-            # Парсим документы из результатов
-            for i, favorite_item in enumerate(data.get('results', [])):
-                try:
-                    # В ответе favorites API может быть структура с полем document
-                    # или напрямую данные документа
-                    if 'document' in favorite_item:
-                        doc_data = favorite_item['document']
-                        logger.debug(f'Избранный документ {i+1}: найден в поле "document"')
-                    else:
-                        doc_data = favorite_item
-                        logger.debug(f'Избранный документ {i+1}: данные напрямую в элементе')
-                    
-                    # Используем тот же код парсинга, что и в get_documents
-                    # Получаем file_latest из API
-                    file_latest_data = doc_data.get('file_latest', {})
-                    file_latest_filename = file_latest_data.get('filename', '')
-                    
-                    # Проверяем, не является ли это файлом подписи или метаданных
-                    is_signature_file = (file_latest_filename.endswith('.p7s') or 
-                                       'signature_metadata_' in file_latest_filename)
-                    
-                    # Если это файл подписи/метаданных, получаем основной файл из всех файлов документа
-                    if is_signature_file:
-                        logger.debug(f'Документ {doc_data["id"]}: file_latest является файлом подписи/метаданных, ищем основной файл')
-                        
-                        try:
-                            # Получаем все файлы документа напрямую
-                            files_response = await self._make_request('GET', f'documents/{doc_data["id"]}/files/', params={'page': 1, 'page_size': 100})
-                            files_response.raise_for_status()
-                            files_data = files_response.json()
-                            all_files = files_data.get('results', [])
-                            
-                            # Фильтруем файлы: исключаем подписи и метаданные
-                            main_files = []
-                            for file_info in all_files:
-                                filename = file_info.get('filename', '')
-                                if filename.endswith('.p7s') or 'signature_metadata_' in filename:
-                                    continue
-                                main_files.append(file_info)
-                            
-                            if main_files:
-                                # Сортируем по приоритету
-                                def get_sort_key(file_info):
-                                    mimetype = file_info.get('mimetype') or ''
-                                    if mimetype:
-                                        mimetype = str(mimetype).lower()
-                                    else:
-                                        mimetype = ''
-                                    
-                                    priority = 0
-                                    if 'pdf' in mimetype:
-                                        priority = 3
-                                    elif 'image' in mimetype:
-                                        priority = 2
-                                    elif 'office' in mimetype or 'word' in mimetype or 'excel' in mimetype:
-                                        priority = 2
-                                    else:
-                                        priority = 1
-                                    
-                                    file_id = file_info.get('id', 0)
-                                    if isinstance(file_id, str):
-                                        try:
-                                            file_id = int(file_id)
-                                        except:
-                                            file_id = 0
-                                    return (-priority, file_id)
-                                
-                                main_files_sorted = sorted(main_files, key=get_sort_key)
-                                main_file = main_files_sorted[0]
-                                
-                                file_latest_id = str(main_file.get('id', ''))
-                                file_latest_filename = main_file.get('filename', '')
-                                file_latest_mimetype = main_file.get('mimetype', '')
-                                file_latest_size = main_file.get('size', 0)
-                            else:
-                                file_latest_id = file_latest_data.get('id', '')
-                                file_latest_mimetype = file_latest_data.get('mimetype', '')
-                                file_latest_size = file_latest_data.get('size', 0)
-                        except Exception as e:
-                            logger.warning(f'Ошибка при получении основных файлов документа {doc_data["id"]}: {e}')
-                            file_latest_id = file_latest_data.get('id', '')
-                            file_latest_filename = file_latest_data.get('filename', '')
-                            file_latest_mimetype = file_latest_data.get('mimetype', '')
-                            file_latest_size = file_latest_data.get('size', 0)
-                    else:
-                        # Если это не файл подписи/метаданных, используем file_latest как есть
-                        file_latest_id = file_latest_data.get('id', '')
-                        file_latest_filename = file_latest_data.get('filename', '')
-                        file_latest_mimetype = file_latest_data.get('mimetype', '')
-                        file_latest_size = file_latest_data.get('size', 0)
-                    
-                    document = MayanDocument(
-                        document_id=doc_data['id'],
-                        label=doc_data['label'],
-                        description=doc_data.get('description', ''),
-                        file_latest_id=file_latest_id,
-                        file_latest_filename=file_latest_filename,
-                        file_latest_mimetype=file_latest_mimetype,
-                        file_latest_size=file_latest_size,
-                        datetime_created=doc_data.get('datetime_created', ''),
-                        datetime_modified=doc_data.get('datetime_modified', '')
-                    )
-                    documents.append(document)
-                    logger.debug(f'Избранный документ {i+1} создан успешно: {document.label}')
-                except Exception as e:
-                    logger.warning(f'Ошибка при парсинге избранного документа {i}: {e}')
-                    import traceback
-                    logger.debug(f'Traceback: {traceback.format_exc()}')
-                    continue
+            # В ответе favorites API может быть структура с полем document
+            # или напрямую данные документа
+            documents_data = [
+                favorite_item['document'] if 'document' in favorite_item else favorite_item
+                for favorite_item in data.get('results', [])
+            ]
+            documents = await self._build_documents(documents_data)
             
             logger.info(f'Успешно создано {len(documents)} избранных документов из {total_count}')
             return documents, total_count
@@ -0,0 +1,221 @@
+# services/preview_cache.py
+"""
+Дисковый кеш превью документов Mayan EDMS.
+
+Превью хранятся в файлах, имя которых вычисляется из пары (document_id, file_id),
+поэтому новая версия файла документа автоматически получает новый ключ.
+Общий размер кеша ограничен, при превышении удаляются давно использованные превью.
+Файлы отдаются браузеру через маршрут /api/previews/{key} с ETag и Cache-Control.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from app_logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PreviewCache:
+    """
+    Дисковый LRU кеш превью документов
+    """
+
+    # URL маршрута, через который отдаются превью (см. api_router.get_preview)
+    URL_PREFIX = '/api/previews/'
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 200 * 1024 * 1024):
+        """
+        Инициализация кеша
+
+        Args:
+            cache_dir: Директория для хранения файлов превью
+            max_bytes: Максимальный суммарный размер превью в байтах
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (путь к файлу, размер) в порядке последнего обращения
+        self._index: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._secret: Optional[bytes] = None
+        self._initialized = False
+
+    def _ensure_initialized(self) -> None:
+        """Создает директорию кеша и загружает индекс существующих файлов"""
+        if self._initialized:
+            return
+        with self._lock:
+            if self._initialized:
+                return
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._secret = self._load_secret()
+            files = [
+                (path, path.stat()) for path in self.cache_dir.iterdir()
+                if path.is_file() and not path.name.startswith('.') and path.suffix != '.tmp'
+            ]
+            # Порядок LRU восстанавливаем по времени изменения файлов
+            for path, stat in sorted(files, key=lambda item: item[1].st_mtime):
+                self._index[path.stem] = (path, stat.st_size)
+                self._total_bytes += stat.st_size
+            self._initialized = True
+            logger.info(f'Кеш превью: загружено {len(self._index)} файлов ({self._total_bytes} байт) из {self.cache_dir}')
+
+    def _load_secret(self) -> bytes:
+        """
+        Загружает (или создает) секрет для вычисления ключей превью.
+        Ключи не должны быть предсказуемыми по ID документа, иначе превью
+        можно было бы получить, перебирая ID.
+        """
+        secret_path = self.cache_dir / '.secret'
+        if secret_path.exists():
+            return secret_path.read_bytes()
+        secret = secrets.token_bytes(32)
+        secret_path.write_bytes(secret)
+        return secret
+
+    def key_for(self, document_id: Union[str, int], file_id: Union[str, int]) -> str:
+        """Возвращает ключ превью для файла документа"""
+        self._ensure_initialized()
+        message = f'{document_id}:{file_id}'.encode('utf-8')
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:40]
+
+    def url_for_key(self, key: str) -> str:
+        """Возвращает URL, по которому браузер получает превью"""
+        return f'{self.URL_PREFIX}{key}'
+
+    def path_for_key(self, key: str) -> Optional[Path]:
+        """
+        Возвращает путь к файлу превью и отмечает обращение к нему
+
+        Args:
+            key: Ключ превью
+
+        Returns:
+            Путь к файлу или None, если превью нет в кеше
+        """
+        self._ensure_initialized()
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._index.move_to_end(key)
+            self._hits += 1
+        return entry[0]
+
+    def get_url(self, document_id: Union[str, int], file_id: Union[str, int]) -> Optional[str]:
+        """Возвращает URL превью, если оно уже есть в кеше"""
+        key = self.key_for(document_id, file_id)
+        if self.path_for_key(key) is None:
+            return None
+        return self.url_for_key(key)
+
+    def put(self, document_id: Union[str, int], file_id: Union[str, int], image_data: bytes) -> str:
+        """
+        Сохраняет превью в кеш
+
+        Args:
+            document_id: ID документа
+            file_id: ID файла документа, для которого построено превью
+            image_data: Байты изображения
+
+        Returns:
+            URL превью
+        """
+        key = self.key_for(document_id, file_id)
+        path = self.cache_dir / f'{key}{_guess_extension(image_data)}'
+        # Уникальный временный файл: одно и то же превью могут одновременно сохранять
+        # несколько потоков (например два пользователя открыли один документ)
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, prefix=f'.{key}-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                tmp_file.write(image_data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            previous = self._index.get(key)
+            if previous:
+                self._total_bytes -= previous[1]
+                if previous[0] != path:
+                    previous[0].unlink(missing_ok=True)
+            self._index[key] = (path, len(image_data))
+            self._index.move_to_end(key)
+            self._total_bytes += len(image_data)
+            self._evict_locked()
+        return self.url_for_key(key)
+
+    def _evict_locked(self) -> None:
+        """Удаляет давно использованные превью, пока размер кеша превышает лимит"""
+        while self._total_bytes > self.max_bytes and self._index:
+            _, (path, size) = self._index.popitem(last=False)
+            path.unlink(missing_ok=True)
+            self._total_bytes -= size
+
+    async def get_or_fetch(self, client, document_id: Union[str, int], file_id: Union[str, int]) -> Optional[str]:
+        """
+        Возвращает URL превью, загружая изображение из Mayan EDMS только при промахе кеша
+
+        Args:
+            client: Экземпляр MayanClient
+            document_id: ID документа
+            file_id: ID основного файла документа
+
+        Returns:
+            URL превью или None, если превью недоступно
+        """
+        url = await asyncio.to_thread(self.get_url, document_id, file_id)
+        if url:
+            return url
+
+        image_data = await client.get_document_preview_image(str(document_id))
+        if not image_data:
+            return None
+        return await asyncio.to_thread(self.put, document_id, file_id, image_data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кеша"""
+        self._ensure_initialized()
+        with self._lock:
+            return {
+                'files': len(self._index),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+            }
+
+
+def _guess_extension(image_data: bytes) -> str:
+    """Определяет расширение файла изображения по магическим байтам"""
+    if image_data[:4] == b'\x89PNG':
+        return '.png'
+    if image_data[:6] in (b'GIF87a', b'GIF89a'):
+        return '.gif'
+    return '.jpg'
+
+
+def _create_preview_cache() -> PreviewCache:
+    """Создает кеш превью по настройкам из конфигурации"""
+    from config.settings import config
+
+    return PreviewCache(
+        cache_dir=config.mayan_preview_cache_dir,
+        max_bytes=config.mayan_preview_cache_max_mb * 1024 * 1024
+    )
+
+
+# Глобальный кеш превью
+preview_cache = _create_preview_cache()
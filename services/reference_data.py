@@ -0,0 +1,362 @@
+# services/reference_data.py
+"""
+Общий для процесса кеш справочных данных Mayan EDMS.
+
+Роли, состав ролей (роль -> группы -> пользователи) и разрешения одинаковы для
+всех пользователей, поэтому загружаются один раз системным клиентом и разделяются
+всеми страницами. Типы документов, кабинеты и теги сюда не входят: Mayan
+фильтрует их по ACL пользователя, и они кешируются для каждого пользователя
+отдельно (pages.mayan_documents).
+
+Кеш работает по принципу stale-while-revalidate: свежие данные отдаются сразу,
+устаревшие (но не старше max_stale) тоже отдаются сразу, а обновление запускается
+в фоне. Изменяющие запросы MayanClient к соответствующим endpoint'ам сбрасывают
+наборы данных через invalidate_for_endpoint.
+"""
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app_logging.logger import get_logger
+from config.settings import config as app_config
+
+if TYPE_CHECKING:
+    from services.mayan_connector import MayanClient
+
+logger = get_logger(__name__)
+
+ROLES = 'roles'
+ROLE_MEMBERS = 'role_members'
+PERMISSIONS = 'permissions'
+
+# Наборы данных, которые сбрасываются изменяющими запросами к endpoint'у
+_ENDPOINT_DATASETS: List[Tuple[re.Pattern, Tuple[str, ...]]] = [
+    (re.compile(r'^roles/'), (ROLES, ROLE_MEMBERS)),
+    (re.compile(r'^groups/'), (ROLE_MEMBERS,)),
+    (re.compile(r'^users/\d+/'), (ROLE_MEMBERS,)),
+]
+
+_PERMISSION_ID_RE = re.compile(r'/permissions/(\d+)/')
+
+
+async def _load_roles(client: 'MayanClient') -> List[Dict[str, Any]]:
+    return await client.collect_all(client.iter_roles())
+
+
+class RoleMembership:
+    """
+    Материализованный состав ролей Mayan EDMS
+
+    Отвечает на вопросы "у каких пользователей есть роль" и "какие роли есть
+    у пользователя" без обращений к API.
+    """
+
+    def __init__(self, roles: Dict[str, Dict[str, Any]]):
+        """
+        Args:
+            roles: label роли -> {'id', 'groups', 'usernames'}
+        """
+        self.roles = roles
+        self.roles_by_user: Dict[str, List[str]] = {}
+        for label, role in roles.items():
+            for username in role['usernames']:
+                self.roles_by_user.setdefault(username, []).append(label)
+
+    def __contains__(self, role_label: str) -> bool:
+        return role_label in self.roles
+
+    def __len__(self) -> int:
+        return len(self.roles)
+
+    def users_with_role(self, role_label: str) -> List[str]:
+        """Возвращает имена пользователей, входящих в роль через группы"""
+        role = self.roles.get(role_label)
+        return list(role['usernames']) if role else []
+
+    def roles_of_user(self, username: str) -> List[str]:
+        """Возвращает названия ролей пользователя"""
+        return list(self.roles_by_user.get(username, []))
+
+
+async def _load_role_members(client: 'MayanClient') -> RoleMembership:
+    """
+    Загружает состав ролей: label роли -> {'id', 'groups', 'usernames'}
+
+    Пользователи каждой группы загружаются один раз, даже если группа входит в несколько ролей.
+    """
+    semaphore = asyncio.Semaphore(ReferenceDataCache.LOAD_CONCURRENCY)
+
+    async def bounded(source: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await client.collect_all(source)
+
+    roles = [role for role in await client.collect_all(client.iter_roles())
+             if role.get('id') and role.get('label')]
+    role_groups = await asyncio.gather(*(bounded(f"roles/{role['id']}/groups/") for role in roles))
+
+    group_ids = sorted({group['id'] for groups in role_groups for group in groups if group.get('id')})
+    group_users = await asyncio.gather(*(bounded(f'groups/{group_id}/users/') for group_id in group_ids))
+    usernames_by_group = {
+        group_id: [user['username'] for user in users if user.get('username')]
+        for group_id, users in zip(group_ids, group_users)
+    }
+
+    members: Dict[str, Dict[str, Any]] = {}
+    for role, groups in zip(roles, role_groups):
+        usernames: List[str] = []
+        for group in groups:
+            for username in usernames_by_group.get(group.get('id'), []):
+                if username not in usernames:
+                    usernames.append(username)
+        members[role['label']] = {
+            'id': role['id'],
+            'groups': [{'id': group.get('id'), 'name': group.get('name')} for group in groups],
+            'usernames': usernames,
+        }
+    return RoleMembership(members)
+
+
+async def _load_permissions(client: 'MayanClient') -> Dict[str, Any]:
+    """
+    Загружает разрешения: label -> ID для ACL
+
+    Числовой ID извлекается из URL разрешения, при его отсутствии используется строковый pk.
+    """
+    permissions: Dict[str, Any] = {}
+    for permission in await client.collect_all(client.iter_permissions()):
+        label = permission.get('label')
+        pk = permission.get('pk')
+        if not label or not pk:
+            continue
+        match = _PERMISSION_ID_RE.search(permission.get('url', ''))
+        permissions[label] = int(match.group(1)) if match else pk
+    return permissions
+
+
+async def _create_system_client() -> 'MayanClient':
+    from services.mayan_connector import MayanClient
+    return await MayanClient.create_default()
+
+
+class ReferenceDataCache:
+    """
+    Кеш справочных данных Mayan EDMS со stale-while-revalidate обновлением
+    """
+
+    # Количество параллельных запросов при загрузке состава ролей
+    LOAD_CONCURRENCY = 8
+    # Задержка фонового обновления после инвалидации, чтобы серия изменений
+    # (например синхронизация групп из LDAP) приводила к одной перезагрузке
+    REFRESH_DEBOUNCE = 2.0
+
+    LOADERS: Dict[str, Callable[['MayanClient'], Awaitable[Any]]] = {
+        ROLES: _load_roles,
+        ROLE_MEMBERS: _load_role_members,
+        PERMISSIONS: _load_permissions,
+    }
+
+    def __init__(self, ttl: float = 300.0, max_stale: float = 3600.0,
+                 client_factory: Callable[[], Awaitable['MayanClient']] = _create_system_client):
+        """
+        Инициализация кеша
+
+        Args:
+            ttl: Время в секундах, в течение которого данные считаются свежими
+            max_stale: Время в секундах, в течение которого устаревшие данные отдаются
+                без ожидания обновления. Более старые данные загружаются заново синхронно.
+            client_factory: Фабрика клиента, от имени которого загружаются данные
+        """
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._client_factory = client_factory
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._stats = {'hits': 0, 'stale_hits': 0, 'loads': 0, 'errors': 0}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_names: Tuple[str, ...] = ()
+        self._refresh_wakeup: Optional[asyncio.Event] = None
+        self._refresh_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Возвращает закешированные данные набора (в том числе устаревшие) без загрузки"""
+        entry = self._entries.get(name)
+        return entry[0] if entry is not None else None
+
+    async def get(self, name: str, fallback_client: Optional['MayanClient'] = None) -> Any:
+        """
+        Возвращает набор справочных данных
+
+        Args:
+            name: Название набора (ROLES, ROLE_MEMBERS, PERMISSIONS)
+            fallback_client: Клиент, которым данные загружаются без кеширования,
+                если загрузить их системным клиентом не удалось
+
+        Returns:
+            Данные набора
+        """
+        if name not in self.LOADERS:
+            raise KeyError(f'Неизвестный набор справочных данных: {name}')
+
+        entry = self._entries.get(name)
+        if entry is not None:
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                self._stats['hits'] += 1
+                return value
+            if age < self.max_stale:
+                self._stats['stale_hits'] += 1
+                self.refresh_in_background(name)
+                return value
+
+        try:
+            return await self.refresh(name)
+        except Exception as e:
+            if entry is not None:
+                logger.warning(f'Не удалось обновить справочные данные {name}, используются устаревшие: {e}')
+                return entry[0]
+            if fallback_client is None:
+                raise
+            logger.warning(f'Не удалось загрузить справочные данные {name} системным клиентом: {e}')
+            return await self.LOADERS[name](fallback_client)
+
+    async def refresh(self, name: str) -> Any:
+        """
+        Загружает набор заново
+
+        Одновременные вызовы в одном цикле событий выполняют одну загрузку.
+        """
+        key = (name, id(asyncio.get_running_loop()))
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(name))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    def refresh_in_background(self, name: str) -> None:
+        """Запускает фоновое обновление набора, если оно еще не выполняется"""
+        key = (name, id(asyncio.get_running_loop()))
+        if key in self._loading:
+            return
+        task = asyncio.ensure_future(self.refresh(name))
+        # Ошибка фонового обновления уже залогирована в _load, устаревшие данные остаются в кеше
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _load(self, name: str) -> Any:
+        generation = self._generations.get(name, 0)
+        started = time.monotonic()
+        self._stats['loads'] += 1
+        try:
+            client = await self._client_factory()
+            value = await self.LOADERS[name](client)
+        except Exception as e:
+            self._stats['errors'] += 1
+            logger.error(f'Ошибка загрузки справочных данных {name}: {e}')
+            raise
+
+        # Данные, загрузка которых началась до инвалидации, могут быть устаревшими
+        if self._generations.get(name, 0) == generation:
+            self._entries[name] = (value, time.monotonic())
+        logger.info(f'Справочные данные {name} загружены за {time.monotonic() - started:.2f}с')
+        return value
+
+    def invalidate(self, *names: str) -> None:
+        """
+        Сбрасывает наборы данных (без аргументов - все наборы)
+
+        Следующее обращение загрузит данные заново.
+        """
+        names = names or tuple(self.LOADERS)
+        for name in names:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            self._entries.pop(name, None)
+
+        # Наборы с фоновым обновлением загружаются заново, не дожидаясь обращения
+        if self._refresh_wakeup is not None and set(names) & set(self._refresh_names):
+            try:
+                self._refresh_loop.call_soon_threadsafe(self._refresh_wakeup.set)
+            except RuntimeError:
+                # Цикл событий приложения уже закрыт
+                pass
+
+    def invalidate_for_endpoint(self, endpoint: str) -> None:
+        """Сбрасывает наборы, которые может изменить запрос к endpoint'у Mayan API"""
+        endpoint = endpoint.lstrip('/')
+        for pattern, names in _ENDPOINT_DATASETS:
+            if pattern.match(endpoint):
+                self.invalidate(*names)
+
+    def start_background_refresh(self, names: Tuple[str, ...] = (ROLES, ROLE_MEMBERS),
+                                 interval: Optional[float] = None) -> None:
+        """
+        Запускает периодическое фоновое обновление наборов в текущем цикле событий
+
+        Наборы обновляются каждые interval секунд (по умолчанию ttl) и вскоре после
+        инвалидации, поэтому страницы получают их из кеша без ожидания загрузки.
+
+        Args:
+            names: Обновляемые наборы
+            interval: Интервал обновления в секундах
+        """
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_names = tuple(names)
+        self._refresh_loop = asyncio.get_running_loop()
+        self._refresh_wakeup = asyncio.Event()
+        self._refresh_task = asyncio.ensure_future(self._refresh_periodically(interval or self.ttl))
+
+    def stop_background_refresh(self) -> None:
+        """Останавливает фоновое обновление"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        self._refresh_task = None
+        self._refresh_wakeup = None
+        self._refresh_loop = None
+
+    async def _refresh_periodically(self, interval: float) -> None:
+        wakeup = self._refresh_wakeup
+        while True:
+            # Инвалидация во время загрузки приведет к повторной загрузке
+            wakeup.clear()
+            for name in self._refresh_names:
+                try:
+                    await self.refresh(name)
+                except Exception:
+                    # Ошибка уже залогирована в _load, повторим на следующем шаге
+                    pass
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=interval)
+                await asyncio.sleep(self.REFRESH_DEBOUNCE)
+            except asyncio.TimeoutError:
+                pass
+
+    async def get_roles(self) -> List[Dict[str, Any]]:
+        """Возвращает список всех ролей"""
+        return await self.get(ROLES)
+
+    async def get_role_membership(self) -> RoleMembership:
+        """Возвращает состав ролей"""
+        return await self.get(ROLE_MEMBERS)
+
+    async def get_permission_id(self, label: str) -> Optional[Any]:
+        """Возвращает ID разрешения для ACL по его label"""
+        return (await self.get(PERMISSIONS)).get(label)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кеша"""
+        now = time.monotonic()
+        return {
+            **self._stats,
+            'datasets': {name: round(now - loaded_at, 1) for name, (_, loaded_at) in self._entries.items()},
+        }
+
+
+# Общий кеш справочных данных
+reference_data = ReferenceDataCache(
+    ttl=app_config.mayan_reference_cache_ttl,
+    max_stale=app_config.mayan_reference_cache_max_stale,
+)
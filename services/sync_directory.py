@@ -193,6 +193,8 @@ class DirectorySyncService:
     async def close(self):
         """Закрывает соединения"""
         self.stop_watching()
+        if self.directory_processor:
+            self.directory_processor.hash_cache.close()
         if self.mayan_client:
             await self.mayan_client.close()
     
@@ -288,6 +288,8 @@ async def sync_emails(dry_run: bool = False, max_emails: Optional[int] = None, i
                 await email_client.disconnect()
         except Exception as e:
             logger.warning(f"Ошибка при закрытии соединения с почтовым сервером: {e}")
+        if 'email_processor' in locals():
+            email_processor.hash_cache.close()
     
     return result
 
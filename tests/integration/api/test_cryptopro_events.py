@@ -1,6 +1,10 @@
 """
 Тесты обработки событий КриптоПро
 """
+import asyncio
+import threading
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
 from fastapi import FastAPI
@@ -11,6 +15,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+import api_router as api_router_module
 from api_router import api_router
 from tests.fixtures.test_data import TEST_CERTIFICATES
 
@@ -156,3 +161,30 @@ class TestCryptoproEvents:
         assert data['status'] == 'warning'
         assert data['action'] == 'show_warning'
 
+
+
+@pytest.mark.integration
+@pytest.mark.api
+class TestUserFioForCertificateMatching:
+    """Тесты получения ФИО пользователя для отбора сертификатов"""
+    
+    @pytest.mark.asyncio
+    async def test_ldap_lookup_runs_outside_event_loop(self, monkeypatch):
+        """ФИО из LDAP запрашивается в пуле потоков, а не в цикле событий"""
+        lookup_threads = []
+        
+        class FakeAuthenticator:
+            def __init__(self):
+                self.pool = SimpleNamespace(run=lambda func, *args: asyncio.to_thread(func, *args))
+            
+            def get_user_by_login(self, username):
+                lookup_threads.append(threading.current_thread())
+                return SimpleNamespace(sn='Иванов', givenName='Иван')
+        
+        monkeypatch.setattr(api_router_module, 'LDAPAuthenticator', FakeAuthenticator)
+        monkeypatch.setattr(api_router_module, 'get_user_from_request', lambda request: SimpleNamespace(username='ivanov'))
+        
+        fio = await api_router_module.get_user_fio_for_certificate_matching(object())
+        
+        assert fio == 'Иванов Иван'
+        assert lookup_threads and lookup_threads[0] is not threading.main_thread()
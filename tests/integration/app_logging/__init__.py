@@ -0,0 +1,4 @@
+"""
+Тесты записи логов в базу данных
+"""
+
@@ -0,0 +1,215 @@
+"""
+Тесты адаптеров базы данных логов
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app_logging.database import PostgreSQLAdapter, SQLiteAdapter
+from app_logging.handlers import DatabaseLogHandler
+from config.settings import DatabaseConfig, DatabaseType
+
+
+def _log(message: str) -> dict:
+    return {
+        'timestamp': datetime(2024, 1, 1, 12, 0), 'level': 'INFO', 'logger': 'test',
+        'module': 'test', 'function': 'test', 'line': 1, 'message': message,
+        'thread_name': 'MainThread', 'process_id': 1, 'exception': None, 'extra_data': {'n': 1},
+    }
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    """SQLite адаптер во временном каталоге"""
+    adapter = SQLiteAdapter({'sqlite_path': str(tmp_path / 'logs' / 'app.db')})
+    yield adapter
+    adapter.close()
+
+
+@pytest.mark.integration
+@pytest.mark.logging
+class TestDatabaseAdapterConnection:
+    """Тесты долгоживущего соединения адаптера"""
+
+    def test_batches_reuse_connection(self, adapter):
+        """Батчи из разных потоков записываются через одно соединение"""
+        assert adapter.insert_logs([_log('first'), _log('second')])
+
+        thread = threading.Thread(target=lambda: adapter.insert_logs([_log('third')]))
+        thread.start()
+        thread.join()
+
+        assert adapter.connects == 1
+        assert sorted(log['message'] for log in adapter.get_logs()) == ['first', 'second', 'third']
+
+    def test_reconnects_after_connection_closed(self, adapter):
+        """Закрытое соединение переоткрывается, батч не теряется"""
+        adapter.insert_logs([_log('before')])
+        adapter._connection.close()
+
+        assert adapter.insert_logs([_log('after')])
+        assert adapter.connects == 2
+        assert len(adapter.get_logs()) == 2
+
+    def test_health_check_after_idle(self, adapter, monkeypatch):
+        """После простоя соединение проверяется и заменяется, если проверка не прошла"""
+        adapter.insert_logs([_log('before')])
+        monkeypatch.setattr(adapter, 'HEALTH_CHECK_INTERVAL', 0.0)
+
+        def broken_ping(connection):
+            raise ConnectionError('server closed the connection')
+
+        monkeypatch.setattr(adapter, '_ping', broken_ping)
+
+        assert adapter.insert_logs([_log('after')])
+        assert adapter.connects == 2
+
+
+class FakePgConnection:
+    """Соединение psycopg2, записывающее выполненные запросы и данные, переданные в COPY"""
+
+    closed = 0
+
+    def __init__(self, partitions=()):
+        self.copied = []
+        self.queries = []
+        self.partitions = list(partitions)
+
+    def cursor(self, **kwargs):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def execute(self, query, params=None):
+                connection.queries.append(' '.join(query.split()))
+
+            def fetchone(self):
+                return None
+
+            def fetchall(self):
+                return [(name,) for name in connection.partitions]
+
+            def copy_expert(self, sql, file):
+                connection.copied.append((sql, file.read()))
+
+        return Cursor()
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.integration
+@pytest.mark.logging
+class TestBulkInsert:
+    """Тесты пакетной записи логов"""
+
+    def test_postgresql_batch_sent_with_copy(self, monkeypatch):
+        """Батч PostgreSQL передается одной командой COPY с экранированием и JSON"""
+        connection = FakePgConnection()
+        monkeypatch.setattr(PostgreSQLAdapter, 'get_connection', lambda self: connection)
+        adapter = PostgreSQLAdapter({}, 'application_logs')
+
+        message = _log('строка\tс табуляцией\nи переводом \\ строки')
+        assert adapter.insert_logs([message, _log('second')])
+
+        (sql, data), = connection.copied
+        assert sql.startswith('COPY application_logs (timestamp, level, logger,')
+        rows = data.splitlines()
+        assert len(rows) == 2
+        assert rows[0].split('\t') == [
+            '2024-01-01T12:00:00', 'INFO', 'test', 'test', 'test', '1',
+            'строка\\tс табуляцией\\nи переводом \\\\ строки',
+            'MainThread', '1', '\\N', '{"n": 1}',
+        ]
+
+    def test_handler_reports_write_rate(self, tmp_path):
+        """Обработчик учитывает записанные строки и скорость записи"""
+        handler = DatabaseLogHandler(
+            DatabaseConfig(db_type=DatabaseType.SQLITE, sqlite_path=str(tmp_path / 'app.db')),
+            batch_size=3, flush_interval=0,
+        )
+        logger = logging.getLogger('tests.app_logging.rate')
+        for i in range(3):
+            handler.emit(logger.makeRecord(logger.name, logging.INFO, __file__, 1, f'message {i}', None, None))
+
+        deadline = time.monotonic() + 5
+        while handler.get_stats()['written'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        handler.close()
+
+        stats = handler.get_stats()
+        assert stats['written'] == 3
+        assert stats['batches'] == 1
+        assert stats['rows_per_sec'] > 0
+
+
+@pytest.mark.integration
+@pytest.mark.logging
+class TestPartitionedLogs:
+    """Тесты секционированной таблицы логов и постраничной выборки"""
+
+    def test_partitions_created_ahead(self, monkeypatch):
+        """Создается секционированная таблица и секции на несколько периодов вперед"""
+        connection = FakePgConnection()
+        monkeypatch.setattr(PostgreSQLAdapter, 'get_connection', lambda self: connection)
+        adapter = PostgreSQLAdapter({'partition_interval': 'week', 'partitions_ahead': 2}, 'application_logs')
+
+        assert adapter.partitioned
+        assert any('PARTITION BY RANGE (timestamp)' in query for query in connection.queries)
+
+        connection.queries.clear()
+        adapter.ensure_partitions(datetime(2024, 1, 10, 15, 30, tzinfo=timezone.utc))
+        assert connection.queries == [
+            f"CREATE TABLE IF NOT EXISTS application_logs_p{start} PARTITION OF application_logs "
+            f"FOR VALUES FROM ('{start[:4]}-{start[4:6]}-{start[6:]}T00:00:00+00:00') TO ('{end}T00:00:00+00:00')"
+            for start, end in [('20240101', '2024-01-08'), ('20240108', '2024-01-15'),
+                               ('20240115', '2024-01-22'), ('20240122', '2024-01-29')]
+        ]
+
+    def test_cleanup_drops_expired_partitions(self, monkeypatch):
+        """Очистка удаляет секции, период которых целиком старше срока хранения"""
+        today = datetime.now(timezone.utc)
+        names = [f'application_logs_p{today - timedelta(days=days):%Y%m%d}' for days in (40, 31, 30, 1)]
+        connection = FakePgConnection(partitions=names + ['application_logs_default'])
+        monkeypatch.setattr(PostgreSQLAdapter, 'get_connection', lambda self: connection)
+        adapter = PostgreSQLAdapter({}, 'application_logs')
+        connection.queries.clear()
+
+        assert adapter.cleanup_old_logs(days=30)
+
+        assert [query for query in connection.queries if query.startswith('DROP')] == [
+            f'DROP TABLE IF EXISTS {names[0]}', f'DROP TABLE IF EXISTS {names[1]}',
+        ]
+        assert connection.queries[-1] == 'DELETE FROM application_logs_default WHERE timestamp < %s'
+
+    def test_keyset_pagination(self, adapter):
+        """Страницы выбираются по курсору (timestamp, id) без пропусков и повторов"""
+        logs = [_log(f'message {i}') for i in range(5)]
+        for i, log in enumerate(logs):
+            log['timestamp'] = datetime(2024, 1, 1, 12, i // 2)
+        adapter.insert_logs(logs)
+
+        pages = []
+        before = None
+        while True:
+            page = adapter.get_logs(limit=2, before=before)
+            if not page:
+                break
+            pages.append([log['message'] for log in page])
+            before = (page[-1]['timestamp'], page[-1]['id'])
+
+        assert pages == [['message 4', 'message 3'], ['message 2', 'message 1'], ['message 0']]
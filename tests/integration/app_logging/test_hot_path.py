@@ -0,0 +1,103 @@
+"""
+Тесты средств логирования в часто выполняемом коде
+"""
+import logging
+
+import pytest
+
+from app_logging.hot_path import RateLimitFilter, lazy, log_summary, mask_secret
+
+
+class ListHandler(logging.Handler):
+    """Обработчик, сохраняющий отформатированные сообщения"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def hot_logger():
+    """Логгер без распространения записей с двумя обработчиками"""
+    logger = logging.getLogger('tests.app_logging.hot_path')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handlers = [ListHandler(), ListHandler()]
+    for handler in handlers:
+        logger.addHandler(handler)
+    yield logger, handlers
+    for handler in handlers:
+        logger.removeHandler(handler)
+
+
+@pytest.mark.integration
+@pytest.mark.logging
+class TestHotPathLogging:
+    """Тесты ленивых сообщений, ограничения частоты и сводок"""
+
+    def test_lazy_message_not_evaluated_when_disabled(self, hot_logger):
+        """Аргумент вычисляется только для выводимых записей"""
+        logger, (handler, _) = hot_logger
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return 'значение'
+
+        logger.debug('Отладка: %s', lazy(expensive))
+        assert calls == []
+
+        logger.info('Токен: %s, значение: %s', mask_secret('abcdefghij0123456789'), lazy(expensive))
+        assert handler.messages == ['Токен: abcdefghij...56789, значение: значение']
+        assert calls == [1]
+        assert str(mask_secret('short')) == '***'
+
+    def test_rate_limit_per_call_site(self, hot_logger):
+        """Записи сверх лимита отбрасываются, следующая запись сообщает их количество"""
+        logger, handlers = hot_logger
+        rate_filter = RateLimitFilter(rate=1, burst=3)
+        for handler in handlers:
+            handler.addFilter(rate_filter)
+
+        def log_item(i):
+            logger.info('Элемент %s', i)
+
+        for i in range(10):
+            log_item(i)
+        logger.warning('Предупреждение не ограничивается')
+
+        assert handlers[0].messages == ['Элемент 0', 'Элемент 1', 'Элемент 2', 'Предупреждение не ограничивается']
+        assert handlers[1].messages == handlers[0].messages
+        assert rate_filter.suppressed == 7
+
+        # Через секунду место вызова получает новую запись
+        for bucket in rate_filter._buckets.values():
+            bucket[1] -= 1
+        log_item(10)
+        assert handlers[0].messages[-1] == 'Элемент 10 (пропущено похожих сообщений: 7)'
+
+    def test_rate_limit_only_for_listed_loggers(self, hot_logger):
+        """Ограничение применяется только к логгерам с указанными префиксами"""
+        logger, (handler, _) = hot_logger
+        handler.addFilter(RateLimitFilter(rate=0.001, burst=1, loggers=['services']))
+
+        for i in range(3):
+            logger.info('Элемент %s', i)
+
+        assert len(handler.messages) == 3
+
+    def test_summary_aggregates_loop(self, hot_logger):
+        """Сводка выводит одну строку на цикл с примерами и счетчиками"""
+        logger, (handler, _) = hot_logger
+
+        with log_summary(logger, 'Обработаны пользователи', max_items=2) as summary:
+            for username in ['alice', 'bob', 'carol']:
+                summary.add(username, category='ошибка' if username == 'bob' else None)
+
+        with log_summary(logger, 'Отладка', logging.DEBUG) as summary:
+            summary.add('x')
+
+        assert handler.messages == ['Обработаны пользователи: 3 [ошибка: 1] (alice, bob и еще 1)']
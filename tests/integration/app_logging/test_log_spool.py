@@ -0,0 +1,123 @@
+"""
+Тесты очереди и дискового спула обработчика логов в БД
+"""
+import logging
+
+import pytest
+
+from app_logging.handlers import DatabaseLogHandler
+from config.settings import DatabaseConfig, DatabaseType, LogDropPolicy
+
+logger = logging.getLogger('tests.app_logging.spool')
+
+
+def _record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logger.makeRecord(logger.name, level, __file__, 1, message, None, None)
+
+
+@pytest.fixture
+def make_handler(tmp_path):
+    """Создает обработчик над SQLite во временном каталоге (фоновый поток сам не пишет)"""
+    handlers = []
+
+    def make(**options):
+        db_config = DatabaseConfig(
+            db_type=DatabaseType.SQLITE, sqlite_path=str(tmp_path / 'app.db'),
+            spool_dir=str(tmp_path / 'spool'), **options,
+        )
+        handler = DatabaseLogHandler(db_config, batch_size=100, flush_interval=60)
+        handlers.append(handler)
+        return handler
+
+    yield make
+    for handler in handlers:
+        handler.close()
+
+
+def _messages(handler) -> list:
+    return sorted(log['message'] for log in handler.db_adapter.get_logs(limit=1000))
+
+
+@pytest.mark.integration
+@pytest.mark.logging
+class TestDatabaseLogHandlerQueue:
+    """Тесты ограниченной очереди и спула"""
+
+    def test_full_queue_drops_oldest(self, make_handler):
+        """При переполнении очереди отбрасываются самые старые записи"""
+        handler = make_handler(queue_size=3)
+        for i in range(5):
+            handler.emit(_record(f'message {i}'))
+
+        stats = handler.get_stats()
+        assert stats['queued'] == 3
+        assert stats['dropped'] == 2
+        assert stats['enqueued'] == 5
+
+        handler.flush()
+        assert _messages(handler) == ['message 2', 'message 3', 'message 4']
+
+    def test_records_from_logger(self, make_handler):
+        """Записи, пришедшие через логгер (Handler.handle), ставятся в очередь без блокировки"""
+        handler = make_handler()
+        source = logging.getLogger('tests.app_logging.spool.source')
+        source.addHandler(handler)
+        try:
+            source.warning('through logger')
+        finally:
+            source.removeHandler(handler)
+
+        handler.flush()
+        assert _messages(handler) == ['through logger']
+
+    def test_full_queue_drops_lowest_level(self, make_handler):
+        """Политика LOWEST_LEVEL отбрасывает записи самого низкого уровня"""
+        handler = make_handler(queue_size=3, drop_policy=LogDropPolicy.LOWEST_LEVEL)
+        handler.emit(_record('info 1'))
+        handler.emit(_record('warning', logging.WARNING))
+        handler.emit(_record('info 2'))
+        handler.emit(_record('error', logging.ERROR))
+        handler.emit(_record('debug', logging.DEBUG))
+
+        handler.flush()
+        assert _messages(handler) == ['error', 'info 2', 'warning']
+        assert handler.get_stats()['dropped'] == 2
+
+    def test_outage_spooled_and_replayed(self, make_handler, monkeypatch):
+        """Пока БД недоступна, записи копятся в спуле и загружаются после восстановления"""
+        handler = make_handler(retry_interval=0)
+        insert_logs = handler.db_adapter.insert_logs
+        monkeypatch.setattr(handler.db_adapter, 'insert_logs', lambda logs: False)
+
+        handler.emit(_record('during outage 1'))
+        handler.flush()
+        handler.emit(_record('during outage 2'))
+        handler.flush()
+
+        stats = handler.get_stats()
+        assert stats['spooled'] == 2
+        assert stats['written'] == 0
+        assert handler.spool.has_data()
+
+        monkeypatch.setattr(handler.db_adapter, 'insert_logs', insert_logs)
+        handler.emit(_record('after outage'))
+        handler.flush()
+
+        stats = handler.get_stats()
+        assert stats['replayed'] == 2
+        assert stats['written'] == 3
+        assert not handler.spool.has_data()
+        assert _messages(handler) == ['after outage', 'during outage 1', 'during outage 2']
+
+    def test_spool_replayed_after_restart(self, make_handler, monkeypatch):
+        """Записи из спула, оставшиеся после остановки, загружаются новым обработчиком"""
+        handler = make_handler(retry_interval=0)
+        monkeypatch.setattr(handler.db_adapter, 'insert_logs', lambda logs: False)
+        handler.emit(_record('before restart'))
+        handler.close()
+
+        restarted = make_handler(retry_interval=0)
+        restarted.flush()
+
+        assert _messages(restarted) == ['before restart']
+        assert restarted.get_stats()['replayed'] == 1
@@ -0,0 +1,85 @@
+"""
+Тесты общего пула соединений CamundaClient
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from services.camunda_connector import CamundaClient
+from services.http_pool import SharedHttpPool, _create_camunda_pool
+from utils.ttl_cache import TTLCache
+
+
+@pytest.mark.integration
+@pytest.mark.camunda
+class TestCamundaPool:
+    """Тесты общего пула соединений Camunda"""
+
+    @pytest.mark.asyncio
+    async def test_clients_share_pool_with_own_credentials(self, monkeypatch):
+        """Клиенты разных пользователей используют один пул и свои учетные данные"""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get('Authorization'))
+            return httpx.Response(200, json=[])
+
+        pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+        monkeypatch.setattr('services.camunda_connector.camunda_http_pool', pool)
+        monkeypatch.setattr('services.camunda_connector._read_cache', TTLCache(ttl=None))
+
+        alice = CamundaClient('http://camunda', username='alice', password='a')
+        bob = CamundaClient('http://camunda', username='bob', password='b')
+        await alice._make_request('GET', 'task')
+        await bob._make_request('GET', 'task')
+
+        assert seen[0] == httpx.BasicAuth('alice', 'a')._auth_header
+        assert seen[1] == httpx.BasicAuth('bob', 'b')._auth_header
+        assert pool.get_stats()['clients_created'] == 1
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_clients_do_not_share_session_cookie(self, monkeypatch):
+        """JSESSIONID, выданный одному пользователю, не отправляется с запросами другого"""
+        cookies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            cookies.append(request.headers.get('Cookie'))
+            return httpx.Response(200, json=[], headers={'Set-Cookie': 'JSESSIONID=alice-session; Path=/'})
+
+        pool = _create_camunda_pool()
+        pool.transport = httpx.MockTransport(handler)
+        monkeypatch.setattr('services.camunda_connector.camunda_http_pool', pool)
+        monkeypatch.setattr('services.camunda_connector._read_cache', TTLCache(ttl=None))
+
+        alice = CamundaClient('http://camunda', username='alice', password='a')
+        bob = CamundaClient('http://camunda', username='bob', password='b')
+        await alice._make_request('GET', 'task')
+        await bob._make_request('GET', 'task')
+
+        assert cookies == [None, None]
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_max_concurrency_is_respected(self):
+        """Количество одновременных запросов не превышает max_concurrency"""
+        active = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return httpx.Response(200, json=[])
+
+        pool = SharedHttpPool('test', max_concurrency=2, transport=httpx.MockTransport(handler))
+        session = pool.session()
+        await asyncio.gather(*(session.get('http://camunda/engine-rest/task') for _ in range(6)))
+
+        assert peak == 2
+        assert pool.get_stats()['requests_total'] == 6
+        assert pool.get_stats()['waiting'] == 0
+        await pool.aclose()
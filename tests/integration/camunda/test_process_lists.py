@@ -0,0 +1,179 @@
+"""
+Тесты пакетной загрузки процессов и задач пользователя из Camunda
+"""
+import json
+
+import httpx
+import pytest
+
+from services.camunda_connector import CamundaClient
+from services.http_pool import SharedHttpPool
+from utils.ttl_cache import TTLCache
+
+PROCESS_COUNT = 250
+ALICE_PROCESSES = {'p7', 'p120', 'p249'}
+
+
+def _creator(process_id: str) -> str:
+    return 'alice' if process_id in ALICE_PROCESSES else 'bob'
+
+
+def _variables(process_id: str) -> list:
+    return [
+        {'name': 'processCreator', 'value': _creator(process_id), 'processInstanceId': process_id,
+         'activityInstanceId': process_id},
+        {'name': 'taskName', 'value': f'Задача {process_id}', 'processInstanceId': process_id,
+         'activityInstanceId': process_id},
+    ]
+
+
+def _review_variables(process_id: str) -> list:
+    """Переменные процесса ознакомления: alice и bob завершили, у carol активный экземпляр"""
+    body = 'review#multiInstanceBody:1'
+    return [
+        {'name': 'assigneeList', 'value': ['alice', 'bob', 'carol'], 'processInstanceId': process_id,
+         'activityInstanceId': process_id},
+        {'name': 'userCompleted', 'value': '{"alice": true}', 'processInstanceId': process_id,
+         'activityInstanceId': process_id},
+        {'name': 'nrOfInstances', 'value': 3, 'processInstanceId': process_id, 'activityInstanceId': body},
+        {'name': 'nrOfCompletedInstances', 'value': 2, 'processInstanceId': process_id, 'activityInstanceId': body},
+        {'name': 'assignee', 'value': 'carol', 'processInstanceId': process_id, 'activityInstanceId': 'review:3'},
+    ]
+
+
+@pytest.fixture
+def camunda_client(monkeypatch):
+    """CamundaClient поверх мок-транспорта, записывающего запросы"""
+    requests = []
+    params = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.replace('/engine-rest/', '', 1)
+        requests.append((request.method, path))
+        params.setdefault(path, []).append(dict(request.url.params))
+        body = json.loads(request.content) if request.content else {}
+
+        if path == 'process-instance':
+            processes = [{'id': f'p{i}'} for i in range(PROCESS_COUNT)]
+            for condition in body.get('variables', []):
+                assert (condition['name'], condition['operator']) == ('processCreator', 'eq')
+                processes = [process for process in processes if _creator(process['id']) == condition['value']]
+            return httpx.Response(200, json=processes)
+        if path == 'task':
+            return httpx.Response(200, json=[
+                {'id': 't1', 'name': 'Подписать', 'processInstanceId': 'p7', 'executionId': 'e1',
+                 'taskDefinitionKey': 'sign'},
+                {'id': 't2', 'name': 'Подписать', 'processInstanceId': 'p7', 'executionId': 'e2',
+                 'taskDefinitionKey': 'sign'},
+                {'id': 't3', 'name': 'Ознакомиться', 'processInstanceId': 'p120', 'executionId': 'e3',
+                 'taskDefinitionKey': 'read'},
+            ])
+        if path == 'variable-instance' and body.get('processInstanceIdIn') == ['p7', 'p120']:
+            result = _variables('p7') + _variables('p120') + [
+                {'name': 'assignee', 'value': 'alice', 'processInstanceId': 'p7', 'executionId': 'e1'},
+                {'name': 'assignee', 'value': 'carol', 'processInstanceId': 'p7', 'executionId': 'e2'},
+                {'name': 'nrOfInstances', 'value': 2, 'processInstanceId': 'p7',
+                 'activityInstanceId': 'sign#multiInstanceBody:1', 'executionId': 's1'},
+                {'name': 'taskName', 'value': 'Подписание', 'processInstanceId': 'p7',
+                 'activityInstanceId': 'sign#multiInstanceBody:1', 'executionId': 's1'},
+                {'name': 'assignee', 'value': 'dave', 'processInstanceId': 'p120',
+                 'activityInstanceId': 'review:1', 'executionId': 'e9'},
+                {'name': 'comment', 'value': 'черновик', 'processInstanceId': 'p120',
+                 'activityInstanceId': 'review:1', 'executionId': 'e9', 'taskId': 't9'},
+            ]
+            return httpx.Response(200, json=result)
+        if path in ('variable-instance', 'history/variable-instance') and request.method == 'POST':
+            result = [var for pid in body['processInstanceIdIn'] for var in _variables(pid)]
+            if path == 'variable-instance' and 'p120' in body['processInstanceIdIn']:
+                result += _review_variables('p120')
+            if 'variableName' in body:
+                result = [var for var in result if var['name'] == body['variableName']]
+            return httpx.Response(200, json=result)
+        if path == 'history/variable-instance':
+            ids = sorted(ALICE_PROCESSES) + ['p5']
+            return httpx.Response(200, json=[{'processInstanceId': pid} for pid in ids])
+        if path == 'history/process-instance':
+            return httpx.Response(200, json=[
+                {'id': pid, 'endTime': None if pid == 'p5' else '2024-01-01T00:00:00.000+0000'}
+                for pid in body['processInstanceIds']
+            ])
+        return httpx.Response(200, json=[])
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.camunda_connector.camunda_http_pool', pool)
+    monkeypatch.setattr('services.camunda_connector._read_cache', TTLCache(ttl=None))
+    client = CamundaClient('http://camunda', username='alice', password='secret')
+    client.requests = requests
+    client.params = params
+    return client
+
+
+@pytest.mark.integration
+@pytest.mark.camunda
+class TestProcessesByCreator:
+    """Тесты получения процессов создателя"""
+
+    @pytest.mark.asyncio
+    async def test_active_processes_loaded_in_batches(self, camunda_client):
+        """Процессы отбираются по создателю в Camunda, переменные и прогресс загружаются одним пакетом"""
+        processes = await camunda_client.get_processes_by_creator('alice', active_only=True)
+
+        assert {process['id'] for process in processes} == ALICE_PROCESSES
+        assert all(process['variables']['taskName'] == f"Задача {process['id']}" for process in processes)
+        # 1 отфильтрованный список процессов + 1 пакет переменных (отображаемых и прогресса)
+        assert camunda_client.requests == [('POST', 'process-instance'), ('POST', 'variable-instance')]
+
+    @pytest.mark.asyncio
+    async def test_progress_calculated_from_batched_variables(self, camunda_client):
+        """Прогресс Multi-Instance рассчитывается по пакетно загруженным переменным"""
+        processes = {process['id']: process for process in await camunda_client.get_processes_by_creator('alice')}
+
+        progress = processes['p120']['progress']
+        assert (progress['completed_reviews'], progress['total_reviews']) == (2, 3)
+        assert [(status['user'], status['completed']) for status in progress['user_status']] == [
+            ('alice', True), ('bob', True), ('carol', False),
+        ]
+        assert 'assignee' not in processes['p120']['variables']
+        assert processes['p7']['progress']['user_status'] == []
+
+    @pytest.mark.asyncio
+    async def test_completed_processes_exclude_active(self, camunda_client):
+        """Среди завершенных процессов остаются только процессы с endTime"""
+        processes = await camunda_client.get_processes_by_creator('alice', active_only=False)
+
+        assert {process['id'] for process in processes} == ALICE_PROCESSES
+        assert all(process['variables']['processCreator'] == 'alice' for process in processes)
+        assert len(camunda_client.requests) == 3
+
+
+@pytest.mark.integration
+@pytest.mark.camunda
+class TestUserTasksVariables:
+    """Тесты пакетной загрузки переменных задач"""
+
+    @pytest.mark.asyncio
+    async def test_task_variables_loaded_in_one_request(self, camunda_client):
+        """Переменные всех задач загружаются одним запросом с учетом области видимости"""
+        tasks = await camunda_client.get_user_tasks('alice')
+
+        variables = {task.id: task.variables for task in tasks}
+        assert variables['t1']['assignee'] == 'alice'
+        assert variables['t2']['assignee'] == 'carol'
+        assert variables['t3']['taskName'] == 'Задача p120'
+        assert camunda_client.requests == [('GET', 'task'), ('POST', 'variable-instance')]
+        # Как и /task/{id}/variables, запрос переменных идет без deserializeValues
+        assert camunda_client.params['variable-instance'] == [{}]
+
+    @pytest.mark.asyncio
+    async def test_task_variables_limited_to_own_scope_chain(self, camunda_client):
+        """Задаче видны только переменные ее цепочки областей: вложенная область важнее процесса"""
+        tasks = await camunda_client.get_user_tasks('alice')
+
+        variables = {task.id: task.variables for task in tasks}
+        assert variables['t1']['nrOfInstances'] == 2
+        assert variables['t1']['taskName'] == 'Подписание'
+        assert variables['t2']['taskName'] == 'Подписание'
+        assert variables['t1']['processCreator'] == 'alice'
+        # Переменные соседней ветки и локальные переменные чужой задачи не видны
+        assert 'assignee' not in variables['t3']
+        assert 'comment' not in variables['t3']
@@ -0,0 +1,93 @@
+"""
+Тесты кеша GET запросов CamundaClient
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from services.camunda_connector import CamundaClient
+from services.http_pool import SharedHttpPool
+from utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def camunda(monkeypatch):
+    """Фабрика CamundaClient поверх мок-транспорта, считающего запросы к Camunda"""
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        await asyncio.sleep(0.01)
+        if request.method == 'GET':
+            return httpx.Response(200, json=[{'id': 'task-1'}])
+        if request.url.path.endswith('deployment/create'):
+            return httpx.Response(200, json={'id': 'd1', 'name': 'Тест', 'deploymentTime': '2024-01-01T00:00:00.000+0000'})
+        return httpx.Response(204)
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.camunda_connector.camunda_http_pool', pool)
+    monkeypatch.setattr('services.camunda_connector._read_cache', TTLCache(ttl=None))
+
+    def factory(username: str = 'alice') -> CamundaClient:
+        client = CamundaClient('http://camunda', username=username, password='secret')
+        client.requests = requests
+        return client
+
+    return factory
+
+
+@pytest.mark.integration
+@pytest.mark.camunda
+class TestCamundaReadCache:
+    """Тесты кеша чтения Camunda"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_requests_coalesced(self, camunda):
+        """Одинаковые одновременные запросы выполняются один раз"""
+        client = camunda()
+        params = {'assignee': 'alice', 'active': 'true'}
+
+        responses = await asyncio.gather(*(client._make_request('GET', 'task', params=params) for _ in range(5)))
+        await client._make_request('GET', 'task', params=params)
+
+        assert all(response.json() == [{'id': 'task-1'}] for response in responses)
+        assert client.requests == [('GET', '/engine-rest/task')]
+
+    @pytest.mark.asyncio
+    async def test_users_do_not_share_cache(self, camunda):
+        """Ответы одного пользователя не отдаются другому"""
+        await camunda('alice')._make_request('GET', 'task')
+        await camunda('bob')._make_request('GET', 'task')
+
+        assert len(camunda().requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_write_request_invalidates_cache(self, camunda):
+        """Завершение задачи сбрасывает кеш, а пакетные запросы на чтение - нет"""
+        client = camunda()
+        await client._make_request('GET', 'task')
+        await client._make_request('POST', 'variable-instance', json={'processInstanceIdIn': ['p1']})
+        await client._make_request('GET', 'task')
+        await client.complete_task('task-1')
+        await client._make_request('GET', 'task')
+
+        assert [method for method, _ in client.requests] == ['GET', 'POST', 'POST', 'GET']
+
+    @pytest.mark.asyncio
+    async def test_deploy_invalidates_cache(self, camunda, tmp_path):
+        """Развертывание процесса сбрасывает кеш определений процессов"""
+        client = camunda()
+        bpmn_file = tmp_path / 'process.bpmn'
+        bpmn_file.write_text('<definitions/>')
+
+        await client._make_request('GET', 'process-definition')
+        deployment = await client.deploy_process('Тест', str(bpmn_file))
+        await client._make_request('GET', 'process-definition')
+
+        assert deployment.id == 'd1'
+        assert client.requests == [
+            ('GET', '/engine-rest/process-definition'),
+            ('POST', '/engine-rest/deployment/create'),
+            ('GET', '/engine-rest/process-definition'),
+        ]
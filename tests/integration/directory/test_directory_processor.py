@@ -161,7 +161,7 @@ class TestDirectoryProcessor:
         assert result['success'] is True
         
         # Проверяем, что хеш был добавлен в кеш
-        assert processor.hash_cache.hash_exists(expected_hash)
+        assert await processor.hash_cache.hash_exists(expected_hash)
     
     @pytest.mark.asyncio
     async def test_process_file_without_duplicate_check(
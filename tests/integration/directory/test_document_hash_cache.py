@@ -0,0 +1,175 @@
+"""
+Тесты кеша хешей документов
+"""
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from services.document_hash_cache import DocumentHashCache
+
+HASH_A = 'a' * 64
+HASH_B = 'b' * 64
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Кеш во временном каталоге"""
+    cache = DocumentHashCache(cache_db_path=tmp_path / 'hashes.db')
+    yield cache
+    cache.close()
+
+
+def _document(document_id, description):
+    return SimpleNamespace(document_id=document_id, description=description)
+
+
+def _described(document_id, file_hash):
+    return _document(document_id, json.dumps({'attachment_hash': file_hash, 'attachment_filename': f'{document_id}.pdf'}))
+
+
+class FakeMayanClient:
+    """Клиент Mayan, отдающий документы страницами с учетом сортировки и фильтра по ID"""
+
+    def __init__(self, documents):
+        self.documents = list(documents)
+        self.requests = []
+
+    async def get_documents(self, page=1, page_size=100, cabinet_id=None, ordering='-datetime_created', id__gt=None):
+        self.requests.append((page, id__gt))
+        documents = sorted(self.documents, key=lambda doc: doc.document_id, reverse=ordering.startswith('-'))
+        if id__gt is not None:
+            documents = [doc for doc in documents if doc.document_id > id__gt]
+        start = (page - 1) * page_size
+        return documents[start:start + page_size], len(documents)
+
+
+@pytest.mark.integration
+@pytest.mark.directory
+class TestDocumentHashCache:
+    """Тесты кеша хешей документов"""
+
+    @pytest.mark.asyncio
+    async def test_add_and_lookup(self, cache):
+        """Повторное добавление обновляет запись и сохраняет дату создания"""
+        assert await cache.get_document_by_hash(HASH_A) is None
+
+        assert await cache.add_hash(HASH_A, '1', filename='a.pdf', cabinet_id=5, metadata={'k': 'v'})
+        first = await cache.get_document_by_hash(HASH_A, cabinet_id=5)
+        assert await cache.add_hash(HASH_A, '2', filename='a2.pdf', cabinet_id=5)
+        second = await cache.get_document_by_hash(HASH_A)
+
+        assert first['document_id'] == '1'
+        assert first['metadata'] == {'k': 'v'}
+        assert second['document_id'] == '2'
+        assert second['filename'] == 'a2.pdf'
+        assert second['created_at'] == first['created_at']
+        assert await cache.hash_exists(HASH_A, cabinet_id=5)
+        assert not await cache.hash_exists(HASH_A, cabinet_id=6)
+        assert await cache.get_count() == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_add_on_worker_thread(self, cache, monkeypatch):
+        """Пакетное добавление выполняется одной транзакцией в потоке кеша над соединением WAL"""
+        threads = set()
+        add_hashes = cache._add_hashes
+
+        def tracked(rows):
+            threads.add(threading.current_thread().name)
+            return add_hashes(rows)
+
+        monkeypatch.setattr(cache, '_add_hashes', tracked)
+
+        added = await cache.add_hashes([
+            {'file_hash': HASH_A, 'document_id': '1', 'cabinet_id': 1},
+            {'file_hash': HASH_B, 'document_id': '2', 'cabinet_id': 1},
+            {'file_hash': '', 'document_id': '3'},
+        ])
+
+        assert added == 2
+        assert await cache.get_all_hashes(cabinet_id=1) == {HASH_A, HASH_B}
+        assert len(threads) == 1 and threads.pop().startswith('hash-cache')
+        assert threading.current_thread().name not in threads
+        journal_mode = await cache._run(cache._read, 'PRAGMA journal_mode')
+        assert journal_mode[0][0] == 'wal'
+
+        assert await cache.remove_hash(HASH_A)
+        assert await cache.clear_cache(cabinet_id=1)
+        assert await cache.get_count() == 0
+
+    @pytest.mark.asyncio
+    async def test_full_sync_from_mayan(self, cache, monkeypatch):
+        """Первая синхронизация читает все страницы и берет хеши из JSON описания и из текста"""
+        monkeypatch.setattr(cache, 'SYNC_PAGE_SIZE', 2)
+        client = FakeMayanClient([
+            _described(1, HASH_A),
+            _document(2, f'повреждено {{"attachment_hash": "{HASH_B}"'),
+            _document(3, 'без хеша'),
+            _document(4, None),
+            _document(5, json.dumps({'file_hash': 'c' * 64, 'file_name': 'scan.pdf'})),
+        ])
+
+        assert await cache.sync_from_mayan(client, cabinet_id=7) == 3
+        assert sorted(client.requests) == [(1, None), (2, None), (3, None)]
+        assert (await cache.get_document_by_hash(HASH_A))['filename'] == '1.pdf'
+        assert (await cache.get_document_by_hash(HASH_B))['metadata'] == {'source': 'text_parsing'}
+        assert (await cache.get_document_by_hash('c' * 64))['filename'] == 'scan.pdf'
+        assert await cache.get_watermark(7) == 5
+        assert await cache.get_watermark(8) is None
+
+    @pytest.mark.asyncio
+    async def test_incremental_sync_from_mayan(self, cache, monkeypatch):
+        """Повторная синхронизация запрашивает только документы новее сохраненного"""
+        monkeypatch.setattr(cache, 'SYNC_PAGE_SIZE', 2)
+        client = FakeMayanClient([_described(i, f'{i:064x}') for i in range(1, 6)])
+        await cache.sync_from_mayan(client, cabinet_id=7)
+
+        client.requests.clear()
+        assert await cache.sync_from_mayan(client, cabinet_id=7) == 0
+        assert client.requests == [(1, 5)]
+
+        client.documents += [_described(i, f'{i:064x}') for i in range(6, 9)]
+        client.requests.clear()
+        assert await cache.sync_from_mayan(client, cabinet_id=7) == 3
+        assert sorted(client.requests) == [(1, 5), (2, 5)]
+        assert await cache.get_watermark(7) == 8
+        assert await cache.get_count(cabinet_id=7) == 8
+
+    @pytest.mark.asyncio
+    async def test_page_limit_resumes_from_watermark(self, cache, monkeypatch):
+        """Синхронизация, ограниченная лимитом страниц, продолжается со следующего документа"""
+        monkeypatch.setattr(cache, 'SYNC_PAGE_SIZE', 2)
+        client = FakeMayanClient([_described(i, f'{i:064x}') for i in range(1, 8)])
+
+        assert await cache.sync_from_mayan(client, cabinet_id=7, max_pages=2) == 4
+        assert await cache.get_watermark(7) == 4
+
+        client.requests.clear()
+        assert await cache.sync_from_mayan(client, cabinet_id=7, max_pages=2) == 3
+        assert sorted(client.requests) == [(1, 4), (2, 4)]
+        assert await cache.get_watermark(7) == 7
+        assert await cache.get_count(cabinet_id=7) == 7
+
+    @pytest.mark.asyncio
+    async def test_failed_page_keeps_contiguous_watermark(self, cache, monkeypatch):
+        """Если страница не получена, сохраняется ID последнего документа до нее"""
+        monkeypatch.setattr(cache, 'SYNC_PAGE_SIZE', 2)
+        client = FakeMayanClient([_described(i, f'{i:064x}') for i in range(1, 6)])
+        get_documents = client.get_documents
+
+        async def failing_page(page=1, **kwargs):
+            if page == 2:
+                return [], 0
+            return await get_documents(page=page, **kwargs)
+
+        monkeypatch.setattr(client, 'get_documents', failing_page)
+
+        assert await cache.sync_from_mayan(client, cabinet_id=7) == 3
+        assert await cache.get_watermark(7) == 2
+
+        monkeypatch.setattr(client, 'get_documents', get_documents)
+        client.requests.clear()
+        assert await cache.sync_from_mayan(client, cabinet_id=7) == 3
+        assert sorted(client.requests) == [(1, 2), (2, 2)]
+        assert await cache.get_watermark(7) == 5
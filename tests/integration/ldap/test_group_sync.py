@@ -2,10 +2,47 @@
 Тесты синхронизации групп из LDAP
 """
 import pytest
+from auth.sync_users_from_olap import LDAPGroupSyncManager
+from models import UserGroup
 from tests.fixtures.mock_ldap import mock_ldap_authenticator
 from tests.fixtures.test_data import TEST_GROUPS
 
 
+class FakeMayanGroupsClient:
+    """Мок клиента Mayan EDMS, хранящий состав групп в памяти"""
+
+    def __init__(self, groups):
+        self.groups = {name: set(members) for name, members in groups.items()}
+        self.calls = []
+
+    async def get_groups(self):
+        self.calls.append('get_groups')
+        return [{'id': name, 'name': name} for name in self.groups]
+
+    async def create_group(self, group_data):
+        self.calls.append(('create_group', group_data['name']))
+        self.groups[group_data['name']] = set()
+        return True
+
+    async def get_group_users(self, group_id):
+        self.calls.append(('get_group_users', group_id))
+        return [{'username': username} for username in self.groups[group_id]]
+
+    async def load_user_index(self):
+        self.calls.append('load_user_index')
+        return 0
+
+    async def add_user_to_group(self, group_id, username):
+        self.calls.append(('add', group_id, username))
+        self.groups[group_id].add(username)
+        return True
+
+    async def remove_user_from_group(self, group_id, username):
+        self.calls.append(('remove', group_id, username))
+        self.groups[group_id].discard(username)
+        return True
+
+
 @pytest.mark.integration
 @pytest.mark.ldap
 class TestGroupSync:
@@ -46,3 +83,49 @@ class TestGroupSync:
         assert 'admins' in admin_user.memberOf
         assert 'users' in admin_user.memberOf
 
+
+
+@pytest.mark.integration
+@pytest.mark.ldap
+class TestGroupMembershipSync:
+    """Тесты синхронизации состава групп LDAP -> Mayan EDMS"""
+
+    @pytest.fixture
+    def sync_manager(self, tmp_path, monkeypatch):
+        ldap_groups = [
+            UserGroup(cn='accounting', memberUid=['anna', 'boris', 'vera']),
+            UserGroup(cn='lawyers', memberUid=['gleb']),
+        ]
+        client = FakeMayanGroupsClient({'accounting': ['anna', 'dmitry']})
+        monkeypatch.setattr(LDAPGroupSyncManager, 'get_ldap_groups', lambda self, server: ldap_groups)
+        monkeypatch.setattr(LDAPGroupSyncManager, '_load_sync_state', lambda self: None)
+
+        manager = LDAPGroupSyncManager(client)
+        manager.sync_state_file = tmp_path / 'group_sync_state.json'
+        manager.remove_old_members = True
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_only_differences_applied(self, sync_manager):
+        """Добавляются и удаляются только отличающиеся участники, новые группы создаются"""
+        stats = await sync_manager.sync_groups(ldap_server=None)
+        client = sync_manager.mayan_client
+
+        assert stats['success'] is True
+        assert client.groups == {'accounting': {'anna', 'boris', 'vera'}, 'lawyers': {'gleb'}}
+        assert ('add', 'accounting', 'anna') not in client.calls
+        assert ('remove', 'accounting', 'dmitry') in client.calls
+        assert stats['new_groups_created'] == 1
+        assert stats['members_added'] == 3
+        assert stats['members_removed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_unchanged_groups_skipped_on_next_run(self, sync_manager):
+        """Группы с неизменным составом в LDAP пропускаются без запросов состава к Mayan"""
+        await sync_manager.sync_groups(ldap_server=None)
+        sync_manager.mayan_client.calls.clear()
+
+        stats = await sync_manager.sync_groups(ldap_server=None)
+
+        assert stats['groups_skipped'] == 2
+        assert sync_manager.mayan_client.calls == ['get_groups']
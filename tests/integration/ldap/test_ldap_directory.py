@@ -0,0 +1,157 @@
+"""
+Тесты снимка каталога LDAP
+"""
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from auth.ldap_directory import LDAPDirectory
+
+BASE_DN = 'dc=permgp7,dc=ru'
+
+
+def _attr(value):
+    values = value if isinstance(value, list) else ([value] if value else [])
+    return SimpleNamespace(value=value, values=values)
+
+
+class FakePool:
+    """Пул LDAP, отвечающий на поиск записями с учетом фильтра по modifyTimestamp"""
+
+    timeout = 10.0
+
+    def __init__(self):
+        self.filters = []
+        self.timeouts = []
+        self.users = {}
+        self.groups = {}
+
+    def add_user(self, uid, given_name, sn, description='', modified=1):
+        self.users[uid] = SimpleNamespace(
+            entry_dn=f'uid={uid},ou=People,{BASE_DN}', uid=_attr(uid), cn=_attr(uid),
+            givenName=_attr(given_name), sn=_attr(sn), description=_attr(description),
+            mail=_attr(f'{uid}@example.com'), modifyTimestamp=_attr(self._time(modified)),
+        )
+
+    def add_group(self, cn, members, modified=1):
+        self.groups[cn] = SimpleNamespace(
+            cn=_attr(cn), memberUid=_attr(members), modifyTimestamp=_attr(self._time(modified)),
+        )
+
+    @staticmethod
+    def _time(minute):
+        return datetime(2024, 1, 1, 12, minute, tzinfo=timezone.utc)
+
+    def search(self, search_base, search_filter, attributes):
+        self.filters.append(search_filter)
+        entries = self.groups if 'posixGroup' in search_filter else self.users
+        since = None
+        if 'modifyTimestamp>=' in search_filter:
+            since = search_filter.split('modifyTimestamp>=')[1].rstrip(')')
+        return [
+            entry for entry in entries.values()
+            if since is None or entry.modifyTimestamp.value.strftime('%Y%m%d%H%M%SZ') >= since
+        ]
+
+    async def run(self, func, *args):
+        return await self.run_with_timeout(self.timeout, func, *args)
+
+    async def run_with_timeout(self, timeout, func, *args):
+        self.timeouts.append(timeout)
+        await asyncio.sleep(0.01)
+        return func(*args)
+
+
+@pytest.fixture
+def directory():
+    """Снимок каталога поверх мок-пула с двумя пользователями и группой"""
+    pool = FakePool()
+    pool.add_user('alice', 'Алиса', 'Иванова', 'Бухгалтер')
+    pool.add_user('bob', 'Борис', 'Петров')
+    pool.add_group('accounting', ['alice'])
+    authenticator = SimpleNamespace(base_dn=BASE_DN, pool=pool)
+    return LDAPDirectory(refresh_interval=60, full_reload_interval=3600, load_timeout=300,
+                         authenticator_factory=lambda: authenticator), pool
+
+
+@pytest.mark.integration
+@pytest.mark.ldap
+class TestLDAPDirectory:
+    """Тесты снимка каталога LDAP"""
+
+    @pytest.mark.asyncio
+    async def test_batch_resolve_loads_once(self, directory):
+        """Одновременные запросы имен выполняют одну загрузку каталога"""
+        ldap_directory, pool = directory
+
+        results = await asyncio.gather(*(
+            ldap_directory.resolve_display_names(['alice', 'bob', 'unknown']) for _ in range(5)
+        ))
+
+        assert results[0] == {'alice': 'Иванова Алиса - Бухгалтер', 'bob': 'Петров Борис', 'unknown': 'unknown'}
+        assert all(result == results[0] for result in results)
+        assert pool.filters == ['(uid=*)', '(objectClass=posixGroup)']
+        assert ldap_directory.get_user('alice').memberOf == ['accounting']
+        assert [user.login for user in await ldap_directory.get_users()] == ['alice', 'bob']
+
+    @pytest.mark.asyncio
+    async def test_incremental_refresh(self, directory):
+        """Обновление запрашивает только записи, измененные после последней загрузки"""
+        ldap_directory, pool = directory
+        await ldap_directory.ensure_fresh()
+
+        pool.add_user('bob', 'Борис', 'Петров', 'Директор', modified=5)
+        pool.add_user('carol', 'Карина', 'Сидорова', modified=5)
+        pool.add_group('accounting', ['alice', 'carol'], modified=5)
+        ldap_directory._refreshed_at -= 120
+        pool.filters.clear()
+
+        names = await ldap_directory.resolve_display_names(['bob', 'carol'])
+
+        assert pool.filters == [
+            '(&(uid=*)(modifyTimestamp>=20240101120100Z))',
+            '(&(objectClass=posixGroup)(modifyTimestamp>=20240101120100Z))',
+        ]
+        assert names == {'bob': 'Петров Борис - Директор', 'carol': 'Сидорова Карина'}
+        assert ldap_directory.get_user('carol').memberOf == ['accounting']
+        assert ldap_directory.get_user('alice').destription == 'Бухгалтер'
+        assert ldap_directory._watermark == '20240101120500Z'
+
+    @pytest.mark.asyncio
+    async def test_full_load_uses_own_timeout(self, directory):
+        """Полная загрузка ограничена своим таймаутом, инкрементальное обновление - таймаутом пула"""
+        ldap_directory, pool = directory
+        await ldap_directory.ensure_fresh()
+        ldap_directory._refreshed_at -= 120
+        await ldap_directory.ensure_fresh()
+
+        assert pool.timeouts == [300, pool.timeout]
+
+    @pytest.mark.asyncio
+    async def test_full_reload_drops_deleted_users(self, directory):
+        """Полная перезагрузка удаляет из снимка пользователей, удаленных из LDAP"""
+        ldap_directory, pool = directory
+        await ldap_directory.ensure_fresh()
+
+        del pool.users['bob']
+        ldap_directory._loaded_at -= 7200
+        ldap_directory._refreshed_at -= 7200
+
+        assert await ldap_directory.resolve_display_names(['bob']) == {'bob': 'bob'}
+        assert len(ldap_directory) == 1
+
+    @pytest.mark.asyncio
+    async def test_ldap_error_keeps_snapshot(self, directory, monkeypatch):
+        """При недоступности LDAP используются ранее загруженные данные"""
+        ldap_directory, pool = directory
+        await ldap_directory.ensure_fresh()
+
+        def failing_search(*args):
+            raise TimeoutError('LDAP недоступен')
+
+        monkeypatch.setattr(pool, 'search', failing_search)
+        ldap_directory._refreshed_at -= 120
+
+        assert await ldap_directory.resolve_display_names(['alice']) == {'alice': 'Иванова Алиса - Бухгалтер'}
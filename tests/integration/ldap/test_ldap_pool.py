@@ -0,0 +1,194 @@
+"""
+Тесты пула соединений LDAP
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from auth.ldap_auth import LDAPAuthenticator
+from auth.ldap_pool import close_ldap_pools
+from config.settings import config
+
+ADMIN_DN = 'cn=admin,dc=permgp7,dc=ru'
+
+
+def _attr(value):
+    return SimpleNamespace(value=value, values=[value] if value else [])
+
+
+def _user_entry(uid: str):
+    return SimpleNamespace(
+        entry_dn=f'uid={uid},ou=People,dc=permgp7,dc=ru',
+        uid=_attr(uid), cn=_attr(uid), givenName=_attr('Иван'), sn=_attr('Петров'),
+        mail=_attr(f'{uid}@example.com'), description=_attr(None), memberOf=[],
+    )
+
+
+class FakeConnection:
+    """Соединение ldap3, выполняющее медленный поиск по двум пользователям"""
+
+    created = []
+    search_delay = 0.0
+    users = ['alice', 'bob']
+    searches = []
+
+    def __init__(self, server, user=None, password=None, auto_bind=False, receive_timeout=None):
+        if user != ADMIN_DN and password != 'secret':
+            raise Exception('invalidCredentials')
+        self.user = user
+        self.closed = False
+        self.entries = []
+        self.result = {'result': 0}
+        FakeConnection.created.append(user)
+
+    def search(self, search_base, search_filter, search_scope=None, attributes=None,
+               size_limit=0, paged_size=None, paged_cookie=None):
+        time.sleep(self.search_delay)
+        FakeConnection.searches.append((search_filter, size_limit, paged_size, paged_cookie))
+        users = self.users
+        if search_filter.startswith('(uid=') and search_filter != '(uid=*)':
+            users = [uid for uid in users if search_filter == f'(uid={uid})']
+        elif search_filter.startswith('(|'):
+            users = [uid for uid in users if f'(uid=*{uid[:2]}' in search_filter]
+        if 'posixGroup' in search_filter:
+            users = []
+        if size_limit:
+            users = users[:size_limit]
+
+        # Постраничная выдача: cookie - смещение следующей страницы
+        offset = int(paged_cookie or 0)
+        page = users[offset:offset + paged_size] if paged_size else users
+        next_offset = offset + len(page)
+        cookie = str(next_offset).encode() if paged_size and next_offset < len(users) else b''
+        self.entries = [_user_entry(uid) for uid in page]
+        self.result = {'result': 0, 'controls': {'1.2.840.113556.1.4.319': {'value': {'size': 0, 'cookie': cookie}}}}
+
+    def unbind(self):
+        self.closed = True
+
+
+@pytest.fixture
+def ldap_config(monkeypatch):
+    """Настройки LDAP и мок соединения ldap3 с отдельным набором пулов"""
+    monkeypatch.setattr(config, 'ldap_server', 'ldap://ldap.test')
+    monkeypatch.setattr(config, 'ldap_user', ADMIN_DN)
+    monkeypatch.setattr(config, 'ldap_password', 'admin')
+    monkeypatch.setattr(config, 'ldap_base_dn', 'dc=permgp7,dc=ru')
+    monkeypatch.setattr(config, 'ldap_timeout', 1.0)
+    monkeypatch.setattr('auth.ldap_pool.Connection', FakeConnection)
+    monkeypatch.setattr('auth.ldap_pool._pools', {})
+    monkeypatch.setattr(FakeConnection, 'created', [])
+    monkeypatch.setattr(FakeConnection, 'search_delay', 0.0)
+    monkeypatch.setattr(FakeConnection, 'users', ['alice', 'bob'])
+    monkeypatch.setattr(FakeConnection, 'searches', [])
+    yield config
+    close_ldap_pools()
+
+
+@pytest.mark.integration
+@pytest.mark.ldap
+class TestLDAPConnectionPool:
+    """Тесты пула соединений LDAP"""
+
+    @pytest.mark.asyncio
+    async def test_connections_shared_between_authenticators(self, ldap_config):
+        """Аутентификаторы используют общий пул, служебное соединение открывается один раз"""
+        for _ in range(3):
+            users = await LDAPAuthenticator().get_users()
+            assert [user.login for user in users] == ['alice', 'bob']
+        assert LDAPAuthenticator().get_user_by_login('bob').uid == 'bob'
+
+        assert FakeConnection.created == [ADMIN_DN]
+        assert LDAPAuthenticator().pool.get_stats()['reused'] == 3
+
+    @pytest.mark.asyncio
+    async def test_search_does_not_block_event_loop(self, ldap_config, monkeypatch):
+        """Блокирующий поиск выполняется вне цикла событий"""
+        monkeypatch.setattr(FakeConnection, 'search_delay', 0.2)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker_task = asyncio.create_task(ticker())
+        users = await LDAPAuthenticator().get_users()
+        ticker_task.cancel()
+
+        assert len(users) == 2
+        assert ticks >= 10
+
+    @pytest.mark.asyncio
+    async def test_slow_search_times_out(self, ldap_config, monkeypatch):
+        """Операция, не уложившаяся в таймаут, завершается ошибкой, а не зависанием"""
+        monkeypatch.setattr(config, 'ldap_directory_load_timeout', 0.05)
+        monkeypatch.setattr(FakeConnection, 'search_delay', 0.3)
+        authenticator = LDAPAuthenticator()
+
+        started = time.monotonic()
+        users = await authenticator.get_users()
+
+        assert users == []
+        assert time.monotonic() - started < 0.25
+        assert authenticator.pool.get_stats()['timeouts'] == 1
+
+    @pytest.mark.asyncio
+    async def test_full_directory_walk_not_limited_by_interactive_timeout(self, ldap_config, monkeypatch):
+        """Полный обход каталога ограничивается таймаутом загрузки каталога, а не LDAP_TIMEOUT"""
+        monkeypatch.setattr(config, 'ldap_timeout', 0.05)
+        monkeypatch.setattr(config, 'ldap_directory_load_timeout', 5.0)
+        monkeypatch.setattr(FakeConnection, 'search_delay', 0.1)
+        authenticator = LDAPAuthenticator()
+
+        users = await authenticator.get_users()
+
+        assert [user.login for user in users] == ['alice', 'bob']
+        assert authenticator.pool.get_stats()['timeouts'] == 0
+
+    @pytest.mark.asyncio
+    async def test_long_operation_uses_own_timeout(self, ldap_config, monkeypatch):
+        """Длительная операция с собственным ограничением не прерывается таймаутом пула"""
+        monkeypatch.setattr(config, 'ldap_timeout', 0.05)
+        pool = LDAPAuthenticator().pool
+
+        assert await pool.run_with_timeout(None, lambda: time.sleep(0.1) or 'done') == 'done'
+        assert pool.get_stats()['timeouts'] == 0
+
+    @pytest.mark.asyncio
+    async def test_wrong_password_rejected(self, ldap_config):
+        """Проверка пароля выполняется отдельным соединением от имени пользователя"""
+        response = await LDAPAuthenticator().authenticate_user('alice', 'wrong')
+
+        assert response.success is False
+        assert response.message == 'Неверный пароль'
+        assert FakeConnection.created == [ADMIN_DN]
+
+    @pytest.mark.asyncio
+    async def test_users_loaded_page_by_page(self, ldap_config, monkeypatch):
+        """Все пользователи загружаются страницами с передачей cookie"""
+        monkeypatch.setattr(config, 'ldap_page_size', 2)
+        monkeypatch.setattr(FakeConnection, 'users', [f'user{i}' for i in range(5)])
+
+        users = await LDAPAuthenticator().get_users()
+
+        assert [user.login for user in users] == [f'user{i}' for i in range(5)]
+        assert [cookie for _, _, _, cookie in FakeConnection.searches] == [None, b'2', b'4']
+        assert all(page_size == 2 for _, _, page_size, _ in FakeConnection.searches)
+
+    @pytest.mark.asyncio
+    async def test_typeahead_search_is_capped(self, ldap_config, monkeypatch):
+        """Интерактивный поиск ограничен по числу записей, спецсимволы экранируются"""
+        monkeypatch.setattr(FakeConnection, 'users', [f'user{i}' for i in range(100)])
+        authenticator = LDAPAuthenticator()
+
+        users = await authenticator.search_users('us', limit=3)
+        assert [user.uid for user in users] == ['user0', 'user1', 'user2']
+        assert FakeConnection.searches[-1][1] == 3
+
+        await authenticator.search_users('a*)(uid=*')
+        assert FakeConnection.searches[-1][0].startswith('(|(uid=*a\\2a\\29\\28uid=\\2a*)')
+        assert FakeConnection.searches[-1][1] == config.ldap_search_limit
@@ -0,0 +1,157 @@
+"""
+Тесты поиска основного файла документа в MayanClient
+"""
+import httpx
+import pytest
+
+from services import mayan_connector
+from services.http_pool import SharedHttpPool
+from services.mayan_connector import MayanClient
+from utils.ttl_cache import TTLCache
+
+
+def _document(document_id: int, filename: str, file_id: int) -> dict:
+    return {
+        'id': document_id,
+        'label': f'Документ {document_id}',
+        'file_latest': {'id': file_id, 'filename': filename, 'mimetype': 'application/octet-stream', 'size': 10},
+    }
+
+
+DOCUMENTS = [
+    _document(1, 'contract.pdf', 10),
+    _document(2, 'contract.pdf.p7s', 21),
+    _document(3, 'signature_metadata_3.json', 31),
+]
+
+FILES = {
+    '2': [
+        {'id': 20, 'filename': 'contract.pdf', 'mimetype': 'application/pdf', 'size': 100},
+        {'id': 21, 'filename': 'contract.pdf.p7s', 'mimetype': 'application/pkcs7-signature', 'size': 5},
+    ],
+    '3': [
+        {'id': 31, 'filename': 'signature_metadata_3.json', 'mimetype': 'application/json', 'size': 5},
+    ],
+}
+
+
+@pytest.fixture
+def mayan_client(monkeypatch):
+    """MayanClient поверх мок-транспорта, считающего запросы списка файлов"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        requests.append(path)
+        if path.endswith('/files/'):
+            document_id = path.split('/')[-3]
+            return httpx.Response(200, json={'results': FILES.get(document_id, [])})
+        if path.endswith('/pages/'):
+            page_size = int(request.url.params.get('page_size', 100))
+            pages = [{'page_number': n, 'image_url': f'http://mayan{path}{n}/image/'} for n in range(1, 51)]
+            return httpx.Response(200, json={'count': 50, 'results': pages[:page_size]})
+        return httpx.Response(200, json={'count': len(DOCUMENTS), 'results': DOCUMENTS})
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.mayan_connector.mayan_http_pool', pool)
+    monkeypatch.setattr(mayan_connector, '_main_file_memo', TTLCache(ttl=None))
+    monkeypatch.setattr(mayan_connector, '_main_document_file_cache', TTLCache(ttl=60))
+    monkeypatch.setattr(mayan_connector, '_preview_url_cache', TTLCache(ttl=None))
+    client = MayanClient('http://mayan', api_token='token')
+    client.requests = requests
+    return client
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestDocumentListing:
+    """Тесты списков документов"""
+
+    @pytest.mark.asyncio
+    async def test_signature_files_replaced_by_main_file(self, mayan_client):
+        """Подписи в file_latest заменяются основным файлом документа"""
+        documents, total = await mayan_client.get_documents()
+
+        assert total == 3
+        by_id = {doc.document_id: doc for doc in documents}
+        assert by_id[1].file_latest_filename == 'contract.pdf'
+        assert by_id[2].file_latest_id == '20'
+        assert by_id[2].file_latest_mimetype == 'application/pdf'
+        # В документе только метаданные - остается file_latest
+        assert by_id[3].file_latest_filename == 'signature_metadata_3.json'
+
+    @pytest.mark.asyncio
+    async def test_file_lists_requested_only_once(self, mayan_client):
+        """Списки файлов запрашиваются только для подписей и запоминаются между вызовами"""
+        await mayan_client.get_documents()
+        await mayan_client.get_cabinet_documents(cabinet_id=1)
+        await mayan_client.get_favorite_documents()
+
+        file_requests = [path for path in mayan_client.requests if path.endswith('/files/')]
+        assert sorted(file_requests) == ['/api/v4/documents/2/files/', '/api/v4/documents/3/files/']
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestMainDocumentFileCache:
+    """Тесты кеша основного файла документа"""
+
+    @pytest.mark.asyncio
+    async def test_main_file_cached_between_calls(self, mayan_client):
+        """Повторные обращения к основному файлу не запрашивают список файлов"""
+        first = await mayan_client._get_main_document_file('2')
+        second = await mayan_client._get_main_document_file('2')
+
+        assert first['id'] == 20
+        assert second == first
+        assert mayan_client.requests.count('/api/v4/documents/2/files/') == 1
+
+    @pytest.mark.asyncio
+    async def test_write_request_invalidates_cache(self, mayan_client):
+        """Загрузка файла в документ сбрасывает кеш этого документа"""
+        await mayan_client._get_main_document_file('2')
+        await mayan_client._make_request('POST', 'documents/2/files/', data={'action_name': 'upload'})
+        await mayan_client._get_main_document_file('2')
+
+        assert mayan_client.requests.count('/api/v4/documents/2/files/') == 3
+
+    @pytest.mark.asyncio
+    async def test_cache_not_shared_between_users(self, mayan_client):
+        """Сведения, полученные с правами одного пользователя, не отдаются другому"""
+        other_client = MayanClient('http://mayan', api_token='other-token')
+
+        await mayan_client._get_main_document_file('2')
+        await other_client._get_main_document_file('2')
+        await other_client._get_main_document_file('2')
+
+        assert mayan_client.requests.count('/api/v4/documents/2/files/') == 2
+
+    @pytest.mark.asyncio
+    async def test_read_overlapping_write_not_cached(self, mayan_client, monkeypatch):
+        """Ответ, полученный во время изменения документа, не возвращается в кеш"""
+        fetch = mayan_client._get_main_document_file_fallback
+
+        async def fetch_during_write(document_id):
+            file_info = await fetch(document_id)
+            mayan_connector.invalidate_document_cache(document_id)
+            return file_info
+
+        monkeypatch.setattr(mayan_client, '_get_main_document_file_fallback', fetch_during_write)
+        await mayan_client._get_main_document_file('2')
+
+        assert not mayan_connector._main_document_file_cache.get(('2', mayan_client._cache_scope))
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestPreviewUrl:
+    """Тесты получения URL превью"""
+
+    @pytest.mark.asyncio
+    async def test_only_first_page_requested_and_cached(self, mayan_client):
+        """Запрашивается только первая страница, URL кешируется по версии документа"""
+        first = await mayan_client.get_document_preview_url('2')
+        second = await mayan_client.get_document_preview_url('2')
+
+        assert first == second == 'http://mayan/api/v4/documents/2/files/20/pages/1/image/'
+        assert mayan_client.requests.count('/api/v4/documents/2/files/20/pages/') == 1
@@ -0,0 +1,94 @@
+"""
+Тесты общего пула HTTP соединений MayanClient
+"""
+import httpx
+import pytest
+
+from services.http_pool import SharedHttpPool
+from services.mayan_connector import MayanClient
+
+
+def _echo_transport(seen: list) -> httpx.MockTransport:
+    """Транспорт, запоминающий заголовок Authorization каждого запроса"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers.get('Authorization'))
+        return httpx.Response(200, json={'results': []})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestSharedHttpPool:
+    """Тесты общего пула соединений"""
+
+    @pytest.mark.asyncio
+    async def test_sessions_share_client_and_inject_auth(self):
+        """Сессии разных пользователей используют один клиент, но свои учетные данные"""
+        seen = []
+        pool = SharedHttpPool('test', transport=_echo_transport(seen))
+
+        first = pool.session(headers={'Authorization': 'Token first'})
+        second = pool.session(auth=httpx.BasicAuth('user', 'secret'))
+
+        await first.get('http://mayan/api/v4/documents/')
+        await second.get('http://mayan/api/v4/documents/')
+
+        assert seen[0] == 'Token first'
+        assert seen[1].startswith('Basic ')
+        assert pool.get_stats()['clients_created'] == 1
+        assert pool.get_stats()['requests_total'] == 2
+        assert pool.get_stats()['in_flight'] == 0
+
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_sessions_do_not_share_cookies(self):
+        """Cookie, выданная ответом одному пользователю, не отправляется с запросами другого"""
+        cookies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            cookies.append(request.headers.get('Cookie'))
+            token = request.headers.get('Authorization', '').split()[-1]
+            return httpx.Response(200, json={'results': []}, headers={'Set-Cookie': f'sessionid={token}; Path=/'})
+
+        pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+        first = pool.session(headers={'Authorization': 'Token first'})
+        second = pool.session(headers={'Authorization': 'Token second'})
+
+        await first.get('http://mayan/api/v4/documents/')
+        await second.get('http://mayan/api/v4/documents/')
+        await first.get('http://mayan/api/v4/documents/')
+
+        assert cookies == [None, None, None]
+        assert not pool.get_client().cookies
+        await pool.aclose()
+
+    @pytest.mark.asyncio
+    async def test_session_close_keeps_pool_open(self):
+        """Закрытие сессии не закрывает общий клиент"""
+        pool = SharedHttpPool('test', transport=_echo_transport([]))
+        session = pool.session()
+        await session.get('http://mayan/')
+        client = pool.get_client()
+
+        await session.aclose()
+
+        assert not client.is_closed
+        await pool.aclose()
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_mayan_clients_use_shared_pool(self, monkeypatch):
+        """Экземпляры MayanClient не создают собственных соединений"""
+        seen = []
+        pool = SharedHttpPool('test', transport=_echo_transport(seen))
+        monkeypatch.setattr('services.mayan_connector.mayan_http_pool', pool)
+
+        clients = [MayanClient('http://mayan', api_token=f'token{i}') for i in range(3)]
+        for client in clients:
+            await client._make_request('GET', 'documents/')
+            await client.close()
+
+        assert seen == ['Token token0', 'Token token1', 'Token token2']
+        assert pool.get_stats()['clients_created'] == 1
+        await pool.aclose()
@@ -0,0 +1,61 @@
+"""
+Тесты постраничного обхода списков Mayan EDMS
+"""
+import httpx
+import pytest
+
+from services.http_pool import SharedHttpPool
+from services.mayan_connector import MayanClient
+
+ROLES = [{'id': i, 'label': f'Роль {i}'} for i in range(1, 231)]
+
+
+@pytest.fixture
+def mayan_client(monkeypatch):
+    """MayanClient поверх мок-транспорта со списком ролей из нескольких страниц"""
+    pages = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get('page', 1))
+        page_size = int(request.url.params.get('page_size', 20))
+        pages.append(page)
+        results = ROLES[(page - 1) * page_size:page * page_size]
+        has_next = page * page_size < len(ROLES)
+        return httpx.Response(200, json={'count': len(ROLES), 'next': 'next' if has_next else None, 'results': results})
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.mayan_connector.mayan_http_pool', pool)
+    client = MayanClient('http://mayan', api_token='token')
+    client.pages = pages
+    return client
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestListPagination:
+    """Тесты обхода всех страниц списков"""
+
+    @pytest.mark.asyncio
+    async def test_collect_all_follows_next(self, mayan_client):
+        """Собираются элементы всех страниц"""
+        roles = await mayan_client.collect_all(mayan_client.iter_roles())
+
+        assert [role['id'] for role in roles] == list(range(1, 231))
+        assert mayan_client.pages == [1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_collect_all_respects_memory_cap(self, mayan_client):
+        """При достижении лимита сбор прекращается, лишние страницы не загружаются"""
+        roles = await mayan_client.collect_all('roles/', max_items=50)
+
+        assert len(roles) == 50
+        # Загружена первая страница и, возможно, предзагружена вторая
+        assert mayan_client.pages[0] == 1
+        assert len(mayan_client.pages) <= 2
+
+    @pytest.mark.asyncio
+    async def test_related_lists_return_all_pages(self, mayan_client):
+        """Списки без параметров пагинации возвращают элементы всех страниц"""
+        users = await mayan_client.get_group_users('1')
+
+        assert len(users) == len(ROLES)
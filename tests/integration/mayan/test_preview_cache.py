@@ -0,0 +1,83 @@
+"""
+Тесты дискового кеша превью документов
+"""
+import asyncio
+import threading
+
+import pytest
+
+from services.preview_cache import PreviewCache
+
+PNG = b'\x89PNG' + b'0' * 96
+
+
+class _PreviewClient:
+    """Клиент, считающий запросы превью"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def get_document_preview_image(self, document_id):
+        self.calls.append(document_id)
+        return PNG
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestPreviewCache:
+    """Тесты кеша превью"""
+
+    @pytest.mark.asyncio
+    async def test_preview_fetched_only_on_miss(self, tmp_path):
+        """Превью загружается из Mayan только при промахе и переживает перезапуск"""
+        cache = PreviewCache(tmp_path)
+        client = _PreviewClient()
+
+        first = await cache.get_or_fetch(client, 1, 10)
+        second = await cache.get_or_fetch(client, 1, 10)
+        restarted = await PreviewCache(tmp_path).get_or_fetch(client, 1, 10)
+
+        assert first == second == restarted
+        assert first.startswith(PreviewCache.URL_PREFIX)
+        assert client.calls == ['1']
+
+    @pytest.mark.asyncio
+    async def test_new_file_version_gets_new_key(self, tmp_path):
+        """Новая версия файла документа получает новое превью"""
+        cache = PreviewCache(tmp_path)
+        client = _PreviewClient()
+
+        old = await cache.get_or_fetch(client, 1, 10)
+        new = await cache.get_or_fetch(client, 1, 11)
+
+        assert old != new
+        assert client.calls == ['1', '1']
+
+    def test_lru_eviction_by_size(self, tmp_path):
+        """При превышении лимита удаляются давно использованные превью"""
+        cache = PreviewCache(tmp_path, max_bytes=len(PNG) * 2)
+        cache.put(1, 10, PNG)
+        cache.put(2, 20, PNG)
+        assert cache.get_url(1, 10)
+
+        cache.put(3, 30, PNG)
+
+        assert cache.get_url(2, 20) is None
+        assert cache.get_url(1, 10)
+        assert cache.get_stats()['total_bytes'] <= cache.max_bytes
+
+    @pytest.mark.asyncio
+    async def test_concurrent_puts_of_same_preview(self, tmp_path):
+        """Одновременное сохранение одного превью из разных потоков не конфликтует"""
+        cache = PreviewCache(tmp_path)
+        barrier = threading.Barrier(4, timeout=10)
+
+        def put_many():
+            barrier.wait()
+            return [cache.put(1, 10, PNG) for _ in range(50)]
+
+        results = await asyncio.gather(*(asyncio.to_thread(put_many) for _ in range(4)))
+
+        assert len({url for urls in results for url in urls}) == 1
+        assert cache.get_stats()['total_bytes'] == len(PNG)
+        assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
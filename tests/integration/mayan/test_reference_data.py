@@ -0,0 +1,142 @@
+"""
+Тесты общего кеша справочных данных Mayan EDMS
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from services.http_pool import SharedHttpPool
+from services.mayan_connector import MayanClient
+from services.reference_data import PERMISSIONS, ROLE_MEMBERS, ROLES, ReferenceDataCache
+
+RESPONSES = {
+    '/api/v4/roles/': [{'id': 1, 'label': 'Бухгалтерия'}, {'id': 2, 'label': 'Руководство'}],
+    '/api/v4/roles/1/groups/': [{'id': 10, 'name': 'accounting'}, {'id': 11, 'name': 'audit'}],
+    '/api/v4/roles/2/groups/': [{'id': 11, 'name': 'audit'}],
+    '/api/v4/groups/10/users/': [{'username': 'alice'}, {'username': 'bob'}],
+    '/api/v4/groups/11/users/': [{'username': 'bob'}, {'username': 'carol'}],
+    '/api/v4/permissions/': [
+        {'pk': 'documents.document_view', 'label': 'View documents', 'url': 'http://mayan/api/v4/permissions/7/'},
+        {'pk': 'documents.document_edit', 'label': 'Edit documents'},
+    ],
+}
+
+
+@pytest.fixture
+def mayan(monkeypatch):
+    """Кеш справочных данных и MayanClient поверх мок-транспорта, записывающего запросы"""
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        await asyncio.sleep(0.01)
+        if request.method != 'GET':
+            await asyncio.sleep(0.05)
+            return httpx.Response(201, json={})
+        return httpx.Response(200, json={'next': None, 'results': RESPONSES.get(request.url.path, [])})
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.mayan_connector.mayan_http_pool', pool)
+    client = MayanClient('http://mayan', api_token='token')
+    client.requests = requests
+
+    async def client_factory():
+        return client
+
+    cache = ReferenceDataCache(ttl=60, max_stale=3600, client_factory=client_factory)
+    monkeypatch.setattr('services.mayan_connector.reference_data', cache)
+    return cache, client
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestReferenceDataCache:
+    """Тесты кеша справочных данных"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reads_load_once(self, mayan):
+        """Одновременные обращения разных страниц выполняют одну загрузку"""
+        cache, client = mayan
+
+        results = await asyncio.gather(*(cache.get_roles() for _ in range(5)))
+        await cache.get_roles()
+
+        assert all(roles == RESPONSES['/api/v4/roles/'] for roles in results)
+        assert client.requests == [('GET', '/api/v4/roles/')]
+
+    @pytest.mark.asyncio
+    async def test_stale_data_served_while_refreshing(self, mayan):
+        """Устаревшие данные отдаются сразу, обновление выполняется в фоне"""
+        cache, client = mayan
+        await cache.get(ROLES)
+        value, loaded_at = cache._entries[ROLES]
+        cache._entries[ROLES] = (value, loaded_at - 120)
+
+        assert await cache.get(ROLES) == RESPONSES['/api/v4/roles/']
+        assert len(client.requests) == 1
+
+        await asyncio.sleep(0.05)
+        assert len(client.requests) == 2
+        assert time.monotonic() - cache._entries[ROLES][1] < 1
+
+    @pytest.mark.asyncio
+    async def test_write_request_invalidates_datasets(self, mayan):
+        """Изменение состава группы сбрасывает состав ролей, но не список ролей"""
+        cache, client = mayan
+        await cache.get_roles()
+        await cache.get_role_membership()
+
+        await client._make_request('POST', 'groups/10/users/add/', json={'user': 1})
+
+        assert ROLES in cache._entries
+        assert ROLE_MEMBERS not in cache._entries
+
+    @pytest.mark.asyncio
+    async def test_read_during_write_not_left_in_cache(self, mayan):
+        """Данные, загруженные во время изменяющего запроса, сбрасываются после его завершения"""
+        cache, client = mayan
+
+        write = asyncio.ensure_future(client._make_request('POST', 'roles/', json={'label': 'Аудит'}))
+        await asyncio.sleep(0)
+        await cache.get_roles()
+        assert ROLES in cache._entries
+
+        await write
+        assert ROLES not in cache._entries
+
+    @pytest.mark.asyncio
+    async def test_role_members_and_permissions(self, mayan):
+        """Состав ролей раскрывается до пользователей, разрешения сопоставляются с ID"""
+        cache, client = mayan
+
+        membership = await cache.get_role_membership()
+
+        assert membership.users_with_role('Бухгалтерия') == ['alice', 'bob', 'carol']
+        assert membership.users_with_role('Руководство') == ['bob', 'carol']
+        assert membership.roles_of_user('bob') == ['Бухгалтерия', 'Руководство']
+        assert membership.roles_of_user('alice') == ['Бухгалтерия']
+        assert membership.roles_of_user('dave') == []
+        assert client.requests.count(('GET', '/api/v4/groups/11/users/')) == 1
+        assert await cache.get_permission_id('View documents') == 7
+        assert await cache.get_permission_id('Edit documents') == 'documents.document_edit'
+        assert PERMISSIONS in cache._entries
+
+    @pytest.mark.asyncio
+    async def test_background_refresh_reloads_after_invalidation(self, mayan, monkeypatch):
+        """Фоновое обновление загружает состав ролей заново после инвалидации"""
+        cache, client = mayan
+        monkeypatch.setattr(ReferenceDataCache, 'REFRESH_DEBOUNCE', 0.01)
+        cache.start_background_refresh(names=(ROLE_MEMBERS,))
+        try:
+            await asyncio.sleep(0.1)
+            assert cache.peek(ROLE_MEMBERS) is not None
+
+            cache.invalidate(ROLE_MEMBERS)
+            assert cache.peek(ROLE_MEMBERS) is None
+
+            await asyncio.sleep(0.2)
+            assert cache.peek(ROLE_MEMBERS).roles_of_user('carol') == ['Бухгалтерия', 'Руководство']
+        finally:
+            cache.stop_background_refresh()
@@ -0,0 +1,100 @@
+"""
+Тесты индекса пользователей Mayan EDMS
+"""
+import json
+
+import httpx
+import pytest
+
+from services import mayan_connector
+from services.http_pool import SharedHttpPool
+from services.document_access_manager import DocumentAccessManager
+from services.mayan_connector import MayanClient, MayanUserIndex
+
+USERS = [{'id': i, 'username': f'user{i}'} for i in range(1, 251)]
+
+
+@pytest.fixture
+def mayan_client(monkeypatch):
+    """MayanClient поверх мок-транспорта со списком пользователей из нескольких страниц"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        if request.url.path.endswith('/users/') and request.method == 'GET':
+            # Пользователь с ограниченными правами видит только себя
+            users = USERS if 'system-token' in request.headers.get('Authorization', '') else USERS[:1]
+            page = int(request.url.params['page'])
+            page_size = int(request.url.params['page_size'])
+            results = users[(page - 1) * page_size:page * page_size]
+            has_next = page * page_size < len(users)
+            return httpx.Response(200, json={
+                'count': len(users), 'next': 'next' if has_next else None, 'results': results
+            })
+        if request.url.path.endswith('/users/'):
+            body = json.loads(request.content)
+            return httpx.Response(201, json={'id': 1000, 'username': body['username']})
+        return httpx.Response(200, json={})
+
+    pool = SharedHttpPool('test', transport=httpx.MockTransport(handler))
+    monkeypatch.setattr('services.mayan_connector.mayan_http_pool', pool)
+    system_client = MayanClient('http://mayan', api_token='system-token')
+
+    async def client_factory():
+        return system_client
+
+    index = MayanUserIndex(client_factory=client_factory)
+    monkeypatch.setattr(mayan_connector, 'mayan_user_index', index)
+    monkeypatch.setattr('services.document_access_manager.mayan_user_index', index)
+    client = MayanClient('http://mayan', api_token='token')
+    client.requests = requests
+    return client
+
+
+@pytest.mark.integration
+@pytest.mark.mayan
+class TestMayanUserIndex:
+    """Тесты индекса пользователей"""
+
+    @pytest.mark.asyncio
+    async def test_group_operations_use_index(self, mayan_client):
+        """Пользователи загружаются постранично один раз, операции с группой не ищут их заново"""
+        for i in (1, 120, 250):
+            assert await mayan_client.add_user_to_group('7', f'user{i}')
+        assert await mayan_client.remove_user_from_group('7', 'user250')
+
+        user_pages = [path for method, path in mayan_client.requests if method == 'GET']
+        assert len(user_pages) == 3
+        assert mayan_client.requests.count(('POST', '/api/v4/groups/7/users/add/')) == 3
+
+    @pytest.mark.asyncio
+    async def test_created_user_added_to_index(self, mayan_client):
+        """Созданный пользователь сразу доступен в индексе без перезагрузки"""
+        await mayan_client.load_user_index()
+        await mayan_client.create_user({'username': 'newbie'})
+
+        assert await mayan_client._get_user_id_by_username('newbie') == 1000
+        assert len([method for method, _ in mayan_client.requests if method == 'GET']) == 3
+
+    @pytest.mark.asyncio
+    async def test_index_loaded_with_system_client(self, mayan_client):
+        """Индекс загружается системным клиентом, а не клиентом пользователя с ограниченными правами"""
+        assert await mayan_client.add_user_to_group('7', 'user250')
+        assert len(mayan_connector.mayan_user_index) == len(USERS)
+
+    @pytest.mark.asyncio
+    async def test_document_access_finds_user_beyond_first_page(self, mayan_client, monkeypatch):
+        """Доступ к документу выдается пользователю не с первой страницы users/"""
+        acl_users = []
+
+        async def create_acl_for_object(app_label, model_name, object_id, user_id=None):
+            acl_users.append(user_id)
+            return None
+
+        monkeypatch.setattr(mayan_client, 'create_acl_for_object', create_acl_for_object)
+        manager = DocumentAccessManager()
+        manager.mayan_client = mayan_client
+
+        await manager.grant_document_access_to_user('5', 'Договор', 'user250', 'View documents')
+
+        assert acl_users == [250]
@@ -3,11 +3,13 @@
 from .security import validate_username, sanitize_input
 from .date_utils import format_due_date
 from .task_utils import create_task_detail_data
+from .ttl_cache import TTLCache
 
 __all__ = [
     'validate_username',
     'sanitize_input', 
     'format_due_date',
-    'create_task_detail_data'
+    'create_task_detail_data',
+    'TTLCache'
 ]
 
@@ -0,0 +1,116 @@
+# utils/ttl_cache.py
+"""
+Потокобезопасный LRU кеш с ограничением времени жизни записей.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    LRU кеш фиксированного размера с временем жизни записей (TTL).
+
+    При превышении max_size вытесняются наиболее давно использованные записи,
+    устаревшие записи удаляются при обращении к ним.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 300.0):
+        """
+        Инициализация кеша
+
+        Args:
+            max_size: Максимальное количество записей
+            ttl: Время жизни записи в секундах (None - без ограничения)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение из кеша
+
+        Args:
+            key: Ключ записи
+            default: Значение, возвращаемое при отсутствии или устаревании записи
+
+        Returns:
+            Закешированное значение или default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Сохраняет значение в кеш
+
+        Args:
+            key: Ключ записи
+            value: Значение
+            ttl: Время жизни записи в секундах (по умолчанию - ttl кеша)
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Удаляет запись из кеша, возвращает True если запись была"""
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Удаляет все записи, ключи которых удовлетворяют условию
+
+        Args:
+            predicate: Функция от ключа записи
+
+        Returns:
+            Количество удаленных записей
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Очищает кеш"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику попаданий в кеш"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+            }